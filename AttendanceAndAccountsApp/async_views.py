@@ -0,0 +1,166 @@
+"""
+Async variants of the list endpoints, for deployments served through asgi.py.
+
+The REST framework views are synchronous, so under ASGI each one occupies a
+thread for as long as its queries run. The views built by async_list_view()
+are native coroutines instead: rows are read with the async ORM interface
+(``async for``), authentication and the version stamp lookups of the response
+cache run in sync_to_async(), and the event loop keeps serving other requests
+while a slow query is in flight.
+
+They accept the same query parameters and return the same data as the sync
+views (filters, 'fields', cursor pages, 'debug=plan', the response cache and
+conditional GETs),
+except 'stream': Django 4.1 can only stream from synchronous iterators, which
+cannot run queries in an async context, so streaming stays on the sync views.
+
+settings.ASYNC_READ_VIEWS selects which variant the URLs route to.
+"""
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, HttpResponseNotAllowed
+from rest_framework import exceptions, status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+
+from . import cache
+from .filters import filter_queryset, query_plans, wants_query_plan
+from .pagination import PAGINATION_PARAMS, keyset_page_queryset, merge_rows, parse_bool, split_page
+from .serialization import FIELDS_PARAM, LeanSerializer, parse_fields
+
+
+def json_response(data, status_code=status.HTTP_200_OK, headers=None):
+    """
+    Renders data the way a REST framework Response would.
+
+    Args:
+        data: The response data; None gives an empty body.
+        status_code (int): The HTTP status.
+        headers (dict, optional): Additional response headers.
+
+    Returns:
+        HttpResponse: The rendered response.
+    """
+    content = JSONRenderer().render(data)
+    return HttpResponse(content, status=status_code, content_type='application/json', headers=headers)
+
+
+def error_response(exc):
+    """
+    Converts a REST framework APIException into a response, like the default exception handler.
+    """
+    detail = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    headers = {}
+    if getattr(exc, 'auth_header', None):
+        headers['WWW-Authenticate'] = exc.auth_header
+    return json_response(detail, exc.status_code, headers)
+
+
+async def authenticate(request):
+    """
+    Authenticates a request with the configured REST framework authentication classes.
+
+    Sets request.user on success, which the query plan permission check relies on.
+
+    Args:
+        request (HttpRequest): The incoming request.
+
+    Raises:
+        NotAuthenticated: If no authenticator recognised the request.
+        AuthenticationFailed: If the credentials are invalid.
+    """
+    authenticators = [authenticator() for authenticator in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    try:
+        for authenticator in authenticators:
+            result = await sync_to_async(authenticator.authenticate)(request)
+            if result is not None:
+                request.user, request.auth = result
+                return
+        raise exceptions.NotAuthenticated()
+    except (exceptions.NotAuthenticated, exceptions.AuthenticationFailed) as exc:
+        # Like the REST framework, challenge with the first authentication class
+        if authenticators:
+            exc.auth_header = authenticators[0].authenticate_header(request)
+        raise
+
+
+def async_list_view(model, serializer_class, filter_class, list_fields, collection, ordering=None, partitions=None):
+    """
+    Builds the async variant of a list endpoint.
+
+    Args:
+        model (Model): The model the endpoint lists.
+        serializer_class (Serializer): The serializer whose representation the endpoint returns.
+        filter_class (Serializer): The serializer declaring the supported filters.
+        list_fields (tuple): The fields the endpoint may return.
+        collection (str): The response cache collection the endpoint reads.
+        ordering (tuple, optional): The keyset ordering; without it, cursor pages are not supported.
+        partitions (function, optional): Takes the filter parameters and returns the filtered querysets of
+            every table to read (e.g. attendance.archive.filter_partitions); by default, the model is filtered.
+
+    Returns:
+        function: The async view.
+    """
+    async def view(request):
+        if request.method != 'GET':
+            return HttpResponseNotAllowed(['GET'])
+
+        try:
+            await authenticate(request)
+            conditional = cache.is_conditional(request)
+            if conditional:
+                etag, modified = await sync_to_async(cache.validators)(collection, request)
+                response = cache.not_modified(request, etag, modified)
+                if response is not None:
+                    return response
+
+            cacheable = cache.is_cacheable(request)
+            cached = None
+            if cacheable:
+                key, cached = await sync_to_async(cache.get_cached)(collection, request)
+            if cached is not None:
+                data, status_code = cached
+            else:
+                data, status_code = await read(request)
+                if cacheable:
+                    cache.store(key, data, status_code)
+        except exceptions.APIException as exc:
+            return error_response(exc)
+
+        response = json_response(data, status_code)
+        return cache.set_validators(response, etag, modified) if conditional else response
+
+    async def read(request):
+        params = request.GET.dict()
+        cursor, page_size, stream = (params.pop(name, None) for name in PAGINATION_PARAMS) \
+            if ordering else (None, None, None)
+        if parse_bool(stream):
+            raise exceptions.ValidationError(
+                {'stream': 'Streaming is not available from the async views; page through the records with cursor.'})
+        lean = LeanSerializer(serializer_class, parse_fields(params.pop(FIELDS_PARAM, None), list_fields))
+        plan = wants_query_plan(request, params)
+
+        querysets = partitions(params) if partitions else [filter_queryset(model.objects.all(), filter_class, params)]
+        querysets = [queryset.values(*lean.fields, *(ordering or ())) for queryset in querysets]
+
+        if plan:
+            if ordering:
+                querysets = [queryset.order_by(*ordering) for queryset in querysets]
+            return await sync_to_async(query_plans)(querysets), status.HTTP_200_OK
+
+        # Endpoints with a keyset ordering always answer with one page
+        if ordering:
+            pages = [keyset_page_queryset(queryset, ordering, cursor, page_size) for queryset in querysets]
+            rows = list(merge_rows([[row async for row in page] for page, _ in pages], ordering))
+            rows, next_cursor = split_page(rows, ordering, pages[0][1])
+            if not rows and not cursor:
+                return None, status.HTTP_404_NOT_FOUND
+            return {'next': next_cursor, 'results': lean.rows(rows)}, status.HTTP_200_OK
+
+        rows = [row for queryset in querysets async for row in queryset]
+        if rows:
+            return lean.rows(rows), status.HTTP_200_OK
+        return None, status.HTTP_404_NOT_FOUND
+
+    view.__doc__ = f'Async variant of the {model.__name__} list endpoint.'
+    return view
@@ -0,0 +1,123 @@
+"""
+JWT authentication classes used by the REST framework views.
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from . import metrics
+from .metrics import timed
+
+
+class TimedJWTAuthentication(JWTAuthentication):
+    """
+    The stock simplejwt authentication, reporting its duration as the 'auth' request timing.
+    """
+
+    def authenticate(self, request):
+        with timed('auth'):
+            return super().authenticate(request)
+
+
+class UserCache:
+    """
+    A bounded, thread-safe LRU cache whose entries expire after a fixed time.
+
+    Attributes:
+        max_entries (int): The number of entries kept; the least recently used one is evicted first.
+        ttl (float): The number of seconds an entry is valid for.
+    """
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+user_cache = UserCache(settings.AUTH_USER_CACHE_MAX_ENTRIES, settings.AUTH_USER_CACHE_TTL)
+
+
+def invalidate_user(user_id):
+    """
+    Drops a user from the authentication cache of this process once the current transaction commits.
+
+    Other processes pick the change up when their entry expires, after at most AUTH_USER_CACHE_TTL seconds.
+
+    Args:
+        user_id (int): The primary key of the updated or deleted user.
+    """
+    transaction.on_commit(lambda: user_cache.delete(user_id))
+
+
+class CachedJWTAuthentication(TimedJWTAuthentication):
+    """
+    JWT authentication reading users from an in-process cache instead of querying them on every request.
+
+    Users are cached by the user id of the token for AUTH_USER_CACHE_TTL seconds, so
+    deactivating a user takes effect within that time in every process, and at once in
+    the process that handled the change. With AUTH_USER_CACHE_ENABLED off it behaves
+    like TimedJWTAuthentication.
+    """
+
+    def get_user(self, validated_token):
+        if not settings.AUTH_USER_CACHE_ENABLED:
+            return super().get_user(validated_token)
+
+        try:
+            user_id = validated_token[jwt_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        user = user_cache.get(user_id)
+        if user is None:
+            metrics.increment('auth_user_cache_total', (('result', 'miss'),),
+                              help_text='Lookups of the authentication user cache.')
+            # Only active users pass the stock checks, so only active users are cached
+            user = super().get_user(validated_token)
+            user_cache.set(user_id, user)
+        else:
+            metrics.increment('auth_user_cache_total', (('result', 'hit'),),
+                              help_text='Lookups of the authentication user cache.')
+            if jwt_settings.CHECK_REVOKE_TOKEN and \
+                    validated_token.get(jwt_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+        # Every request gets its own copy, so views can never change the cached user
+        return copy.copy(user)
@@ -0,0 +1,170 @@
+"""
+Helpers of the batch PATCH and DELETE endpoints.
+
+A batch PATCH takes a JSON list of partial updates, each holding the 'id' of
+the record to change and the fields to set; a batch DELETE takes a JSON list
+of ids. Items are validated without queries, the records are read with one
+query, and the changes are applied in one transaction with one set-based
+update() per distinct set of changes, so moving 200 people to a new manager is
+a single UPDATE. The response holds a status per item, in the order the items
+were sent.
+"""
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+UPDATED = 'updated'
+DELETED = 'deleted'
+NOT_FOUND = 'not_found'
+INVALID = 'invalid'
+
+
+def check_batch(items, kind):
+    """
+    Checks the shape and size of a batch request body.
+
+    Args:
+        items: The parsed request body.
+        kind (str): What the list holds, for the error message, e.g. 'partial updates'.
+
+    Returns:
+        Response: A 400 response if the body is not a list or is too long, None otherwise.
+    """
+    if not isinstance(items, list):
+        return Response({'error': f'Expected a list of {kind}'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(items) > settings.BATCH_MAX_ITEMS:
+        return Response({'error': f'At most {settings.BATCH_MAX_ITEMS} items per request'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    return None
+
+
+def invalid(index, errors):
+    return {'index': index, 'status': INVALID, 'errors': errors}
+
+
+def validate_updates(items, serializer_class, results):
+    """
+    Validates the partial updates of a batch PATCH, without queries.
+
+    Args:
+        items (list): The items of the request, each a dict with an 'id' and the fields to set.
+        serializer_class (Serializer): Validates the fields with partial=True; must not query the database.
+        results (list): The per-item results; invalid items get theirs.
+
+    Returns:
+        dict: {index: (pk, validated changes)} for the valid items.
+    """
+    writable = None
+    seen = set()
+    updates = {}
+    for index, item in enumerate(items):
+        pk = item.get('id') if isinstance(item, dict) else None
+        if not isinstance(pk, int) or isinstance(pk, bool):
+            results[index] = invalid(index, {'id': ['A valid integer is required.']})
+            continue
+        if pk in seen:
+            results[index] = invalid(index, {'id': ['Given more than once in the batch.']})
+            continue
+        seen.add(pk)
+
+        changes = {name: value for name, value in item.items() if name != 'id'}
+        serializer = serializer_class(data=changes, partial=True)
+        if writable is None:
+            writable = {name for name, field in serializer.fields.items() if not field.read_only}
+        unknown = sorted(set(changes) - writable)
+        if unknown:
+            results[index] = invalid(index, {name: ['Not updatable in a batch.'] for name in unknown})
+        elif not changes:
+            results[index] = invalid(index, {'id': ['No fields to update.']})
+        elif serializer.is_valid():
+            updates[index] = (pk, dict(serializer.validated_data))
+        else:
+            results[index] = invalid(index, serializer.errors)
+    return updates
+
+
+def validate_ids(items, results):
+    """
+    Validates the ids of a batch DELETE.
+
+    Returns:
+        dict: {index: pk} for the valid items.
+    """
+    seen = set()
+    ids = {}
+    for index, pk in enumerate(items):
+        if not isinstance(pk, int) or isinstance(pk, bool):
+            results[index] = invalid(index, {'id': ['A valid integer is required.']})
+        elif pk in seen:
+            results[index] = invalid(index, {'id': ['Given more than once in the batch.']})
+        else:
+            seen.add(pk)
+            ids[index] = pk
+    return ids
+
+
+def drop_missing(items, found, results):
+    """
+    Marks the items whose record does not exist as not found.
+
+    Args:
+        items (dict): {index: pk} or {index: (pk, changes)}, as returned by the validate functions.
+        found (collection): The primary keys that exist.
+        results (list): The per-item results.
+
+    Returns:
+        dict: The items whose record exists.
+    """
+    kept = {}
+    for index, item in items.items():
+        pk = item[0] if isinstance(item, tuple) else item
+        if pk in found:
+            kept[index] = item
+        else:
+            results[index] = {'index': index, 'id': pk, 'status': NOT_FOUND}
+    return kept
+
+
+def apply_updates(model, updates):
+    """
+    Applies partial updates with one set-based update() per distinct set of changes.
+
+    updated_at is set explicitly, as update() does not apply auto_now.
+    Should be called in a transaction.
+
+    Args:
+        model (Model): The model updated.
+        updates (iterable): (pk, changes) pairs, changes being a dict of model field values.
+
+    Returns:
+        int: The number of UPDATE statements run.
+    """
+    groups = {}
+    for pk, changes in updates:
+        groups.setdefault(tuple(sorted(changes.items())), (changes, []))[1].append(pk)
+    now = timezone.now()
+    for changes, pks in groups.values():
+        model.objects.filter(pk__in=pks).update(**changes, updated_at=now)
+    return len(groups)
+
+
+def batch_response(results, items, done):
+    """
+    Builds the response of a batch request.
+
+    Args:
+        results (list): The per-item results; the ones still None are the applied items.
+        items (dict): {index: pk} or {index: (pk, changes)} of the applied items.
+        done (str): UPDATED or DELETED.
+
+    Returns:
+        Response: 200 if every item was applied, 207 otherwise, with counts and the per-item results.
+    """
+    for index, item in items.items():
+        results[index] = {'index': index, 'id': item[0] if isinstance(item, tuple) else item, 'status': done}
+    summary = {name: sum(1 for result in results if result['status'] == name) for name in (done, NOT_FOUND, INVALID)}
+    summary['results'] = results
+    all_done = summary[done] == len(results)
+    return Response(summary, status=status.HTTP_200_OK if all_done else status.HTTP_207_MULTI_STATUS)
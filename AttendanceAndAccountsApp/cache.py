@@ -0,0 +1,281 @@
+"""
+Read-through response cache for the list endpoints.
+
+Responses are stored in the 'responses' cache under a key made of the
+collection's generation number, the endpoint and the normalized query
+parameters. Write endpoints call invalidate(), which bumps the generation of
+the collection so that every response cached before the write becomes
+unreachable and is eventually evicted by the cache backend.
+
+The generation and the time of the last write of a collection are its version
+stamps. They are kept in the database (changes.models.CollectionVersion), so a
+write handled by one worker process makes the responses cached by every
+process unreachable, even with a per-process cache backend, and all processes
+hand out the same validators: list responses carry an ETag and a Last-Modified
+header derived from the stamps, and conditional GETs (If-None-Match,
+If-Modified-Since) that still match get a 304 before the list query runs.
+"""
+
+import functools
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from changes.models import CollectionVersion
+from .filters import DEBUG_PARAM
+
+RESPONSE_CACHE_ALIAS = 'responses'
+
+# Only successful and not found responses are cached
+CACHED_STATUSES = (200, 404)
+
+_stats = {'hits': 0, 'misses': 0}
+_stats_lock = threading.Lock()
+
+
+def version(collection):
+    """
+    Returns the version stamps of a collection: its generation number and the time of its last write.
+
+    Missing stamps (never bumped) are initialised from the clock, so the generation
+    never goes back to a number used by responses cached earlier, and the time
+    errs on the side of reporting the collection as modified.
+
+    Args:
+        collection (str): The collection name, e.g. 'users', 'attendance' or 'accounts'.
+
+    Returns:
+        tuple: The generation number and the time of the last write as a Unix timestamp.
+    """
+    versions = CollectionVersion.objects.filter(pk=collection).values_list('generation', 'modified_at')
+    stamps = versions.first()
+    if stamps is None:
+        try:
+            with transaction.atomic():
+                created = CollectionVersion.objects.create(collection=collection, generation=time.time_ns())
+            stamps = created.generation, created.modified_at
+        except IntegrityError:
+            # Another request initialised them first
+            stamps = versions.get()
+    return stamps[0], stamps[1].timestamp()
+
+
+def generation(collection):
+    """
+    Returns the current generation number of a collection (see version()).
+
+    Args:
+        collection (str): The collection name.
+
+    Returns:
+        int: The generation number.
+    """
+    return version(collection)[0]
+
+
+def bump_generation(collection):
+    """
+    Increments the generation number of a collection and records the time of the write.
+
+    Args:
+        collection (str): The collection name.
+    """
+    versions = CollectionVersion.objects.filter(pk=collection)
+    if not versions.update(generation=F('generation') + 1, modified_at=timezone.now()):
+        try:
+            with transaction.atomic():
+                CollectionVersion.objects.create(collection=collection, generation=time.time_ns())
+        except IntegrityError:
+            versions.update(generation=F('generation') + 1, modified_at=timezone.now())
+
+
+def invalidate(*collections):
+    """
+    Invalidates the cached responses of collections once the current transaction commits.
+
+    Args:
+        *collections (str): The names of the collections that were written to.
+    """
+    def bump():
+        for collection in collections:
+            bump_generation(collection)
+
+    transaction.on_commit(bump)
+
+
+def response_cache_key(collection, request):
+    """
+    Builds the cache key of a request to a list endpoint.
+
+    Query parameters are sorted, so the same filters in a different order share an entry.
+
+    Args:
+        collection (str): The collection the endpoint reads.
+        request (HttpRequest): The incoming request; a DRF Request or a plain Django request.
+
+    Returns:
+        str: The cache key.
+    """
+    return f'response:{collection}:{generation(collection)}:{_request_digest(request)}'
+
+
+def _request_digest(request):
+    params = sorted((key, tuple(values)) for key, values in request.GET.lists())
+    return hashlib.sha1(repr((request.path, params)).encode()).hexdigest()
+
+
+def is_conditional(request):
+    """
+    Checks whether a request to a list endpoint gets validators and may be answered with a 304.
+    """
+    return request.method == 'GET' and DEBUG_PARAM not in request.GET
+
+
+def validators(collection, request):
+    """
+    Computes the ETag and Last-Modified time of a list response from the version stamps of its collection.
+
+    Only the version stamps are looked up, by primary key: the ETag combines the
+    generation with the path and query parameters, and the time is that of the last write.
+
+    Args:
+        collection (str): The collection the endpoint reads.
+        request (HttpRequest): The incoming request.
+
+    Returns:
+        tuple: The (weak) ETag and the last modification time as a Unix timestamp.
+    """
+    current, modified = version(collection)
+    etag = f'W/"{current}-{_request_digest(request)[:16]}"'
+    return etag, int(modified)
+
+
+def not_modified(request, etag, modified):
+    """
+    Answers a conditional GET whose validators still match.
+
+    Returns:
+        HttpResponse: A 304 response carrying the validators, or None if the full response must be sent.
+    """
+    response = get_conditional_response(request, etag=etag, last_modified=modified)
+    if response is not None:
+        set_validators(response, etag, modified)
+    return response
+
+
+def set_validators(response, etag, modified):
+    """
+    Adds the ETag and Last-Modified headers to a successful or not modified response.
+
+    Returns:
+        HttpResponse: The response.
+    """
+    if response.status_code in (200, 304):
+        response.headers['ETag'] = etag
+        response.headers['Last-Modified'] = http_date(modified)
+    return response
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def cache_stats():
+    """
+    Returns the hit and miss counters of the response cache in this process.
+
+    Returns:
+        dict: The number of hits and misses and the hit ratio.
+    """
+    with _stats_lock:
+        hits, misses = _stats['hits'], _stats['misses']
+    total = hits + misses
+    return {'hits': hits, 'misses': misses, 'hit_ratio': round(hits / total, 4) if total else None}
+
+
+def is_cacheable(request):
+    """
+    Checks whether the response to a request may be served from and stored in the response cache.
+    """
+    return settings.RESPONSE_CACHE_ENABLED and request.method == 'GET' and DEBUG_PARAM not in request.GET
+
+
+def get_cached(collection, request):
+    """
+    Looks a request up in the response cache and counts the hit or miss.
+
+    Args:
+        collection (str): The collection the endpoint reads.
+        request (HttpRequest): The incoming request.
+
+    Returns:
+        tuple: The cache key and the cached (data, status) pair, or None on a miss.
+    """
+    key = response_cache_key(collection, request)
+    cached = caches[RESPONSE_CACHE_ALIAS].get(key)
+    _count('misses' if cached is None else 'hits')
+    return key, cached
+
+
+def store(key, data, status):
+    """
+    Stores the data and status of a response under a key returned by get_cached().
+    """
+    if status in CACHED_STATUSES:
+        caches[RESPONSE_CACHE_ALIAS].set(key, (data, status))
+
+
+def cached_response(collection):
+    """
+    Decorator caching the responses of a list endpoint reading the given collection.
+
+    Only 200 and 404 responses are cached; streaming responses and query plan
+    requests are passed through. Successful responses carry an ETag and a
+    Last-Modified header, and conditional GETs that match them get a 304
+    without calling the view.
+    Apply it below @api_view so that the view receives the DRF request.
+
+    Args:
+        collection (str): The collection the endpoint reads.
+
+    Returns:
+        function: The decorator.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not is_conditional(request):
+                return view(request, *args, **kwargs)
+
+            # The validators are read before the query, so they never claim newer data than the response has
+            etag, modified = validators(collection, request)
+            response = not_modified(request, etag, modified)
+            if response is not None:
+                return response
+            return set_validators(read(request, *args, **kwargs), etag, modified)
+
+        def read(request, *args, **kwargs):
+            if not is_cacheable(request):
+                return view(request, *args, **kwargs)
+
+            key, cached = get_cached(collection, request)
+            if cached is not None:
+                data, status = cached
+                return Response(data, status=status)
+
+            response = view(request, *args, **kwargs)
+            if isinstance(response, Response):
+                store(key, response.data, response.status_code)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,86 @@
+"""
+Database settings read from the environment.
+
+<PREFIX>_ENGINE selects the backend of a database ('DATABASE' for the default one):
+
+- 'djongo': MongoDB through djongo, which translates every ORM query into a Mongo query at runtime.
+- 'sqlite': a local SQLite file.
+- 'postgres': PostgreSQL through psycopg2 (pip install psycopg2-binary).
+
+<PREFIX>_NAME, _HOST, _PORT, _USER and _PASSWORD locate the database.
+Connections are kept open between requests for <PREFIX>_CONN_MAX_AGE seconds
+(default 60; 0 closes them after every request), so a request does not pay for
+a new connection or, with djongo, a new MongoClient and TLS handshake. The
+relational backends check a persistent connection before reusing it
+(<PREFIX>_CONN_HEALTH_CHECKS, on by default).
+"""
+
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+ENGINES = {
+    'djongo': 'djongo',
+    'sqlite': 'django.db.backends.sqlite3',
+    'postgres': 'django.db.backends.postgresql',
+}
+
+
+def env_flag(name, default=False):
+    value = os.environ.get(name)
+    return default if value is None else value.lower() in ('1', 'true', 'yes')
+
+
+# Database name used when <PREFIX>_NAME is not set, except for SQLite
+DEFAULT_NAME = 'employeeManagment'
+
+
+def database_config(prefix='DATABASE', engine='djongo', sqlite_path=None):
+    """
+    Builds an entry of settings.DATABASES from <prefix>_* environment variables.
+
+    Args:
+        prefix (str): The prefix of the environment variables.
+        engine (str): The backend used when <prefix>_ENGINE is not set.
+        sqlite_path (Path, optional): The SQLite file used when <prefix>_NAME is not set.
+
+    Returns:
+        dict: The database settings.
+
+    Raises:
+        ImproperlyConfigured: If the engine is unknown.
+    """
+    def env(key, default=None):
+        return os.environ.get(f'{prefix}_{key}', default)
+
+    engine = env('ENGINE', engine).lower()
+    if engine not in ENGINES:
+        raise ImproperlyConfigured(f'{prefix}_ENGINE must be one of {list(ENGINES)}, not {engine!r}')
+
+    if engine == 'djongo':
+        config = {
+            'ENGINE': ENGINES[engine],
+            'ENFORCE_SCHEMA': False,
+            'CLIENT': {
+                'host': env('HOST', 'mongodb_uri_atlas'),
+                'username': env('USER', 'mongodb_atlas_uname'),
+                'password': env('PASSWORD', 'mongodb_atlas_password'),
+                'name': env('NAME', 'db_name'),
+                'authMechanism': 'SCRAM-SHA-1'
+            },
+        }
+    else:
+        config = {
+            'ENGINE': ENGINES[engine],
+            'NAME': env('NAME', sqlite_path if engine == 'sqlite' else DEFAULT_NAME),
+            'CONN_HEALTH_CHECKS': env_flag(f'{prefix}_CONN_HEALTH_CHECKS', True),
+        }
+        if engine == 'postgres':
+            config.update({
+                'HOST': env('HOST', 'localhost'),
+                'PORT': env('PORT', '5432'),
+                'USER': env('USER', 'postgres'),
+                'PASSWORD': env('PASSWORD', ''),
+            })
+    config['CONN_MAX_AGE'] = int(env('CONN_MAX_AGE', 60))
+    return config
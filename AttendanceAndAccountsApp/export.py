@@ -0,0 +1,215 @@
+"""
+Streaming CSV and NDJSON exports of the attendance and accounts records.
+
+Rows are read with QuerySet.iterator() over values() and written chunk by
+chunk, so memory use stays flat however many rows are exported. The header
+(CSV) is sent before the query runs, so the first byte goes out right away.
+Output can be gzip-compressed on the fly; each chunk is flushed through the
+compressor, so the client keeps receiving data while the export runs.
+"""
+
+import csv
+import io
+import json
+import sys
+import zlib
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from rest_framework import serializers
+from rest_framework.utils.encoders import JSONEncoder
+
+from .filters import filter_queryset
+from .pagination import iterate_rows
+from .serialization import LeanSerializer, parse_fields
+
+# Query parameter selecting the export format, e.g. ?export_format=ndjson
+# ('format' is taken by the REST framework's renderer override)
+FORMAT_PARAM = 'export_format'
+CSV = 'csv'
+NDJSON = 'ndjson'
+CONTENT_TYPES = {CSV: 'text/csv; charset=utf-8', NDJSON: 'application/x-ndjson'}
+
+
+def parse_format(value):
+    """
+    Validates the export format query parameter.
+
+    Args:
+        value (str): 'csv' or 'ndjson', or None for CSV.
+
+    Returns:
+        str: The export format.
+    """
+    value = (value or CSV).lower()
+    if value not in CONTENT_TYPES:
+        raise serializers.ValidationError({FORMAT_PARAM: f'Unknown format; choose one of {list(CONTENT_TYPES)}'})
+    return value
+
+
+def export_chunks(queryset, lean, export_format, chunk_size=None):
+    """
+    Generates the export of a queryset as text chunks.
+
+    Args:
+        queryset (QuerySet): The ordered values() queryset to export, or an iterator of rows.
+        lean (LeanSerializer): Converts the rows to their representation.
+        export_format (str): CSV or NDJSON.
+        chunk_size (int, optional): Rows fetched and written per chunk.
+
+    Yields:
+        str: The header (CSV only), then one chunk of rows at a time.
+    """
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if export_format == CSV:
+        writer.writerow(lean.fields)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    count = 0
+    for row in iterate_rows(queryset, chunk_size):
+        data = lean.row(row)
+        if export_format == CSV:
+            writer.writerow([data[name] for name in lean.fields])
+        else:
+            buffer.write(json.dumps(data, cls=JSONEncoder, separators=(',', ':')))
+            buffer.write('\n')
+        count += 1
+        # The first row is sent on its own, so the client sees data as soon as the query returns
+        if count == 1 or count % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def gzip_chunks(chunks, level=6):
+    """
+    Compresses text chunks into a gzip stream, flushing the compressor after every chunk.
+
+    Yields:
+        bytes: The compressed stream.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        yield data + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+def accepts_gzip(request):
+    return 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '').lower()
+
+
+def export_response(request, queryset, lean, export_format, filename):
+    """
+    Streams an export as a file download, gzip-compressed if the client accepts it.
+
+    Args:
+        request (Request): The incoming request.
+        queryset (QuerySet): The ordered values() queryset to export.
+        lean (LeanSerializer): Converts the rows to their representation.
+        export_format (str): CSV or NDJSON.
+        filename (str): The name of the file, without extension.
+
+    Returns:
+        StreamingHttpResponse: The streamed export.
+    """
+    chunks = export_chunks(queryset, lean, export_format)
+    compress = accepts_gzip(request)
+    response = StreamingHttpResponse(gzip_chunks(chunks) if compress else (chunk.encode() for chunk in chunks),
+                                     content_type=CONTENT_TYPES[export_format])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+    if compress:
+        response['Content-Encoding'] = 'gzip'
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+def write_export(output, queryset, lean, export_format, compress=False, chunk_size=None):
+    """
+    Writes an export to a binary file, for the export management commands.
+
+    Args:
+        output (file): A file opened in binary mode.
+        queryset (QuerySet): The ordered values() queryset to export.
+        lean (LeanSerializer): Converts the rows to their representation.
+        export_format (str): CSV or NDJSON.
+        compress (bool): Whether to write gzip.
+        chunk_size (int, optional): Rows fetched and written per chunk.
+    """
+    chunks = export_chunks(queryset, lean, export_format, chunk_size)
+    for data in gzip_chunks(chunks) if compress else (chunk.encode() for chunk in chunks):
+        output.write(data)
+
+
+class ExportCommand(BaseCommand):
+    """
+    Base class of the export management commands; subclasses set the attributes below.
+
+    Attributes:
+        model (Model): The model to export.
+        serializer_class (Serializer): The serializer whose representation is exported.
+        filter_class (Serializer): The serializer declaring the supported filters.
+        list_fields (tuple): The fields that may be exported.
+        ordering (tuple): The order of the exported rows.
+    """
+
+    model = None
+    serializer_class = None
+    filter_class = None
+    list_fields = ()
+    ordering = ()
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=list(CONTENT_TYPES), default=CSV, dest='export_format',
+                            help='Output format (default: csv).')
+        parser.add_argument('--output', default='-',
+                            help='Path of the output file; gzip-compressed if it ends with .gz (default: stdout).')
+        parser.add_argument('--gzip', action='store_true', help='Compress the output with gzip.')
+        parser.add_argument('--filter', action='append', default=[], dest='filters', metavar='LOOKUP=VALUE',
+                            help='A filter of the list endpoint, e.g. --filter date__gte=2023-01-01; repeatable.')
+        parser.add_argument('--fields', help='Comma separated fields to export (default: all).')
+        parser.add_argument('--chunk-size', type=int, help='Rows fetched and written per chunk (default: EXPORT_CHUNK_SIZE).')
+
+    def handle(self, *args, **options):
+        try:
+            params = dict(item.split('=', 1) for item in options['filters'])
+        except ValueError:
+            raise CommandError('Filters must be given as LOOKUP=VALUE')
+        try:
+            lean = LeanSerializer(self.serializer_class, parse_fields(options['fields'], self.list_fields))
+            records = self.get_records(params, lean.fields, options['chunk_size'] or settings.EXPORT_CHUNK_SIZE)
+        except serializers.ValidationError as e:
+            raise CommandError('; '.join(f'{key}: {" ".join(map(str, value)) if isinstance(value, list) else value}'
+                                         for key, value in e.detail.items()))
+
+        output = options['output']
+        compress = options['gzip'] or output.endswith('.gz')
+        if output == '-':
+            write_export(sys.stdout.buffer, records, lean, options['export_format'], compress, options['chunk_size'])
+            return
+        with open(output, 'wb') as f:
+            write_export(f, records, lean, options['export_format'], compress, options['chunk_size'])
+        self.stderr.write(self.style.SUCCESS(f'Exported {self.model._meta.verbose_name_plural} to {output}'))
+
+    def get_records(self, params, fields, chunk_size):
+        """
+        Reads the exported rows.
+
+        Args:
+            params (dict): The filters given on the command line.
+            fields (tuple): The fields to read.
+            chunk_size (int): Rows fetched per chunk.
+
+        Returns:
+            QuerySet: The ordered values() queryset to export, or an iterator of rows.
+        """
+        return filter_queryset(self.model.objects.all(), self.filter_class, params) \
+            .values(*fields).order_by(*self.ordering)
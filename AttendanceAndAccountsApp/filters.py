@@ -0,0 +1,118 @@
+"""
+Declared filters for the list endpoints.
+
+Each list endpoint declares the query parameters it can filter on as a
+Serializer whose field names are Django lookups (e.g. 'date__gte') backed by
+an index. Parameters are parsed by the serializer fields, so values are typed,
+and any other parameter is rejected instead of being passed to .filter().
+"""
+
+from django.core.exceptions import EmptyResultSet
+from rest_framework import serializers
+from rest_framework.exceptions import PermissionDenied
+
+# Query parameter returning the query plan instead of the data, e.g. ?debug=plan
+DEBUG_PARAM = 'debug'
+
+
+def validate_filters(filter_class, params):
+    """
+    Parses query parameters into the lookups declared by filter_class.
+
+    Args:
+        filter_class (Serializer): The serializer declaring the supported filters.
+        params (dict): The query parameters left after removing pagination, fields and debug parameters.
+
+    Returns:
+        dict: The lookups and their typed values, ready for .filter().
+
+    Raises:
+        ValidationError: If a parameter is not a supported filter or has an invalid value.
+    """
+    supported = filter_class().fields
+    unknown = sorted(set(params) - set(supported))
+    if unknown:
+        raise serializers.ValidationError(
+            {'filters': f'Unsupported filters {unknown}; supported filters are {sorted(supported)}'})
+
+    schema = filter_class(data=params)
+    schema.is_valid(raise_exception=True)
+    return schema.validated_data
+
+
+def filter_queryset(queryset, filter_class, params):
+    """
+    Applies the filters declared by filter_class to a queryset.
+
+    Args:
+        queryset (QuerySet): The queryset to filter.
+        filter_class (Serializer): The serializer declaring the supported filters.
+        params (dict): The query parameters left after removing pagination, fields and debug parameters.
+
+    Returns:
+        QuerySet: The filtered queryset.
+
+    Raises:
+        ValidationError: If a parameter is not a supported filter or has an invalid value.
+    """
+    return queryset.filter(**validate_filters(filter_class, params))
+
+
+def wants_query_plan(request, params):
+    """
+    Removes the debug parameter from params and checks whether a query plan was requested.
+
+    Query plans are only returned to staff users.
+
+    Args:
+        request (Request): The incoming request.
+        params (dict): The query parameters of the request.
+
+    Returns:
+        bool: True if the response should be the query plan of the request.
+
+    Raises:
+        PermissionDenied: If a query plan was requested by a user who is not staff.
+    """
+    if params.pop(DEBUG_PARAM, None) != 'plan':
+        return False
+    if not request.user.is_staff:
+        raise PermissionDenied('Query plans are only available to staff users.')
+    return True
+
+
+def query_plan(queryset):
+    """
+    Describes how the database would execute a queryset, without running it.
+
+    Args:
+        queryset (QuerySet): The final queryset of a list endpoint.
+
+    Returns:
+        dict: The SQL and the database's query plan.
+    """
+    try:
+        sql = str(queryset.query)
+    except EmptyResultSet:
+        sql = None
+    try:
+        plan = queryset.explain()
+    except Exception as e:
+        # Not every backend (e.g. djongo) implements EXPLAIN
+        plan = f'Unavailable: {e}'
+    return {'sql': sql, 'plan': plan}
+
+
+def query_plans(querysets):
+    """
+    Describes the querysets of an endpoint reading several tables, without running them.
+
+    Args:
+        querysets (list): The final querysets of a list endpoint.
+
+    Returns:
+        dict: The query_plan() of the single queryset, or the plans of all of them under 'partitions'.
+    """
+    if len(querysets) == 1:
+        return query_plan(querysets[0])
+    return {'partitions': [query_plan(queryset) for queryset in querysets]}
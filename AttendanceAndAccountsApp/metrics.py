@@ -0,0 +1,205 @@
+"""
+In-process performance metrics exposed in the Prometheus text format.
+
+PerformanceMiddleware records per-request timings into histograms labelled
+with the URL name and route of the view. Code running inside a request can add
+named timings (e.g. 'serialize' or 'auth') with timed(); outside of an
+instrumented request timed() does nothing. Other components can publish
+gauges, such as the depth of a queue, with set_gauge().
+
+Metrics are kept per process; with several workers, scrape each of them.
+"""
+
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds of the histogram buckets
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250, 1000)
+
+_current_timings = contextvars.ContextVar('request_timings', default=None)
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+_gauges = {}
+_help = {}
+
+
+class Histogram:
+    """
+    A cumulative histogram in the Prometheus sense.
+
+    Attributes:
+        buckets (tuple): The upper bounds of the buckets.
+        counts (list): The number of observations per bucket (not cumulative).
+        total (float): The sum of all observations.
+        count (int): The number of observations.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        self.total += value
+        self.count += 1
+
+
+def start_request():
+    """
+    Starts collecting named timings for the current request.
+
+    Returns:
+        tuple: The timings dict and the token to pass to finish_request().
+    """
+    timings = {}
+    return timings, _current_timings.set(timings)
+
+
+def finish_request(token):
+    _current_timings.reset(token)
+
+
+def current_timings():
+    """
+    Returns the timings of the current request, or None outside of an instrumented request.
+    """
+    return _current_timings.get()
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Database execute wrapper counting the queries of the current request and their duration.
+
+    It is installed on every connection once and passes queries straight through outside of
+    an instrumented request. The request context is copied into the threads that
+    sync_to_async runs queries in, so queries of async views are counted as well.
+    """
+    timings = _current_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings['db'] = timings.get('db', 0.0) + time.perf_counter() - start
+        timings['queries'] = timings.get('queries', 0) + 1
+
+
+def add_timing(name, seconds):
+    """
+    Adds time to a named timing of the current request, if it is instrumented.
+    """
+    timings = _current_timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+@contextmanager
+def timed(name):
+    """
+    Context manager adding the time spent in its block to a named timing of the current request.
+
+    Example:
+        with timed('serialize'):
+            data = serializer.data
+    """
+    if _current_timings.get() is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_timing(name, time.perf_counter() - start)
+
+
+def observe(name, labels, value, buckets=DURATION_BUCKETS, help_text=''):
+    """
+    Records an observation in a histogram.
+
+    Args:
+        name (str): The metric name.
+        labels (tuple): (label, value) pairs.
+        value (float): The observed value.
+        buckets (tuple): The bucket bounds, used when the histogram is created.
+        help_text (str): The metric description.
+    """
+    with _lock:
+        histogram = _histograms.get((name, labels))
+        if histogram is None:
+            histogram = _histograms[(name, labels)] = Histogram(buckets)
+            _help.setdefault(name, help_text)
+        histogram.observe(value)
+
+
+def increment(name, labels, help_text='', amount=1):
+    """
+    Increments a counter.
+    """
+    with _lock:
+        _counters[(name, labels)] = _counters.get((name, labels), 0) + amount
+        _help.setdefault(name, help_text)
+
+
+def set_gauge(name, value, labels=(), help_text=''):
+    """
+    Sets the current value of a gauge.
+    """
+    with _lock:
+        _gauges[(name, labels)] = value
+        _help.setdefault(name, help_text)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels, extra=()):
+    pairs = tuple(labels) + tuple(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs) + '}'
+
+
+def render_prometheus():
+    """
+    Renders every metric in the Prometheus text exposition format.
+
+    Returns:
+        str: The metrics.
+    """
+    lines = []
+    seen = set()
+
+    def header(name, kind):
+        if name not in seen:
+            seen.add(name)
+            lines.append(f'# HELP {name} {_help.get(name, "")}')
+            lines.append(f'# TYPE {name} {kind}')
+
+    with _lock:
+        for (name, labels), histogram in sorted(_histograms.items()):
+            header(name, 'histogram')
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{_format_labels(labels, [("le", bound)])} {cumulative}')
+            lines.append(f'{name}_bucket{_format_labels(labels, [("le", "+Inf")])} {histogram.count}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {histogram.total}')
+            lines.append(f'{name}_count{_format_labels(labels)} {histogram.count}')
+        for (name, labels), value in sorted(_counters.items()):
+            header(name, 'counter')
+            lines.append(f'{name}{_format_labels(labels)} {value}')
+        for (name, labels), value in sorted(_gauges.items()):
+            header(name, 'gauge')
+            lines.append(f'{name}{_format_labels(labels)} {value}')
+    return '\n'.join(lines) + '\n'
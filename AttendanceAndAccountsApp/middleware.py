@@ -0,0 +1,117 @@
+"""
+Per-request performance instrumentation.
+
+PerformanceMiddleware measures the total time of every request, the number of
+database queries and the time spent in them, plus the named timings recorded
+with metrics.timed() (authentication, serialization) and the rendering of the
+response. The values are returned in a Server-Timing header and recorded in
+histograms per URL name, which are served in the Prometheus format at /metrics.
+
+The middleware works in both the WSGI (sync) and the ASGI (async) stack. With
+settings.PERF_METRICS_ENABLED off it removes itself from the stack at startup
+and no query wrapper is installed, so it costs nothing.
+"""
+
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from . import metrics
+
+
+def install_query_wrapper(sender=None, connection=None, **kwargs):
+    """
+    Installs metrics.record_query on a database connection, once.
+    """
+    if metrics.record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(metrics.record_query)
+
+
+class PerformanceMiddleware:
+    """
+    Middleware recording query count, DB time, serialization time and total time per request.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PERF_METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+        connection_created.connect(install_query_wrapper, dispatch_uid='perf_metrics_query_wrapper')
+        for connection in connections.all():
+            install_query_wrapper(connection=connection)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        timings, token = metrics.start_request()
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.finish_request(token)
+        return self.finish(request, response, timings, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        timings, token = metrics.start_request()
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.finish_request(token)
+        return self.finish(request, response, timings, time.perf_counter() - start)
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after the view returns; time the rendering too
+        render = response.render
+
+        def timed_render():
+            with metrics.timed('render'):
+                return render()
+
+        response.render = timed_render
+        return response
+
+    def finish(self, request, response, timings, total):
+        response['Server-Timing'] = self.server_timing(timings, total)
+        self.record(request, response, timings, total)
+        return response
+
+    @staticmethod
+    def server_timing(timings, total):
+        entries = [f'db;dur={timings.get("db", 0.0) * 1000:.3f};desc="{timings.get("queries", 0)} queries"']
+        entries += [f'{name};dur={seconds * 1000:.3f}' for name, seconds in timings.items()
+                    if name not in ('db', 'queries')]
+        entries.append(f'total;dur={total * 1000:.3f}')
+        return ', '.join(entries)
+
+    @staticmethod
+    def record(request, response, timings, total):
+        match = request.resolver_match
+        labels = (
+            ('view', match.url_name if match else 'unresolved'),
+            ('route', match.route if match else 'unresolved'),
+            ('method', request.method),
+        )
+        metrics.observe('http_request_duration_seconds', labels, total,
+                        help_text='Total time spent handling the request.')
+        metrics.observe('http_request_db_duration_seconds', labels, timings.get('db', 0.0),
+                        help_text='Time spent in database queries.')
+        metrics.observe('http_request_db_queries', labels, timings.get('queries', 0), buckets=metrics.COUNT_BUCKETS,
+                        help_text='Number of database queries.')
+        for name in ('auth', 'serialize', 'render'):
+            if name in timings:
+                metrics.observe(f'http_request_{name}_duration_seconds', labels, timings[name],
+                                help_text=f'Time spent in {name}.')
+        metrics.increment('http_responses_total', labels + (('status', response.status_code),),
+                          help_text='Number of responses by status code.')
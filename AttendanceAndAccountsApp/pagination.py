@@ -0,0 +1,235 @@
+"""
+Keyset pagination and streaming helpers for the list endpoints.
+
+Instead of loading a whole collection into memory, list endpoints can hand
+out fixed-size pages ordered on an indexed key (for example ``(date, id)``),
+or stream the collection as a JSON array straight from a chunked queryset
+iterator.
+"""
+
+import base64
+import binascii
+import heapq
+import json
+
+from django.conf import settings
+from django.db.models import Q, QuerySet
+from django.http import StreamingHttpResponse
+from rest_framework import serializers
+from rest_framework.utils.encoders import JSONEncoder
+
+# Query parameters consumed by the helpers below; they must never reach .filter().
+PAGINATION_PARAMS = ('cursor', 'page_size', 'stream')
+
+TRUE_VALUES = ('1', 'true', 'yes', 'on')
+
+
+def parse_bool(value):
+    """
+    Interprets a query parameter as a boolean flag.
+
+    Args:
+        value (str): The raw query parameter value, or None if it was not given.
+
+    Returns:
+        bool: True for values such as '1', 'true' or 'yes'.
+    """
+    return value is not None and value.lower() in TRUE_VALUES
+
+
+def get_page_size(value):
+    """
+    Validates a requested page size against the configured limits.
+
+    Args:
+        value (str): The raw 'page_size' query parameter, or None.
+
+    Returns:
+        int: The page size to use.
+    """
+    if value is None:
+        return settings.LIST_PAGE_SIZE
+    try:
+        page_size = int(value)
+    except (TypeError, ValueError):
+        raise serializers.ValidationError({'page_size': 'A valid integer is required.'})
+    if page_size < 1:
+        raise serializers.ValidationError({'page_size': 'Must be a positive integer.'})
+    return min(page_size, settings.LIST_MAX_PAGE_SIZE)
+
+
+def encode_cursor(values):
+    """
+    Encodes the key of the last row of a page into an opaque cursor.
+
+    Args:
+        values (list): The ordering key values of the last row.
+
+    Returns:
+        str: A url-safe cursor string.
+    """
+    raw = json.dumps(values, cls=JSONEncoder).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor, ordering):
+    """
+    Decodes a cursor produced by encode_cursor.
+
+    Args:
+        cursor (str): The cursor sent by the client.
+        ordering (tuple): The fields the cursor is expected to hold.
+
+    Returns:
+        list: The ordering key values stored in the cursor.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, ValueError):
+        values = None
+    if not isinstance(values, list) or len(values) != len(ordering):
+        raise serializers.ValidationError({'cursor': 'Invalid cursor.'})
+    return values
+
+
+def row_key(row, ordering):
+    """
+    Extracts the ordering key from a model instance or a values() dict.
+    """
+    if isinstance(row, dict):
+        return [row[field] for field in ordering]
+    return [getattr(row, field) for field in ordering]
+
+
+def keyset_filter(queryset, ordering, values):
+    """
+    Restricts a queryset to rows strictly after the given key.
+
+    The row-value comparison ``(a, b) > (x, y)`` is expanded into
+    ``a > x OR (a = x AND b > y)`` so that it can use a compound index.
+
+    Args:
+        queryset (QuerySet): The queryset to restrict.
+        ordering (tuple): The ordering fields, all ascending.
+        values (list): The key of the last row already returned.
+
+    Returns:
+        QuerySet: The restricted queryset.
+    """
+    condition = Q()
+    for index, field in enumerate(ordering):
+        equal = dict(zip(ordering[:index], values[:index]))
+        condition |= Q(**equal, **{f'{field}__gt': values[index]})
+    return queryset.filter(condition)
+
+
+def keyset_page_queryset(queryset, ordering, cursor=None, page_size=None):
+    """
+    Builds the query of one page for keyset (cursor) pagination.
+
+    The query fetches one extra row, so that split_page() can tell whether there is a next page.
+
+    Args:
+        queryset (QuerySet): The filtered queryset to page through.
+        ordering (tuple): The unique, ascending ordering key, e.g. ('date', 'id').
+        cursor (str, optional): The cursor returned with the previous page.
+        page_size (str, optional): The requested number of rows per page.
+
+    Returns:
+        tuple: The sliced queryset and the validated page size.
+    """
+    page_size = get_page_size(page_size)
+    queryset = queryset.order_by(*ordering)
+    if cursor:
+        queryset = keyset_filter(queryset, ordering, decode_cursor(cursor, ordering))
+    return queryset[:page_size + 1], page_size
+
+
+def split_page(rows, ordering, page_size):
+    """
+    Splits the rows fetched by a keyset_page_queryset() query into the page and the next cursor.
+
+    Returns:
+        tuple: The rows of the page and the cursor of the next page (None on the last page).
+    """
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor(row_key(rows[-1], ordering))
+    return rows, next_cursor
+
+
+def merge_rows(row_lists, ordering):
+    """
+    Merges rows read from several tables, each sorted on the ordering key, into one sorted sequence.
+
+    Args:
+        row_lists (list): Iterables of rows, each sorted on ordering.
+        ordering (tuple): The unique, ascending ordering key shared by the rows.
+
+    Returns:
+        iterator: The rows of all the iterables, in order; read lazily.
+    """
+    if len(row_lists) == 1:
+        return iter(row_lists[0])
+    return heapq.merge(*row_lists, key=lambda row: row_key(row, ordering))
+
+
+def keyset_page(queryset, ordering, cursor=None, page_size=None):
+    """
+    Fetches one page of a queryset using keyset (cursor) pagination.
+
+    Args:
+        queryset (QuerySet): The filtered queryset to page through.
+        ordering (tuple): The unique, ascending ordering key, e.g. ('date', 'id').
+        cursor (str, optional): The cursor returned with the previous page.
+        page_size (str, optional): The requested number of rows per page.
+
+    Returns:
+        tuple: The rows of the page and the cursor of the next page (None on the last page).
+    """
+    queryset, page_size = keyset_page_queryset(queryset, ordering, cursor, page_size)
+    return split_page(list(queryset), ordering, page_size)
+
+
+def iterate_rows(rows, chunk_size):
+    """
+    Iterates a queryset with QuerySet.iterator(), or any other iterable of rows as it is.
+    """
+    if isinstance(rows, QuerySet):
+        return rows.iterator(chunk_size=chunk_size)
+    return iter(rows)
+
+
+def stream_json_array(queryset, represent, chunk_size=None):
+    """
+    Streams a queryset as a JSON array, one chunk of rows at a time.
+
+    Rows are read with QuerySet.iterator(), so memory use stays flat no
+    matter how large the collection is.
+
+    Args:
+        queryset (QuerySet): The ordered queryset to stream, or an iterator of rows (see merge_rows).
+        represent (callable): Converts one row into its JSON-serializable representation.
+        chunk_size (int, optional): Rows fetched and written per chunk.
+
+    Returns:
+        StreamingHttpResponse: A response streaming the JSON array.
+    """
+    chunk_size = chunk_size or settings.LIST_STREAM_CHUNK_SIZE
+
+    def generate():
+        yield '['
+        separator = ''
+        parts = []
+        for row in iterate_rows(queryset, chunk_size):
+            parts.append(separator + json.dumps(represent(row), cls=JSONEncoder))
+            separator = ','
+            if len(parts) >= chunk_size:
+                yield ''.join(parts)
+                parts = []
+        if parts:
+            yield ''.join(parts)
+        yield ']'
+
+    return StreamingHttpResponse(generate(), content_type='application/json')
@@ -11,10 +11,13 @@ https://docs.djangoproject.com/en/4.1/ref/settings/
 """
 
 from pathlib import Path
-from datetime import timedelta
+from datetime import time, timedelta
+from decimal import Decimal
 import sys
 import os
 
+from .databases import database_config
+
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -42,6 +45,8 @@ INSTALLED_APPS = [
     'users',
     'attendance',
     'accounts',
+    'changes',
+    'benchmarks',
     'rest_framework_simplejwt',
     'rest_framework',
     'django.contrib.messages',
@@ -49,6 +54,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'AttendanceAndAccountsApp.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -81,20 +87,44 @@ WSGI_APPLICATION = 'AttendanceAndAccountsApp.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
+# DATABASE_ENGINE selects djongo (default), sqlite or postgres; see AttendanceAndAccountsApp/databases.py
+# for the other DATABASE_* variables. With TARGET_DATABASE_ENGINE set, a second 'target' database is
+# configured from TARGET_DATABASE_*, to copy the data into with 'manage.py copy_database'.
 DATABASES = {
+    'default': database_config('DATABASE', 'djongo', BASE_DIR / 'db.sqlite3'),
+}
+if os.environ.get('TARGET_DATABASE_ENGINE'):
+    DATABASES['target'] = database_config('TARGET_DATABASE', sqlite_path=BASE_DIR / 'target.sqlite3')
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+# 'responses' holds the cached list responses (AttendanceAndAccountsApp.cache); the local-memory
+# backend evicts the least recently used entries beyond MAX_ENTRIES. List responses are keyed by
+# generation numbers stored in the database, as are the salary ledgers (accounts.ledger), so every
+# worker process sees their invalidation; each process keeps its own copies of the entries.
+CACHES = {
     'default': {
-            'ENGINE': 'djongo',
-            'ENFORCE_SCHEMA': False,
-            'CLIENT': {
-                'host': 'mongodb_uri_atlas',
-                'username': 'mongodb_atlas_uname',
-                'password': 'mongodb_atlas_password',
-                'name': 'db_name',
-                'authMechanism': 'SCRAM-SHA-1'
-            }
-    }
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'default',
+    },
+    'responses': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'responses',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 1000,
+            'CULL_FREQUENCY': 10,
+        },
+    },
 }
 
+RESPONSE_CACHE_ENABLED = True
+
+# Per-request performance metrics: Server-Timing headers and /metrics (AttendanceAndAccountsApp.middleware).
+# /metrics is not authenticated; restrict access to it at the proxy.
+PERF_METRICS_ENABLED = True
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
@@ -142,7 +172,7 @@ AUTH_USER_MODEL = 'users.CustomUser'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-       'rest_framework_simplejwt.authentication.JWTAuthentication',
+       'AttendanceAndAccountsApp.authentication.CachedJWTAuthentication',
        # 'rest_framework.authentication.SessionAuthentication',
        # 'rest_framework.authentication.BasicAuthentication',
     ],
@@ -160,5 +190,88 @@ AUTHENTICATION_BACKENDS = [
     'django.contrib.auth.backends.ModelBackend',
 ]
 
-
-
+# Keyset pagination and streaming of the list endpoints
+LIST_PAGE_SIZE = 100
+LIST_MAX_PAGE_SIZE = 1000
+LIST_STREAM_CHUNK_SIZE = 2000
+
+# CSV / NDJSON exports (AttendanceAndAccountsApp.export): rows fetched and written per chunk
+EXPORT_CHUNK_SIZE = 5000
+
+# Bulk attendance uploads (/attendance/bulk/)
+ATTENDANCE_BULK_MAX_RECORDS = 10000
+ATTENDANCE_BULK_BATCH_SIZE = 1000
+
+# Monthly attendance rollups (attendance.rollups); check-ins after this local time count as late
+ATTENDANCE_LATE_AFTER = time(9, 15)
+ATTENDANCE_ROLLUP_CHUNK_SIZE = 2000
+
+# Write-behind punches (attendance.journal): /attendance/punch/ journals punches locally and a
+# background flusher applies them to DATABASES in batches, at least every flush interval (seconds)
+ATTENDANCE_WRITE_BEHIND = os.environ.get('ATTENDANCE_WRITE_BEHIND', '').lower() in ('1', 'true', 'yes')
+ATTENDANCE_JOURNAL_PATH = BASE_DIR / 'punch_journal.sqlite3'
+ATTENDANCE_JOURNAL_BATCH_SIZE = 500
+ATTENDANCE_JOURNAL_FLUSH_INTERVAL = 1.0
+
+# Org hierarchy (users.hierarchy)
+ORG_HIERARCHY_BATCH_SIZE = 1000
+
+# Monthly payroll run (accounts.payroll)
+PAYROLL_WORKERS = os.cpu_count() or 1
+PAYROLL_CHUNK_SIZE = 500
+PAYROLL_BATCH_SIZE = 1000
+# Paid on top of the hourly rate for each night and weekend hour, as a fraction of it (0.25 = +25%)
+PAYROLL_NIGHT_PREMIUM = Decimal('0')
+PAYROLL_WEEKEND_PREMIUM = Decimal('0')
+
+# Serve the read endpoints (view_users, view_attendance, view_account) with their async
+# variants (AttendanceAndAccountsApp.async_views). Turn it on when the project is served
+# through asgi.py; under WSGI every async view would run in its own event loop.
+ASYNC_READ_VIEWS = os.environ.get('ASYNC_READ_VIEWS', '').lower() in ('1', 'true', 'yes')
+
+# Bulk user import (users.importer); the import_users command hashes passwords in a pool of
+# USER_IMPORT_WORKERS processes, the API in the request's process
+USER_IMPORT_MAX_ROWS = 10000
+USER_IMPORT_BATCH_SIZE = 1000
+USER_IMPORT_WORKERS = os.cpu_count() or 1
+
+# In-process cache of the users authenticated by JWT (AttendanceAndAccountsApp.authentication).
+# Updates and deletes through the API evict a user at once in the process handling them; other
+# processes see them within AUTH_USER_CACHE_TTL seconds. Off, every request loads its user.
+AUTH_USER_CACHE_ENABLED = True
+AUTH_USER_CACHE_TTL = 60
+AUTH_USER_CACHE_MAX_ENTRIES = 10000
+
+# Change feed (changes.feed): entries recorded less than the settle time ago are held back, so that
+# transactions committing out of sequence order are not skipped by a cursor. This is a heuristic:
+# write transactions lasting longer than the settle time after recording their entries can still be skipped.
+CHANGE_FEED_PAGE_SIZE = 1000
+CHANGE_FEED_MAX_PAGE_SIZE = 10000
+CHANGE_FEED_SETTLE_SECONDS = 5
+CHANGE_FEED_BATCH_SIZE = 1000
+
+# Attendance archive (attendance.archive): the 'archive_attendance' command moves records older than
+# ATTENDANCE_HOT_MONTHS months to the archive table, which reads only visit for older date ranges.
+# Raising ATTENDANCE_HOT_MONTHS does not move archived records back; keep it at least as large as
+# when the archive last ran.
+ATTENDANCE_HOT_MONTHS = 12
+ATTENDANCE_ARCHIVE_CHUNK_SIZE = 5000
+
+# Workforce analytics (users.analytics): tenure buckets in whole years, and the users read per chunk
+# by the 'rebuild_workforce_summary' command
+USER_TENURE_BUCKETS = (1, 2, 5, 10)
+WORKFORCE_SUMMARY_CHUNK_SIZE = 2000
+
+# Batch endpoints ('batch/' of the users, attendance and accounts apps): the most items one
+# PATCH or DELETE request may hold; all of them are applied in a single transaction
+BATCH_MAX_ITEMS = 1000
+
+# Working-hours engine (attendance.hours): hours of a day beyond WORK_STANDARD_DAILY_HOURS are overtime,
+# hours between WORK_NIGHT_START and WORK_NIGHT_END (local time, wrapping past midnight when the end
+# comes first) are night hours and hours on WORK_WEEKEND_DAYS (0 = Monday) are weekend hours.
+# The payroll run takes the standard daily hours of each employee from their PayRate instead.
+WORK_STANDARD_DAILY_HOURS = 8
+WORK_NIGHT_START = time(22, 0)
+WORK_NIGHT_END = time(6, 0)
+WORK_WEEKEND_DAYS = (5, 6)
+WORK_HOURS_CHUNK_SIZE = 10000
@@ -0,0 +1,21 @@
+"""
+Django settings for running the benchmarks against a local SQLite database.
+
+Usage:
+    python manage.py migrate --settings=AttendanceAndAccountsApp.settings_bench
+    python manage.py generate_synthetic_org --users 20000 --years 3 --settings=AttendanceAndAccountsApp.settings_bench
+    python manage.py run_benchmarks --settings=AttendanceAndAccountsApp.settings_bench
+
+    # The same against PostgreSQL, after copying the data over (see copy_database)
+    DATABASE_ENGINE=postgres DATABASE_NAME=bench python manage.py run_benchmarks \
+        --settings=AttendanceAndAccountsApp.settings_bench
+"""
+
+from .settings import *  # noqa: F401,F403
+
+DEBUG = False
+
+ALLOWED_HOSTS = ['localhost', '127.0.0.1']
+
+# SQLite unless DATABASE_ENGINE selects another backend, e.g. to compare backends on the same dataset
+DATABASES['default'] = database_config('DATABASE', 'sqlite', BASE_DIR / 'bench.sqlite3')  # noqa: F405
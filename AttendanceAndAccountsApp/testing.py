@@ -0,0 +1,47 @@
+"""
+Fixtures shared by the tests of the apps.
+
+Run the suite against a throwaway SQLite database with
+`DATABASE_ENGINE=sqlite python manage.py test`.
+"""
+
+import datetime
+
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from users.models import CustomUser
+
+
+def make_user(username, **fields):
+    """
+    Creates a user with the required profile fields filled in.
+
+    Args:
+        username (str): The username.
+        **fields: Fields overriding the defaults, e.g. manager or is_staff.
+
+    Returns:
+        CustomUser: The created user.
+    """
+    defaults = {'department': 'IT', 'position': 'Engineer', 'address': 'Main Street 1', 'phone_number': '555-0100'}
+    return CustomUser.objects.create(username=username, **{**defaults, **fields})
+
+
+def at(day, hour, minute=0):
+    """
+    Returns an aware time on the given day in the current time zone.
+    """
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time(hour, minute)))
+
+
+class APITestCase(TestCase):
+    """
+    Base class authenticating an API client as a staff user.
+    """
+
+    def setUp(self):
+        self.admin = make_user('admin', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
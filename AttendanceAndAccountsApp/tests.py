@@ -0,0 +1,137 @@
+import datetime
+import json
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.test import AsyncRequestFactory, SimpleTestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from attendance.models import Attendance
+from attendance.views import view_attendance_async
+from users.models import CustomUser
+from users.views import view_users_async
+from .authentication import CachedJWTAuthentication, UserCache, invalidate_user, user_cache
+from .testing import APITestCase, at, make_user
+
+
+class MetricsTests(APITestCase):
+    """
+    Requests are timed in a Server-Timing header and in the histograms served at /metrics.
+    """
+
+    def test_server_timing_header(self):
+        response = self.client.get('/user/all/')
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('total;dur=', response['Server-Timing'])
+
+    def test_metrics_endpoint(self):
+        self.client.get('/user/all/')
+        response = self.client.get('/metrics')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        text = response.content.decode()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', text)
+        self.assertIn('view="view-users"', text)
+        self.assertIn('http_request_db_queries_bucket{', text)
+
+    @override_settings(PERF_METRICS_ENABLED=False)
+    def test_metrics_can_be_turned_off(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+
+
+class AsyncListViewTests(APITestCase):
+    """
+    The async list views return the same data as the sync ones, authenticated by JWT.
+    """
+
+    def setUp(self):
+        super().setUp()
+        make_user('employee', department='HR')
+        self.factory = AsyncRequestFactory()
+        self.token = str(AccessToken.for_user(self.admin))
+
+    async def get(self, view, path, token=None):
+        request = self.factory.get(path, AUTHORIZATION=f'Bearer {token or self.token}')
+        return await view(request)
+
+    async def test_same_data_as_the_sync_view(self):
+        for path in ('/user/all/', '/user/all/?department=HR&fields=id,username'):
+            response = await self.get(view_users_async, path)
+            self.assertEqual(response.status_code, 200)
+            expected = await sync_to_async(self.client.get)(path)
+            self.assertEqual(json.loads(response.content), json.loads(expected.content))
+
+    async def test_errors(self):
+        self.assertEqual((await self.get(view_users_async, '/user/all/?password=x')).status_code, 400)
+        self.assertEqual((await self.get(view_attendance_async, '/attendance/all/?cursor=garbage')).status_code, 400)
+        self.assertEqual((await self.get(view_users_async, '/user/all/', token='garbage')).status_code, 401)
+
+    async def test_cursor_pages(self):
+        day = datetime.date(2024, 3, 4)
+        await Attendance.objects.acreate(employee=self.admin, date=day, check_in_time=at(day, 9))
+        await Attendance.objects.acreate(employee=self.admin, date=day + datetime.timedelta(days=1),
+                                         check_in_time=at(day + datetime.timedelta(days=1), 9))
+
+        first = json.loads((await self.get(view_attendance_async, '/attendance/all/?page_size=1')).content)
+        second = json.loads((await self.get(view_attendance_async,
+                                            f'/attendance/all/?page_size=1&cursor={first["next"]}')).content)
+        self.assertEqual([record['date'] for record in first['results'] + second['results']],
+                         ['2024-03-04', '2024-03-05'])
+        self.assertIsNone(second['next'])
+
+
+class UserCacheTests(SimpleTestCase):
+    """
+    The authentication cache evicts the least recently used users and expires entries.
+    """
+
+    def test_least_recently_used_is_evicted(self):
+        cache = UserCache(max_entries=2, ttl=60)
+        cache.set(1, 'first')
+        cache.set(2, 'second')
+        cache.get(1)
+        cache.set(3, 'third')
+        self.assertEqual((cache.get(1), cache.get(2), cache.get(3)), ('first', None, 'third'))
+
+    def test_entries_expire(self):
+        cache = UserCache(max_entries=2, ttl=60)
+        with mock.patch('AttendanceAndAccountsApp.authentication.time.monotonic', return_value=1000):
+            cache.set(1, 'first')
+        with mock.patch('AttendanceAndAccountsApp.authentication.time.monotonic', return_value=1061):
+            self.assertIsNone(cache.get(1))
+
+
+class CachedAuthenticationTests(APITestCase):
+    """
+    JWT requests read the user from the cache until the user is invalidated.
+    """
+
+    def setUp(self):
+        super().setUp()
+        user_cache.clear()
+        self.addCleanup(user_cache.clear)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.admin)}')
+
+    def test_deactivation_takes_effect_once_invalidated(self):
+        self.assertEqual(self.client.get('/user/all/?fields=id').status_code, 200)
+        CustomUser.objects.filter(pk=self.admin.pk).update(is_active=False)
+        # Served from the cache, without reading the user
+        self.assertEqual(self.client.get('/user/all/?fields=id').status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_user(self.admin.pk)
+        self.assertEqual(self.client.get('/user/all/?fields=id').status_code, 401)
+
+    def test_views_cannot_change_the_cached_user(self):
+        authentication = CachedJWTAuthentication()
+        token = AccessToken.for_user(self.admin)
+        authentication.get_user(token).first_name = 'Changed'
+        self.assertEqual(authentication.get_user(token).first_name, '')
+
+    @override_settings(AUTH_USER_CACHE_ENABLED=False)
+    def test_cache_can_be_turned_off(self):
+        self.client.get('/user/all/?fields=id')
+        self.assertIsNone(user_cache.get(self.admin.pk))
@@ -16,6 +16,7 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework_simplejwt import views as jwt_views
+from . import views
 
 
 urlpatterns = [
@@ -26,6 +27,8 @@ urlpatterns = [
     path('account/', include('accounts.urls')),
     path('api/token/', jwt_views.TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', jwt_views.TokenRefreshView.as_view(), name='token_refresh'),
+    path('cache/stats/', views.response_cache_stats, name='cache-stats'),
+    path('metrics', views.metrics, name='metrics'),
 
 
 ]
@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+from .cache import cache_stats
+from .metrics import render_prometheus
+
+
+@api_view(['GET'])
+def response_cache_stats(request):
+    """
+    API endpoint returning the hit and miss counters of the response cache.
+
+    Returns:
+        Response: A response containing the counters of the serving process.
+    """
+    return Response(cache_stats())
+
+
+def metrics(request):
+    """
+    Endpoint exposing the request metrics of this process in the Prometheus text format.
+
+    Returns:
+        HttpResponse: The metrics, or 404 when settings.PERF_METRICS_ENABLED is off.
+    """
+    if not settings.PERF_METRICS_ENABLED:
+        raise Http404
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'AttendanceAndAccountsApp.settings')
 
 application = get_wsgi_application()
+
+# Applies the punches journaled in write-behind mode, including those left by a previous run
+from attendance.journal import start_flusher  # noqa: E402
+
+start_flusher()
@@ -0,0 +1,138 @@
+"""
+Salary ledgers computed from the Accounts records.
+
+The ledger of an employee lists the monthly salaries and, per year, the
+total, the number of paid months, the average and the change from the year
+before. Yearly figures are grouped and summed by the database. Ledgers are
+cached in the 'responses' cache per employee, keyed by the generation of the
+'accounts' collection, so every account write, in any worker process, makes
+the cached ledgers unreachable. The account write paths also call
+invalidate_ledgers() to free the entries of the employees whose records changed.
+
+The department summary groups the salaries of all employees by department
+and year in one aggregate query.
+"""
+
+import decimal
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Avg, Count, Sum
+
+from AttendanceAndAccountsApp.cache import RESPONSE_CACHE_ALIAS, generation
+from users.models import CustomUser
+from .models import Accounts
+
+CENTS = decimal.Decimal('0.01')
+
+
+def _ledger_key(employee_id, accounts_generation):
+    return f'ledger:{accounts_generation}:{employee_id}'
+
+
+def _amount(value):
+    # Amounts are rendered like the salary field of AccountSerializer, as decimal strings
+    return str(decimal.Decimal(value).quantize(CENTS)) if value is not None else None
+
+
+def with_changes(rows, group=None):
+    """
+    Adds the change from the previous year to grouped yearly rows.
+
+    Args:
+        rows (list): Rows with a 'year', a Decimal 'total' and 'average'.
+        group (str, optional): The column that separates the series compared, e.g. 'department'.
+
+    Returns:
+        list: The rows with 'change' and 'change_percent' (None without a previous year or with a zero total)
+              and the amounts rendered as strings.
+    """
+    totals = {(row.get(group), row['year']): row['total'] for row in rows}
+    for row in rows:
+        previous = totals.get((row.get(group), row['year'] - 1))
+        row['change'] = _amount(row['total'] - previous) if previous is not None else None
+        row['change_percent'] = float(round((row['total'] - previous) * 100 / previous, 2)) if previous else None
+    for row in rows:
+        row['total'], row['average'] = _amount(row['total']), _amount(row['average'])
+    return rows
+
+
+def employee_ledger(employee_id):
+    """
+    Computes the salary ledger of an employee, with two queries.
+
+    Args:
+        employee_id (int): The primary key of the employee.
+
+    Returns:
+        dict: 'months', the salary of every month, and 'years', the yearly totals, month counts,
+              averages and year-over-year changes, both in chronological order;
+              None if the employee does not exist.
+    """
+    records = Accounts.objects.filter(employee_id=employee_id)
+    months = [{'year': year, 'month': month, 'salary': _amount(salary)}
+              for year, month, salary in records.order_by('year', 'month').values_list('year', 'month', 'salary')]
+    if not months and not CustomUser.objects.filter(pk=employee_id).exists():
+        return None
+    years = list(records.values('year').order_by('year')
+                 .annotate(total=Sum('salary'), months=Count('id'), average=Avg('salary')))
+    return {'employee': employee_id, 'months': months, 'years': with_changes(years)}
+
+
+def cached_employee_ledger(employee_id):
+    """
+    Returns the ledger of an employee from the cache, computing and storing it on a miss.
+
+    Returns:
+        dict: The ledger, see employee_ledger(); None if the employee does not exist.
+    """
+    if not settings.RESPONSE_CACHE_ENABLED:
+        return employee_ledger(employee_id)
+    cache = caches[RESPONSE_CACHE_ALIAS]
+    key = _ledger_key(employee_id, generation('accounts'))
+    ledger = cache.get(key)
+    if ledger is None:
+        ledger = employee_ledger(employee_id)
+        if ledger is not None:
+            cache.set(key, ledger)
+    return ledger
+
+
+def invalidate_ledgers(*employee_ids):
+    """
+    Drops the cached ledgers of employees from this process's cache once the current transaction commits.
+
+    The ledgers are made stale everywhere by the invalidate('accounts') of the same write;
+    this only frees their entries early.
+
+    Args:
+        *employee_ids (int): The employees whose Accounts records were written.
+    """
+    # The generation the entries were stored under, before the write bumps it on commit
+    accounts_generation = generation('accounts')
+    keys = [_ledger_key(employee_id, accounts_generation) for employee_id in set(employee_ids)]
+    transaction.on_commit(lambda: caches[RESPONSE_CACHE_ALIAS].delete_many(keys))
+
+
+def department_summary(year=None, department=None):
+    """
+    Groups the salaries of all employees by department and year, in one aggregate query.
+
+    Args:
+        year (int, optional): Restricts the summary to a year; the year before is read as well, for the change.
+        department (str, optional): Restricts the summary to one department.
+
+    Returns:
+        list: Per department and year, in that order: the number of paid employees, the total,
+              the average monthly salary and the year-over-year change of the total.
+    """
+    records = Accounts.objects.all()
+    if year is not None:
+        records = records.filter(year__in=(year - 1, year))
+    if department is not None:
+        records = records.filter(employee__department=department)
+    rows = list(records.values('employee__department', 'year').order_by('employee__department', 'year')
+                .annotate(employees=Count('employee', distinct=True), total=Sum('salary'), average=Avg('salary')))
+    rows = with_changes([{'department': row.pop('employee__department'), **row} for row in rows], 'department')
+    return [row for row in rows if year is None or row['year'] == year]
@@ -0,0 +1,20 @@
+from AttendanceAndAccountsApp.export import ExportCommand
+from accounts.models import Accounts
+from accounts.serializers import ACCOUNT_LIST_FIELDS, AccountFilterSerializer, AccountSerializer
+
+
+class Command(ExportCommand):
+    """
+    Management command streaming accounts records to a CSV or NDJSON file.
+
+    Example:
+        python manage.py export_accounts --filter year__gte=2021 --format ndjson --output accounts.ndjson
+    """
+
+    help = 'Exports accounts records as CSV or NDJSON, ordered by (year, month, id).'
+
+    model = Accounts
+    serializer_class = AccountSerializer
+    filter_class = AccountFilterSerializer
+    list_fields = ACCOUNT_LIST_FIELDS
+    ordering = ('year', 'month', 'id')
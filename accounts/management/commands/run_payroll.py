@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from accounts.payroll import run_payroll
+
+
+class Command(BaseCommand):
+    """
+    Management command generating the Accounts records of a month from attendance.
+
+    Example:
+        python manage.py run_payroll --year 2024 --month 1 --dry-run
+    """
+
+    help = 'Computes the salary of every active employee for a month and stores it as Accounts records.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', type=int, required=True)
+        parser.add_argument('--month', type=int, required=True)
+        parser.add_argument('--workers', type=int, help='Size of the process pool (default: PAYROLL_WORKERS).')
+        parser.add_argument('--chunk-size', type=int, help='Employees priced per task (default: PAYROLL_CHUNK_SIZE).')
+        parser.add_argument('--dry-run', action='store_true', help='Print the totals without writing anything.')
+
+    def handle(self, *args, **options):
+        if not 1 <= options['month'] <= 12:
+            raise CommandError('--month must be between 1 and 12')
+
+        try:
+            summary = run_payroll(
+                options['year'],
+                options['month'],
+                dry_run=options['dry_run'],
+                workers=options['workers'],
+                chunk_size=options['chunk_size'],
+            )
+        except IntegrityError:
+            raise CommandError('Another payroll run stored records for this month; nothing was written')
+
+        for key, value in summary.items():
+            self.stdout.write(f'{key}: {value}')
+        if not summary['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f"Created {summary['employees']} accounts records"))
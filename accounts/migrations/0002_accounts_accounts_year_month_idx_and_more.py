@@ -0,0 +1,40 @@
+# Generated by Django 4.1.13 on 2026-10-18 10:04
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def delete_duplicates(apps, schema_editor):
+    """
+    Deletes the accounts records duplicating an (employee, year, month), so that the unique constraint can be added.
+
+    The check-then-insert create path could store such duplicates under
+    concurrent requests. The latest record of each group, the one with the
+    highest id, is kept.
+    """
+    Accounts = apps.get_model('accounts', 'Accounts')
+    groups = (Accounts.objects.values('employee_id', 'year', 'month').annotate(records=Count('id'))
+              .filter(records__gt=1).values_list('employee_id', 'year', 'month'))
+    for employee_id, year, month in list(groups):
+        ids = list(Accounts.objects.filter(employee_id=employee_id, year=year, month=month)
+                   .order_by('id').values_list('id', flat=True))
+        Accounts.objects.filter(pk__in=ids[:-1]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicates, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='accounts',
+            index=models.Index(fields=['year', 'month'], name='accounts_year_month_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='accounts',
+            constraint=models.UniqueConstraint(fields=('employee', 'year', 'month'), name='unique_accounts_employee_period'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.1.13 on 2026-10-18 10:04
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('accounts', '0002_accounts_accounts_year_month_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('base_salary', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('hourly_rate', models.DecimalField(decimal_places=2, default=0, max_digits=8)),
+                ('standard_daily_hours', models.DecimalField(decimal_places=2, default=8, max_digits=4)),
+                ('overtime_multiplier', models.DecimalField(decimal_places=2, default=1.5, max_digits=4)),
+                ('employee', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='pay_rate', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.13 on 2026-10-18 10:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_payrate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='accounts',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
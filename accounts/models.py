@@ -10,6 +10,7 @@ class Accounts(models.Model):
         month (int): The month of the accounts record.
         year (int): The year of the accounts record.
         salary (Decimal): The salary associated with the accounts record.
+        updated_at (DateTime): The time the record was last created or changed.
 
     Methods:
         __str__(): Returns a string representation of the accounts record.
@@ -22,6 +23,7 @@ class Accounts(models.Model):
     month = models.IntegerField()
     year = models.IntegerField()
     salary = models.DecimalField(max_digits=10, decimal_places=2)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         """
@@ -38,5 +40,56 @@ class Accounts(models.Model):
 
         Attributes:
             app_label (str): Specifies the app label for the accounts model.
+            constraints (list): Allows a single accounts record per employee, year and month.
+            indexes (list): Supports listing the accounts records of a given month.
+        """
+        app_label = 'accounts'
+        constraints = [
+            models.UniqueConstraint(fields=['employee', 'year', 'month'], name='unique_accounts_employee_period'),
+        ]
+        indexes = [
+            models.Index(fields=['year', 'month'], name='accounts_year_month_idx'),
+        ]
+
+
+class PayRate(models.Model):
+    """
+    Model representing the pay rules used by the payroll run for an employee.
+
+    Attributes:
+        employee (CustomUser): The employee the pay rules apply to (OneToOneField).
+        base_salary (Decimal): The fixed amount paid every month.
+        hourly_rate (Decimal): The amount paid per hour worked.
+        standard_daily_hours (Decimal): The hours per day paid at the hourly rate; hours beyond are overtime.
+        overtime_multiplier (Decimal): The factor applied to the hourly rate for overtime hours.
+
+    Methods:
+        __str__(): Returns a string representation of the pay rules.
+
+    Meta:
+        app_label (str): Specifies the app label for the pay rate model (used for Django app configuration).
+    """
+
+    employee = models.OneToOneField(CustomUser, on_delete=models.CASCADE, related_name='pay_rate')
+    base_salary = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    hourly_rate = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+    standard_daily_hours = models.DecimalField(max_digits=4, decimal_places=2, default=8)
+    overtime_multiplier = models.DecimalField(max_digits=4, decimal_places=2, default=1.5)
+
+    def __str__(self):
+        """
+        Returns a string representation of the pay rules.
+
+        Returns:
+            str: A formatted string with the employee's username, base salary and hourly rate.
+        """
+        return f"{self.employee.username} - Base: {self.base_salary} - Hourly: {self.hourly_rate}"
+
+    class Meta:
+        """
+        Meta class for PayRate.
+
+        Attributes:
+            app_label (str): Specifies the app label for the pay rate model.
         """
         app_label = 'accounts'
@@ -0,0 +1,187 @@
+"""
+Monthly payroll run generating Accounts records from Attendance.
+
+The run reads the pay rules once and totals the month's attendance per
+employee with the vectorized working-hours engine (attendance.hours), then
+splits the employees into chunks that are priced in a process pool, and
+writes the resulting Accounts records with bulk inserts. Worker processes only
+do arithmetic on plain tuples; all database access stays in the calling process.
+"""
+
+import calendar
+import datetime
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal, ROUND_HALF_UP
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from AttendanceAndAccountsApp.cache import invalidate
+from changes import feed
+from attendance import hours
+from users.models import CustomUser
+from .ledger import invalidate_ledgers
+from .models import Accounts, PayRate
+
+CENTS = Decimal('0.01')
+SECONDS_PER_HOUR = Decimal(3600)
+
+
+def period_bounds(year, month):
+    """
+    Returns the first and last day of a payroll month.
+
+    Args:
+        year (int): The payroll year.
+        month (int): The payroll month (1-12).
+
+    Returns:
+        tuple: The first and the last date of the month.
+    """
+    last_day = calendar.monthrange(year, month)[1]
+    return datetime.date(year, month, 1), datetime.date(year, month, last_day)
+
+
+def compute_salary(rate, seconds, premiums=(Decimal(0), Decimal(0))):
+    """
+    Prices one employee's month.
+
+    Hours up to the standard daily hours are paid at the hourly rate, hours
+    beyond that at the hourly rate times the overtime multiplier, on top of
+    the base salary. Night and weekend hours earn their premium, a fraction of
+    the hourly rate, on top.
+
+    Args:
+        rate (tuple): (base_salary, hourly_rate, standard_daily_hours, overtime_multiplier).
+        seconds (tuple): The worked, overtime, night and weekend seconds of the month.
+        premiums (tuple): The night and weekend premiums.
+
+    Returns:
+        tuple: The hours worked, the overtime, night and weekend hours and the salary, as Decimals.
+    """
+    base_salary, hourly_rate, _, overtime_multiplier = rate
+    night_premium, weekend_premium = premiums
+    worked, overtime, night, weekend = (Decimal(value) / SECONDS_PER_HOUR for value in seconds)
+    regular = worked - overtime
+    salary = (base_salary + regular * hourly_rate + overtime * hourly_rate * overtime_multiplier
+              + night * hourly_rate * night_premium + weekend * hourly_rate * weekend_premium)
+    return (worked.quantize(CENTS), overtime.quantize(CENTS), night.quantize(CENTS), weekend.quantize(CENTS),
+            salary.quantize(CENTS, ROUND_HALF_UP))
+
+
+def compute_chunk(chunk, premiums=(Decimal(0), Decimal(0))):
+    """
+    Prices a chunk of employees; runs inside a worker process.
+
+    Args:
+        chunk (list): (employee_id, rate, seconds) tuples.
+        premiums (tuple): The night and weekend premiums.
+
+    Returns:
+        list: (employee_id, hours, overtime, night, weekend, salary) tuples.
+    """
+    return [(employee_id, *compute_salary(rate, seconds, premiums)) for employee_id, rate, seconds in chunk]
+
+
+def load_work_seconds(first_day, last_day, standard_hours):
+    """
+    Reads the month's attendance and totals it per employee with the working-hours engine.
+
+    Months before the attendance hot window are read from the archive.
+
+    Args:
+        first_day (date): The first day of the month.
+        last_day (date): The last day of the month.
+        standard_hours (dict): {employee_id: standard daily hours}; other employees get WORK_STANDARD_DAILY_HOURS.
+
+    Returns:
+        dict: {employee_id: (worked, overtime, night, weekend seconds)} for the employees with attendance.
+    """
+    punches = hours.load_punches(first_day, last_day, chunk_size=settings.PAYROLL_CHUNK_SIZE * 20)
+    rules = hours.ShiftRules()
+    standard_seconds = [float(standard_hours[employee_id]) * 3600 if employee_id in standard_hours
+                        else rules.standard_seconds for employee_id in punches.employees.tolist()]
+    totals = hours.compute_totals(punches, rules, standard_seconds)
+    columns = (totals[name].tolist() for name in ('worked_seconds', 'overtime_seconds', 'night_seconds',
+                                                  'weekend_seconds'))
+    return dict(zip(totals['employee'].tolist(), zip(*columns)))
+
+
+def run_payroll(year, month, dry_run=False, workers=None, chunk_size=None):
+    """
+    Computes the salary of every active employee with pay rules for a month.
+
+    Employees that already have an Accounts record for the month are skipped,
+    so a run can safely be repeated after adding the pay rules reported missing.
+
+    Args:
+        year (int): The payroll year.
+        month (int): The payroll month (1-12).
+        dry_run (bool): Compute the totals without writing any Accounts records.
+        workers (int, optional): The size of the process pool; 1 prices everything in-process.
+        chunk_size (int, optional): The number of employees priced per task.
+
+    Returns:
+        dict: A summary of the run with the number of records, the salary totals and, as
+              'missing_pay_rates', the ids of the employees left out because they have no pay rules.
+
+    Raises:
+        IntegrityError: If another run stored records for the month concurrently; nothing is written then.
+    """
+    workers = workers or settings.PAYROLL_WORKERS
+    chunk_size = chunk_size or settings.PAYROLL_CHUNK_SIZE
+    first_day, last_day = period_bounds(year, month)
+
+    # Active employees employed during the month who have pay rules; the ones without are reported
+    employed = (CustomUser.objects.filter(is_active=True, joining_date__lte=last_day)
+                .filter(Q(termination_date__isnull=True) | Q(termination_date__gte=first_day)))
+    rates = (PayRate.objects.filter(employee__in=employed)
+             .values_list('employee_id', 'base_salary', 'hourly_rate', 'standard_daily_hours', 'overtime_multiplier'))
+    missing_pay_rates = list(employed.filter(pay_rate__isnull=True).order_by('pk').values_list('pk', flat=True))
+    rates = {employee_id: tuple(rate) for employee_id, *rate in rates.iterator()}
+    already_paid = set(Accounts.objects.filter(year=year, month=month).values_list('employee_id', flat=True))
+    worked = load_work_seconds(first_day, last_day, {employee_id: rate[2] for employee_id, rate in rates.items()})
+
+    tasks = []
+    skipped = 0
+    for employee_id, rate in rates.items():
+        if employee_id in already_paid:
+            skipped += 1
+        else:
+            tasks.append((employee_id, rate, worked.get(employee_id, (0, 0, 0, 0))))
+    chunks = [tasks[start:start + chunk_size] for start in range(0, len(tasks), chunk_size)]
+    price = partial(compute_chunk, premiums=(settings.PAYROLL_NIGHT_PREMIUM, settings.PAYROLL_WEEKEND_PREMIUM))
+
+    if workers > 1 and len(chunks) > 1:
+        # Workers never touch the database, so the caller's connection and transaction stay usable
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = [row for chunk in pool.map(price, chunks) for row in chunk]
+    else:
+        results = [row for chunk in chunks for row in price(chunk)]
+
+    if not dry_run:
+        with transaction.atomic():
+            created = Accounts.objects.bulk_create(
+                [Accounts(employee_id=employee_id, year=year, month=month, salary=salary)
+                 for employee_id, *_, salary in results],
+                batch_size=settings.PAYROLL_BATCH_SIZE,
+            )
+            feed.record(feed.ACCOUNTS, feed.inserted_ids(Accounts, created, ('employee_id', 'year', 'month')))
+            invalidate('accounts')
+            invalidate_ledgers(*(account.employee_id for account in created))
+
+    return {
+        'year': year,
+        'month': month,
+        'dry_run': dry_run,
+        'employees': len(results),
+        'skipped_existing': skipped,
+        'missing_pay_rates': missing_pay_rates,
+        'total_hours': sum((row[1] for row in results), Decimal(0)),
+        'total_overtime_hours': sum((row[2] for row in results), Decimal(0)),
+        'total_night_hours': sum((row[3] for row in results), Decimal(0)),
+        'total_weekend_hours': sum((row[4] for row in results), Decimal(0)),
+        'total_salary': sum((row[5] for row in results), Decimal(0)),
+    }
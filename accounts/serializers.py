@@ -1,5 +1,8 @@
 from rest_framework import serializers
-from .models import Accounts
+from .models import Accounts, PayRate
+
+# Fields the accounts list endpoint may return
+ACCOUNT_LIST_FIELDS = ('id', 'month', 'year', 'salary', 'employee', 'updated_at')
 
 class AccountSerializer(serializers.ModelSerializer):
     """
@@ -33,3 +36,111 @@ class AccountSerializer(serializers.ModelSerializer):
         """
         model = Accounts
         fields = '__all__'
+
+
+class AccountBulkSerializer(serializers.ModelSerializer):
+    """
+    Serializer class for one item of a batch accounts update.
+
+    The employee is taken as a plain id instead of a related field, so validating
+    a batch does not cost one employee lookup per item. The ids of a batch are
+    checked together by the batch endpoint instead.
+
+    Attributes:
+        employee (int): The primary key of the employee, stored as employee_id.
+    """
+
+    employee = serializers.IntegerField(source='employee_id')
+
+    class Meta:
+        """
+        Meta class for AccountBulkSerializer.
+
+        Attributes:
+            model (Accounts): The model associated with this serializer.
+            fields (tuple): The fields accepted for each item.
+        """
+        model = Accounts
+        fields = ('employee', 'month', 'year', 'salary')
+
+
+class PayRateSerializer(serializers.ModelSerializer):
+    """
+    Serializer class for the PayRate model.
+
+    Attributes:
+        model (PayRate): The model associated with this serializer.
+        fields (str): The fields to include in the serialized representation.
+    """
+
+    class Meta:
+        """
+        Meta class for PayRateSerializer.
+
+        Attributes:
+            model (PayRate): The model associated with this serializer.
+            fields (str): The fields to include in the serialized representation.
+        """
+        model = PayRate
+        fields = '__all__'
+
+
+class PayRateFilterSerializer(serializers.Serializer):
+    """
+    Serializer class declaring the filters of the pay rules list.
+
+    Attributes:
+        employee (list, optional): Restricts the list to these employees; may be given several times.
+    """
+
+    employee = serializers.ListField(child=serializers.IntegerField(), required=False, source='employee_id__in')
+
+
+class PayrollRunSerializer(serializers.Serializer):
+    """
+    Serializer class validating the parameters of a payroll run.
+
+    Attributes:
+        year (int): The payroll year.
+        month (int): The payroll month (1-12).
+        dry_run (bool): Compute the totals without writing any Accounts records.
+    """
+
+    year = serializers.IntegerField(min_value=1900, max_value=9999)
+    month = serializers.IntegerField(min_value=1, max_value=12)
+    dry_run = serializers.BooleanField(default=False)
+
+
+class AccountFilterSerializer(serializers.Serializer):
+    """
+    Serializer class declaring the filters of the accounts list endpoint.
+
+    Every filter is backed by an index: (employee, year, month) for the employee
+    and (year, month) for the period.
+    """
+
+    id = serializers.IntegerField(required=False)
+    employee = serializers.IntegerField(required=False, source='employee_id')
+    year = serializers.IntegerField(required=False)
+    year__gte = serializers.IntegerField(required=False)
+    year__lte = serializers.IntegerField(required=False)
+    month = serializers.IntegerField(required=False, min_value=1, max_value=12)
+
+    def validate(self, data):
+        # month is only indexed after year (or employee and year)
+        if 'month' in data and 'year' not in data:
+            raise serializers.ValidationError({'month': 'Filtering on month requires year.'})
+        return data
+
+
+class DepartmentLedgerQuerySerializer(serializers.Serializer):
+    """
+    Serializer class validating the parameters of the department salary summary.
+
+    Attributes:
+        year (int, optional): Restricts the summary to a year.
+        department (str, optional): Restricts the summary to one department.
+    """
+
+    year = serializers.IntegerField(required=False, min_value=1900, max_value=9999)
+    department = serializers.CharField(required=False)
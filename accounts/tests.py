@@ -1,3 +1,230 @@
-from django.test import TestCase
+import datetime
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.db import IntegrityError
+from django.test import override_settings
+from django.utils import timezone
+
+from AttendanceAndAccountsApp.cache import bump_generation
+from AttendanceAndAccountsApp.testing import APITestCase, make_user
+from attendance.models import Attendance
+from .models import Accounts, PayRate
+
+
+class AccountsTestCase(APITestCase):
+    """
+    Base class adding an employee holding two accounts records.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.employee = make_user('employee')
+        self.january = Accounts.objects.create(employee=self.employee, year=2024, month=1, salary=Decimal('1000.00'))
+        self.february = Accounts.objects.create(employee=self.employee, year=2024, month=2, salary=Decimal('1100.00'))
+
+
+class BatchTests(AccountsTestCase):
+    """
+    Batch PATCH and DELETE report a status per item and apply nothing on conflicts.
+    """
+
+    def test_patch_statuses(self):
+        response = self.client.patch('/account/batch/', [
+            {'id': self.january.pk, 'salary': '1200.00'},
+            {'id': 999999, 'salary': '1.00'},
+            {'id': self.february.pk, 'salary': 'lots'},
+            {'id': self.february.pk, 'employee': 999999},
+            {'id': self.january.pk, 'month': 3},
+        ], format='json')
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([result['status'] for result in response.data['results']],
+                         ['updated', 'not_found', 'invalid', 'invalid', 'invalid'])
+        self.assertEqual(Accounts.objects.get(pk=self.january.pk).salary, Decimal('1200.00'))
+
+    def test_duplicate_period_conflicts(self):
+        response = self.client.patch('/account/batch/', [
+            {'id': self.january.pk, 'salary': '1200.00'},
+            {'id': self.february.pk, 'month': 1},
+        ], format='json')
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Accounts.objects.get(pk=self.january.pk).salary, Decimal('1000.00'))
+
+    def test_delete_statuses(self):
+        response = self.client.delete('/account/batch/', [self.january.pk, 999999, True], format='json')
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([result['status'] for result in response.data['results']], ['deleted', 'not_found', 'invalid'])
+        self.assertEqual(list(Accounts.objects.values_list('pk', flat=True)), [self.february.pk])
+
+    def test_too_many_items(self):
+        with self.settings(BATCH_MAX_ITEMS=1):
+            response = self.client.delete('/account/batch/', [self.january.pk, self.february.pk], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Accounts.objects.count(), 2)
+
+
+@override_settings(CHANGE_FEED_SETTLE_SECONDS=0)
+class ChangeFeedTests(AccountsTestCase):
+    """
+    The accounts change feed returns tombstones for records deleted directly or with their employee.
+    """
+
+    def test_tombstones(self):
+        self.client.patch('/account/batch/', [{'id': self.january.pk, 'salary': '1200.00'},
+                                              {'id': self.february.pk, 'salary': '1300.00'}], format='json')
+        feed = self.client.get('/account/changes/?since=0').data
+        self.assertEqual([(change['id'], change['action']) for change in feed['changes']],
+                         [(self.january.pk, 'upsert'), (self.february.pk, 'upsert')])
+        self.assertEqual(feed['changes'][0]['record']['salary'], '1200.00')
+
+        self.client.delete('/account/batch/', [self.january.pk], format='json')
+        self.client.delete(f'/user/{self.employee.pk}/delete/')
+        later = self.client.get(f'/account/changes/?since={feed["next"]}').data
+        self.assertEqual([(change['id'], change['action']) for change in later['changes']],
+                         [(self.january.pk, 'delete'), (self.february.pk, 'delete')])
+
+    def test_limit_pages_the_feed(self):
+        self.client.patch('/account/batch/', [{'id': self.january.pk, 'salary': '1200.00'},
+                                              {'id': self.february.pk, 'salary': '1300.00'}], format='json')
+        first = self.client.get('/account/changes/?since=0&limit=1').data
+        self.assertTrue(first['has_more'])
+        second = self.client.get(f'/account/changes/?since={first["next"]}&limit=1').data
+        self.assertEqual([change['id'] for change in first['changes'] + second['changes']],
+                         [self.january.pk, self.february.pk])
+        self.assertFalse(second['has_more'])
+
+
+class ResponseCacheTests(AccountsTestCase):
+    """
+    The accounts list is cached until the records change and answers conditional GETs with 304.
+    """
+
+    def test_writes_invalidate_cached_responses(self):
+        self.assertEqual([record['salary'] for record in self.client.get('/account/all/').data],
+                         ['1000.00', '1100.00'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch('/account/batch/', [{'id': self.january.pk, 'salary': '1200.00'}], format='json')
+        self.assertEqual([record['salary'] for record in self.client.get('/account/all/').data],
+                         ['1200.00', '1100.00'])
+
+    def test_conditional_get_is_not_modified_until_a_write(self):
+        etag = self.client.get('/account/all/')['ETag']
+        self.assertEqual(self.client.get('/account/all/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # Last-Modified lives in the database, so it survives a cold response cache
+        modified = self.client.get('/account/all/')['Last-Modified']
+        with self.settings(RESPONSE_CACHE_ENABLED=False):
+            self.assertEqual(self.client.get('/account/all/', HTTP_IF_MODIFIED_SINCE=modified).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'/account/{self.february.pk}/delete/')
+        self.assertEqual(self.client.get('/account/all/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class LedgerTests(AccountsTestCase):
+    """
+    Salary ledgers are cached until the accounts records change, in this process or another one.
+    """
+
+    def ledger_total(self):
+        return self.client.get(f'/account/ledger/{self.employee.pk}/').data['years'][0]['total']
+
+    def test_ledger_follows_writes(self):
+        self.assertEqual(self.ledger_total(), '2100.00')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch('/account/batch/', [{'id': self.january.pk, 'salary': '1200.00'}], format='json')
+        self.assertEqual(self.ledger_total(), '2300.00')
+
+    def test_ledger_follows_writes_of_other_processes(self):
+        self.assertEqual(self.ledger_total(), '2100.00')
+
+        # Another worker writes and bumps the shared generation; this process's cache is left as is
+        Accounts.objects.filter(pk=self.january.pk).update(salary=Decimal('1200.00'))
+        bump_generation('accounts')
+        self.assertEqual(self.ledger_total(), '2300.00')
+
+    def test_yearly_changes(self):
+        Accounts.objects.create(employee=self.employee, year=2025, month=1, salary=Decimal('3150.00'))
+        years = self.client.get(f'/account/ledger/{self.employee.pk}/').data['years']
+        self.assertEqual([(year['year'], year['total'], year['change'], year['change_percent']) for year in years],
+                         [(2024, '2100.00', None, None), (2025, '3150.00', '1050.00', 50.0)])
+        self.assertEqual(self.client.get('/account/ledger/999999/').status_code, 404)
+
+
+class UniqueAccountsTests(AccountsTestCase):
+    """
+    The database rejects a second accounts record of an employee for a month.
+    """
+
+    def test_duplicate_period_conflicts(self):
+        response = self.client.post('/account/create/', {'employee': self.employee.pk, 'year': 2024, 'month': 1,
+                                                          'salary': '900.00'}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Accounts.objects.get(employee=self.employee, month=1).salary, Decimal('1000.00'))
+
+
+class PayrollTests(AccountsTestCase):
+    """
+    The payroll run prices worked hours, overtime and premiums, and reports employees without pay rules.
+    """
+
+    def setUp(self):
+        super().setUp()
+        PayRate.objects.create(employee=self.employee, base_salary=Decimal('100.00'), hourly_rate=Decimal('10.00'),
+                               standard_daily_hours=Decimal('8'), overtime_multiplier=Decimal('1.5'))
+        # Saturday 2024-03-02, 14:00 to 00:00: ten hours, two of them overtime and two at night, all on the weekend
+        saturday = datetime.date(2024, 3, 2)
+        check_in = timezone.make_aware(datetime.datetime(2024, 3, 2, 14))
+        Attendance.objects.create(employee=self.employee, date=saturday, check_in_time=check_in,
+                                  check_out_time=check_in + datetime.timedelta(hours=10))
+
+    @override_settings(PAYROLL_NIGHT_PREMIUM=Decimal('0.25'), PAYROLL_WEEKEND_PREMIUM=Decimal('0.5'))
+    def test_dry_run_prices_the_month(self):
+        response = self.client.post('/account/payroll/', {'year': 2024, 'month': 3, 'dry_run': True}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        # 100 + 8 h * 10 + 2 h * 15 + 2 h * 2.5 + 10 h * 5
+        self.assertEqual(response.data['total_salary'], '265.00')
+        self.assertEqual(response.data['total_overtime_hours'], '2.00')
+        self.assertEqual(response.data['total_night_hours'], '2.00')
+        self.assertEqual(response.data['total_weekend_hours'], '10.00')
+        self.assertEqual(response.data['missing_pay_rates'], [self.admin.pk])
+        self.assertFalse(Accounts.objects.filter(month=3).exists())
+
+    def test_run_stores_records_once(self):
+        response = self.client.post('/account/payroll/', {'year': 2024, 'month': 3}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Accounts.objects.get(employee=self.employee, year=2024, month=3).salary, Decimal('210.00'))
+
+        response = self.client.post('/account/payroll/', {'year': 2024, 'month': 3}, format='json')
+        self.assertEqual((response.data['employees'], response.data['skipped_existing']), (0, 1))
+
+    def test_concurrent_run_conflicts(self):
+        with mock.patch('accounts.payroll.Accounts.objects.bulk_create', side_effect=IntegrityError):
+            response = self.client.post('/account/payroll/', {'year': 2024, 'month': 3}, format='json')
+        self.assertEqual(response.status_code, 409)
+
+    def test_pay_rates_filter_is_validated(self):
+        self.assertEqual(self.client.get('/account/rates/?employee=abc').status_code, 400)
+        response = self.client.get(f'/account/rates/?employee={self.employee.pk}')
+        self.assertEqual([rate['employee'] for rate in response.data], [self.employee.pk])
+
+
+class ExportTests(AccountsTestCase):
+    """
+    Accounts records are exported as CSV or NDJSON.
+    """
+
+    def test_csv_and_ndjson(self):
+        response = self.client.get('/account/export/?fields=month,salary')
+        self.assertEqual(b''.join(response.streaming_content).decode().splitlines(),
+                         ['month,salary', '1,1000.00', '2,1100.00'])
+
+        response = self.client.get('/account/export/?export_format=ndjson&fields=month,salary&year=2024&month=2')
+        self.assertEqual(b''.join(response.streaming_content).decode().splitlines(),
+                         ['{"month":2,"salary":"1100.00"}'])
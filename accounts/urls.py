@@ -1,4 +1,5 @@
 
+from django.conf import settings
 from django.urls import path
 from . import views
 """
@@ -8,9 +9,16 @@ Each URL pattern is associated with a specific view function from the 'views' mo
 
 - '' (home): Display the API overview.
 - 'create/': Add new accounts records.
-- 'all/': View all accounts records.
+- 'all/': View all accounts records; served by view_account_async when settings.ASYNC_READ_VIEWS is on.
+- 'export/': Stream accounts records as a CSV or NDJSON file.
+- 'changes/': List the accounts records created, changed or deleted after a cursor (?since=).
 - 'update/<int:pk>/': Update accounts records with a specific primary key.
 - '<int:pk>/delete/': Delete accounts records with a specific primary key.
+- 'batch/': Partially update (PATCH) or delete (DELETE) many accounts records in one transaction.
+- 'ledger/<int:employee_id>/': Monthly salaries, yearly totals and year-over-year changes of an employee.
+- 'ledger/departments/': Salary totals and averages per department and year.
+- 'rates/': List or set the pay rules of employees.
+- 'payroll/': Generate the accounts records of a month from attendance.
 - 'hello/': Display a hello message.
 
 Note:
@@ -25,9 +33,16 @@ urlpatterns = [
     
     path('', views.ApiOverview, name='home'),
     path('create/', views.add_account, name='add-users'),
-    path('all/', views.view_account, name='view-users'),
+    path('all/', views.view_account_async if settings.ASYNC_READ_VIEWS else views.view_account, name='view-users'),
+    path('export/', views.export_accounts, name='export-accounts'),
+    path('changes/', views.account_changes, name='changes'),
     path('update/<int:pk>/', views.update_account, name='update_users'),
     path('<int:pk>/delete/', views.delete_account, name='delete-items'),
+    path('batch/', views.batch_accounts, name='batch'),
+    path('ledger/<int:employee_id>/', views.salary_ledger, name='salary-ledger'),
+    path('ledger/departments/', views.department_ledger, name='department-ledger'),
+    path('rates/', views.pay_rates, name='pay-rates'),
+    path('payroll/', views.payroll, name='payroll'),
     path('hello/', views.hello_message, name='hello'),
 
 ]
\ No newline at end of file
@@ -1,9 +1,22 @@
+from django.db import IntegrityError, transaction
 from django.shortcuts import render
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
-from .models import Accounts
-from .serializers import AccountSerializer
-from rest_framework import serializers
+from AttendanceAndAccountsApp import batch
+from AttendanceAndAccountsApp.async_views import async_list_view
+from AttendanceAndAccountsApp.cache import cached_response, invalidate
+from AttendanceAndAccountsApp.export import FORMAT_PARAM, export_response, parse_format
+from AttendanceAndAccountsApp.filters import filter_queryset, query_plan, wants_query_plan
+from AttendanceAndAccountsApp.serialization import FIELDS_PARAM, LeanSerializer, parse_fields
+from changes import feed
+from users.models import CustomUser
+from .ledger import cached_employee_ledger, department_summary, invalidate_ledgers
+from .models import Accounts, PayRate
+from .payroll import run_payroll
+from .serializers import (AccountSerializer, AccountBulkSerializer, AccountFilterSerializer,
+                          DepartmentLedgerQuerySerializer, PayRateFilterSerializer, PayRateSerializer,
+                          PayrollRunSerializer, ACCOUNT_LIST_FIELDS)
 from rest_framework import status
 import decimal
 
@@ -39,13 +52,17 @@ def add_account(request):
     """
     account = AccountSerializer(data=request.data)
 
-    # Check if accounts record for the same employee, year, and month already exists
-    if Accounts.objects.filter(employee=request.data.get('employee'),year=request.data.get('year'),month=request.data.get('month')):
-        raise serializers.ValidationError('Accounts Record for this employee already exists')
-
     if account.is_valid():
+        # The unique (employee, year, month) constraint rejects duplicate accounts records
         try:
-            account.save()
+            with transaction.atomic():
+                account.save()
+                feed.record(feed.ACCOUNTS, [account.instance.pk])
+                invalidate('accounts')
+                invalidate_ledgers(account.instance.employee_id)
+        except IntegrityError:
+            return Response({'error': 'Accounts Record for this employee already exists'},
+                            status=status.HTTP_409_CONFLICT)
         except Exception as e:
             return Response(f"Error saving account: {e}")
         return Response(account.data)
@@ -53,28 +70,80 @@ def add_account(request):
         return Response(account.errors, status=status.HTTP_404_NOT_FOUND)
 
 @api_view(['GET'])
+@cached_response('accounts')
 def view_account(request):
     """
     API endpoint for viewing accounts records.
 
+    Supported filters are declared by AccountFilterSerializer; other query parameters are rejected.
+    'fields' selects the returned fields, e.g. ?fields=employee,salary, and
+    'debug=plan' returns the query plan instead of the records (staff only).
+
     Args:
         request (Request): The incoming request.
 
     Returns:
         Response: A response containing serialized accounts data.
     """
+    params = request.query_params.dict()
+    lean = LeanSerializer(AccountSerializer, parse_fields(params.pop(FIELDS_PARAM, None), ACCOUNT_LIST_FIELDS))
+    plan = wants_query_plan(request, params)
+
     # Filter accounts records based on query parameters if provided
-    if request.query_params:
-        account = Accounts.objects.filter(**request.query_params.dict())
-    else:
-        account = Accounts.objects.all()
+    account = filter_queryset(Accounts.objects.all(), AccountFilterSerializer, params).values(*lean.fields)
+
+    if plan:
+        return Response(query_plan(account))
 
     if account:
-        serializer = AccountSerializer(account, many=True)
-        return Response(serializer.data)
+        return Response(lean.rows(account))
     else:
         return Response(status=status.HTTP_404_NOT_FOUND)
 
+# Async variant of view_account, routed instead of it when settings.ASYNC_READ_VIEWS is on
+view_account_async = async_list_view(Accounts, AccountSerializer, AccountFilterSerializer, ACCOUNT_LIST_FIELDS,
+                                     'accounts')
+
+@api_view(['GET'])
+def account_changes(request):
+    """
+    API endpoint returning the accounts records created, changed or deleted after a cursor, for downstream sync.
+
+    Start with ?since=0 and pass the returned 'next' as 'since' on the following call;
+    'limit' caps the number of changes read and 'fields' selects the returned fields.
+    Deleted records are returned as tombstones ('action': 'delete').
+
+    Args:
+        request (Request): The incoming request.
+
+    Returns:
+        Response: A response containing the changes, ordered by change sequence, and the next cursor.
+    """
+    return feed.change_feed_response(request, feed.ACCOUNTS, Accounts, AccountSerializer, ACCOUNT_LIST_FIELDS)
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def export_accounts(request):
+    """
+    API endpoint streaming accounts records as a CSV or NDJSON file, ordered by (year, month, id).
+
+    Takes the filters of view_account (e.g. ?year__gte=2021&year__lte=2023 or ?employee=7),
+    'fields' and 'export_format' ('csv', the default, or 'ndjson'). The file is gzip-compressed
+    when the client sends Accept-Encoding: gzip.
+
+    Args:
+        request (Request): The incoming request.
+
+    Returns:
+        StreamingHttpResponse: The streamed export.
+    """
+    params = request.query_params.dict()
+    export_format = parse_format(params.pop(FORMAT_PARAM, None))
+    lean = LeanSerializer(AccountSerializer, parse_fields(params.pop(FIELDS_PARAM, None), ACCOUNT_LIST_FIELDS))
+    records = filter_queryset(Accounts.objects.all(), AccountFilterSerializer, params) \
+        .values(*lean.fields).order_by('year', 'month', 'id')
+    return export_response(request, records, lean, export_format, 'accounts')
+
 @api_view(['POST'])
 def update_account(request, pk):
     """
@@ -88,10 +157,19 @@ def update_account(request, pk):
         Response: A response containing updated accounts data if successful, or error messages if validation fails.
     """
     account = Accounts.objects.get(pk=pk)
+    previous_employee_id = account.employee_id
     data = AccountSerializer(instance=account, data=request.data)
 
     if data.is_valid():
-        data.save()
+        try:
+            with transaction.atomic():
+                data.save()
+                feed.record(feed.ACCOUNTS, [pk])
+                invalidate('accounts')
+                invalidate_ledgers(previous_employee_id, account.employee_id)
+        except IntegrityError:
+            return Response({'error': 'Accounts Record for this employee already exists'},
+                            status=status.HTTP_409_CONFLICT)
         return Response(data.data)
     else:
         return Response(data.errors, status=status.HTTP_404_NOT_FOUND)
@@ -110,12 +188,173 @@ def delete_account(request, pk):
     """
     try:
         account = Accounts.objects.get(pk=pk)
-        account.delete()
+        with transaction.atomic():
+            account.delete()
+            feed.record(feed.ACCOUNTS, [pk], deleted=True)
+            invalidate('accounts')
+            invalidate_ledgers(account.employee_id)
         return Response(status=status.HTTP_202_ACCEPTED)
     except Exception as e:
         response_html = f'Error: {str(e)}'
         return Response(response_html)
 
+@api_view(['PATCH', 'DELETE'])
+def batch_accounts(request):
+    """
+    API endpoint for changing or deleting many accounts records at once.
+
+    PATCH takes a list of partial updates, each with the 'id' of the record and the fields
+    to set (employee, month, year, salary); records given the same changes are updated by
+    one set-based query. DELETE takes a list of ids. Everything is applied in one transaction.
+
+    Args:
+        request (Request): The incoming request.
+
+    Returns:
+        Response: A response with counts and a status ('updated' or 'deleted', 'not_found' or
+                  'invalid') for each item, in the order the items were sent; 409 if a change
+                  would duplicate an existing record, in which case nothing is applied.
+    """
+    items = request.data
+    error = batch.check_batch(items, 'partial updates' if request.method == 'PATCH' else 'ids')
+    if error is not None:
+        return error
+    results = [None] * len(items)
+
+    if request.method == 'DELETE':
+        ids = batch.validate_ids(items, results)
+        with transaction.atomic():
+            employees = dict(Accounts.objects.select_for_update().filter(pk__in=ids.values())
+                             .values_list('pk', 'employee_id'))
+            ids = batch.drop_missing(ids, employees, results)
+            Accounts.objects.filter(pk__in=ids.values()).delete()
+            feed.record(feed.ACCOUNTS, list(ids.values()), deleted=True)
+            invalidate('accounts')
+            invalidate_ledgers(*employees.values())
+        return batch.batch_response(results, ids, batch.DELETED)
+
+    updates = batch.validate_updates(items, AccountBulkSerializer, results)
+    try:
+        with transaction.atomic():
+            employees = dict(Accounts.objects.select_for_update().filter(pk__in=[pk for pk, _ in updates.values()])
+                             .values_list('pk', 'employee_id'))
+            updates = batch.drop_missing(updates, employees, results)
+
+            # New employees are checked with one query
+            employee_ids = {changes['employee_id'] for _, changes in updates.values() if 'employee_id' in changes}
+            known_employees = set(CustomUser.objects.filter(pk__in=employee_ids).values_list('pk', flat=True))
+            for index, (pk, changes) in list(updates.items()):
+                if 'employee_id' in changes and changes['employee_id'] not in known_employees:
+                    results[index] = batch.invalid(index, {'employee': [
+                        f'Invalid pk "{changes["employee_id"]}" - object does not exist.']})
+                    del updates[index]
+
+            batch.apply_updates(Accounts, updates.values())
+            feed.record(feed.ACCOUNTS, [pk for pk, _ in updates.values()])
+            invalidate('accounts')
+            invalidate_ledgers(*(employees[pk] for pk, _ in updates.values()), *employee_ids)
+    except IntegrityError:
+        return Response({'error': 'The changes would duplicate accounts records; nothing was applied'},
+                        status=status.HTTP_409_CONFLICT)
+    return batch.batch_response(results, updates, batch.UPDATED)
+
+@api_view(['GET'])
+def salary_ledger(request, employee_id):
+    """
+    API endpoint returning the salary ledger of an employee.
+
+    The ledger lists the salary of every month and, per year, the total, the number
+    of paid months, the average and the change from the year before. Yearly figures
+    are aggregated by the database and the ledger is cached until the employee's
+    accounts records change.
+
+    Args:
+        request (Request): The incoming request.
+        employee_id (int): The primary key of the employee.
+
+    Returns:
+        Response: A response containing the ledger, or 404 if the employee does not exist.
+    """
+    ledger = cached_employee_ledger(employee_id)
+    if ledger is None:
+        return Response(status=status.HTTP_404_NOT_FOUND)
+    return Response(ledger)
+
+@api_view(['GET'])
+def department_ledger(request):
+    """
+    API endpoint summarizing salaries per department and year, with one aggregate query.
+
+    Takes an optional 'year' and 'department'.
+
+    Args:
+        request (Request): The incoming request.
+
+    Returns:
+        Response: A response containing, per department and year, the number of paid employees,
+                  the total, the average monthly salary and the year-over-year change.
+    """
+    params = DepartmentLedgerQuerySerializer(data=request.query_params)
+    if not params.is_valid():
+        return Response(params.errors, status=status.HTTP_400_BAD_REQUEST)
+    return Response(department_summary(**params.validated_data))
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAdminUser])
+def pay_rates(request):
+    """
+    API endpoint for listing and setting the pay rules used by the payroll run.
+
+    A POST for an employee that already has pay rules replaces them.
+
+    Args:
+        request (Request): The incoming request.
+
+    Returns:
+        Response: A response containing pay rules data, or error messages if validation fails.
+    """
+    if request.method == 'GET':
+        # The query parameters are passed whole, so that 'employee' can be given several times
+        rates = filter_queryset(PayRate.objects.all(), PayRateFilterSerializer, request.query_params)
+        return Response(PayRateSerializer(rates, many=True).data)
+
+    instance = PayRate.objects.filter(employee=request.data.get('employee')).first()
+    rate = PayRateSerializer(instance=instance, data=request.data)
+    if rate.is_valid():
+        rate.save()
+        return Response(rate.data, status=status.HTTP_200_OK if instance else status.HTTP_201_CREATED)
+    else:
+        return Response(rate.errors, status=status.HTTP_400_BAD_REQUEST)
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def payroll(request):
+    """
+    API endpoint generating the Accounts records of a month from attendance and pay rules.
+
+    The run prices every employee in the request's process; the run_payroll management
+    command prices them in a pool of PAYROLL_WORKERS processes.
+
+    Args:
+        request (Request): The incoming request with 'year', 'month' and optionally 'dry_run'.
+
+    Returns:
+        Response: A response containing the totals of the payroll run; 409 if another run
+                  stored records for the month at the same time, in which case nothing is written.
+    """
+    params = PayrollRunSerializer(data=request.data)
+    if not params.is_valid():
+        return Response(params.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        summary = run_payroll(**params.validated_data, workers=1)
+    except IntegrityError:
+        return Response({'error': 'Another payroll run stored records for this month; nothing was written'},
+                        status=status.HTTP_409_CONFLICT)
+    # Render amounts like the salary field of AccountSerializer, as decimal strings
+    summary = {key: str(value) if isinstance(value, decimal.Decimal) else value for key, value in summary.items()}
+    return Response(summary, status=status.HTTP_200_OK if summary['dry_run'] else status.HTTP_201_CREATED)
+
 @api_view(['GET'])
 def hello_message(request):
     """
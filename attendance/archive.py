@@ -0,0 +1,183 @@
+"""
+Archive tier of the attendance records.
+
+The Attendance table only keeps the records of the hot window: the last
+settings.ATTENDANCE_HOT_MONTHS months. The 'archive_attendance' command moves
+older records, in chunks and with their ids, to AttendanceArchive.
+
+Reads pick their tables by the requested date range. A request whose lower
+date bound falls inside the hot window reads Attendance only, so "this week"
+costs the same however many years of history are archived; other requests
+read both tables, merged on their (date, id) key. The start of the hot window
+only moves forward and records are only archived before it, so routing needs
+no knowledge of when the archive last ran.
+"""
+
+import datetime
+import heapq
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from AttendanceAndAccountsApp.filters import validate_filters
+from AttendanceAndAccountsApp.pagination import merge_rows
+from .models import Attendance, AttendanceArchive
+from .serializers import AttendanceFilterSerializer
+
+# The keyset of both tables
+ORDERING = ('date', 'id')
+
+# The columns moved to the archive
+ARCHIVED_FIELDS = ('id', 'employee_id', 'check_in_time', 'check_out_time', 'date', 'updated_at')
+
+
+def hot_cutoff(today=None):
+    """
+    Returns the first day of the hot window.
+
+    Args:
+        today (date, optional): The current date (default: today in the current time zone).
+
+    Returns:
+        date: The first day of the month ATTENDANCE_HOT_MONTHS months before the current one.
+    """
+    today = today or timezone.localdate()
+    months = today.year * 12 + today.month - 1 - settings.ATTENDANCE_HOT_MONTHS
+    return datetime.date(months // 12, months % 12 + 1, 1)
+
+
+def lower_bound(filters):
+    """
+    Finds the earliest date the records matching a set of lookups can have.
+
+    Args:
+        filters (dict): Attendance lookups, e.g. {'date__gte': date(2024, 1, 1)}.
+
+    Returns:
+        date: The lower bound, or None if the lookups do not restrict the date from below.
+    """
+    bounds = [filters[lookup] for lookup in ('date', 'date__gte', 'date__gt') if lookup in filters]
+    if 'date__range' in filters:
+        bounds.append(filters['date__range'][0])
+    if 'date__in' in filters:
+        bounds.append(min(filters['date__in'], default=datetime.date.max))
+    return max(bounds, default=None)
+
+
+def reaches_archive(filters):
+    """
+    Tells whether archived records can match a set of lookups.
+    """
+    bound = lower_bound(filters)
+    return bound is None or bound < hot_cutoff()
+
+
+def partitions(**filters):
+    """
+    Filters the attendance tables that records matching the lookups can be in.
+
+    Args:
+        **filters: Lookups valid on both Attendance and AttendanceArchive.
+
+    Returns:
+        list: Filtered querysets; the AttendanceArchive one first when it is read, then the Attendance one.
+    """
+    querysets = [Attendance.objects.filter(**filters)]
+    if reaches_archive(filters):
+        querysets.insert(0, AttendanceArchive.objects.filter(**filters))
+    return querysets
+
+
+def filter_partitions(params):
+    """
+    Applies the filters of the attendance list endpoints to the tables the requested date range reaches.
+
+    Args:
+        params (dict): The query parameters declared by AttendanceFilterSerializer.
+
+    Returns:
+        list: The filtered querysets, see partitions().
+
+    Raises:
+        ValidationError: If a parameter is not a supported filter or has an invalid value.
+    """
+    return partitions(**validate_filters(AttendanceFilterSerializer, params))
+
+
+def iterate(querysets, chunk_size=None):
+    """
+    Reads filtered values() querysets, which must include 'date' and 'id', as one sequence ordered by (date, id).
+
+    Args:
+        querysets (list): The querysets returned by partitions().
+        chunk_size (int, optional): Rows fetched per chunk from each table.
+
+    Returns:
+        iterator: The rows, read lazily.
+    """
+    chunk_size = chunk_size or settings.LIST_STREAM_CHUNK_SIZE
+    return merge_rows([queryset.order_by(*ORDERING).iterator(chunk_size=chunk_size) for queryset in querysets],
+                      ORDERING)
+
+
+def iterate_by_employee(fields, chunk_size):
+    """
+    Reads the given columns of all attendance records, hot and archived, ordered by (employee_id, date).
+
+    Args:
+        fields (tuple): The columns read, starting with 'employee_id', 'date'.
+        chunk_size (int): Rows fetched per chunk from each table.
+
+    Returns:
+        iterator: values_list() tuples, read lazily.
+    """
+    return heapq.merge(*(model.objects.order_by('employee_id', 'date').values_list(*fields)
+                         .iterator(chunk_size=chunk_size) for model in (AttendanceArchive, Attendance)),
+                       key=lambda row: row[:2])
+
+
+def is_archived(employee_id, date):
+    """
+    Tells whether an employee's record of a date is in the archive.
+
+    Attendance and AttendanceArchive each allow one record per employee and
+    date; the write endpoints check the archive before adding a record in its range.
+    """
+    return date < hot_cutoff() and AttendanceArchive.objects.filter(employee_id=employee_id, date=date).exists()
+
+
+def archive_records(before=None, chunk_size=None):
+    """
+    Moves the attendance records dated before a day from Attendance to AttendanceArchive.
+
+    Each chunk is copied and deleted in its own transaction, so the move can be
+    interrupted and resumed, and readers see every record in exactly one table.
+    Records keep their ids, so the change feed and the rollups need no update.
+
+    Args:
+        before (date, optional): The first day kept in Attendance (default: the start of the hot window).
+        chunk_size (int, optional): Records moved per transaction (default: ATTENDANCE_ARCHIVE_CHUNK_SIZE).
+
+    Returns:
+        int: The number of records moved.
+
+    Raises:
+        ValueError: If before is inside the hot window, where reads would not look for archived records.
+    """
+    cutoff = hot_cutoff()
+    before = before or cutoff
+    if before > cutoff:
+        raise ValueError(f'Records from {cutoff} on are in the hot window and cannot be archived')
+    chunk_size = chunk_size or settings.ATTENDANCE_ARCHIVE_CHUNK_SIZE
+
+    moved = 0
+    while True:
+        with transaction.atomic():
+            rows = list(Attendance.objects.select_for_update().filter(date__lt=before).order_by(*ORDERING)
+                        .values(*ARCHIVED_FIELDS)[:chunk_size])
+            if not rows:
+                return moved
+            AttendanceArchive.objects.bulk_create([AttendanceArchive(**row) for row in rows])
+            Attendance.objects.filter(pk__in=[row['id'] for row in rows]).delete()
+        moved += len(rows)
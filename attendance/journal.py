@@ -0,0 +1,343 @@
+"""
+Write-behind buffer for punches (settings.ATTENDANCE_WRITE_BEHIND).
+
+In write-behind mode the punch endpoint does not write to the main database.
+It appends the punch to a local journal, a SQLite database in WAL mode with
+synchronous=FULL, so the punch is durable once it is acknowledged. A
+background PunchFlusher then applies the journaled punches to the main
+database in batches of at most ATTENDANCE_JOURNAL_BATCH_SIZE, at least every
+ATTENDANCE_JOURNAL_FLUSH_INTERVAL seconds, and removes them from the journal
+once the batch has committed. Punches still in the journal when a process
+stops are applied by the next flusher that starts.
+
+All worker processes of a host share the journal file. Only the process
+holding the flush lease applies punches, so batches are applied one at a time
+and in the order the punches were made. Applying a batch is idempotent: a punch
+whose time is already recorded is skipped, so a batch that committed just
+before a crash, but was not removed from the journal, can be replayed safely.
+"""
+
+import atexit
+import datetime
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+
+from AttendanceAndAccountsApp import metrics
+from AttendanceAndAccountsApp.cache import invalidate
+from changes import feed
+from users.models import CustomUser
+from . import punches, rollups
+from .models import Attendance
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS punch (seq INTEGER PRIMARY KEY AUTOINCREMENT, employee_id INTEGER NOT NULL, '
+    'at TEXT NOT NULL)',
+    'CREATE TABLE IF NOT EXISTS lease (id INTEGER PRIMARY KEY CHECK (id = 1), owner TEXT, expires REAL)',
+    'INSERT OR IGNORE INTO lease (id, owner, expires) VALUES (1, NULL, 0)',
+)
+
+# Outcomes of applying a punch, besides punches.CHECK_IN and punches.CHECK_OUT
+DUPLICATE = 'duplicate'
+REJECTED = 'rejected'
+OUTCOMES = (punches.CHECK_IN, punches.CHECK_OUT, DUPLICATE, REJECTED)
+
+
+class PunchJournal:
+    """
+    The durable, append-only journal of punches that were not applied yet.
+
+    Each thread uses its own connection to the journal file.
+
+    Attributes:
+        path (str): The path of the SQLite journal file.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.local = threading.local()
+
+    def connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=FULL')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            self.local.connection = connection
+        return connection
+
+    def append(self, employee_id, at):
+        """
+        Appends a punch; it is durable when this returns.
+
+        Returns:
+            int: The sequence number of the punch.
+        """
+        cursor = self.connection().execute('INSERT INTO punch (employee_id, at) VALUES (?, ?)',
+                                           (employee_id, at.isoformat()))
+        return cursor.lastrowid
+
+    def peek(self, limit):
+        """
+        Returns the oldest punches of the journal.
+
+        Returns:
+            list: (seq, employee_id, at) tuples in the order the punches were made.
+        """
+        rows = self.connection().execute('SELECT seq, employee_id, at FROM punch ORDER BY seq LIMIT ?', (limit,))
+        return [(seq, employee_id, datetime.datetime.fromisoformat(at)) for seq, employee_id, at in rows]
+
+    def remove(self, up_to_seq):
+        """
+        Removes the punches up to and including a sequence number, once they were applied.
+        """
+        self.connection().execute('DELETE FROM punch WHERE seq <= ?', (up_to_seq,))
+
+    def stats(self):
+        """
+        Returns the number of punches in the journal and the time of the oldest one.
+
+        Returns:
+            tuple: The depth and the time of the oldest punch (None when the journal is empty).
+        """
+        depth, oldest = self.connection().execute('SELECT COUNT(*), MIN(at) FROM punch').fetchone()
+        return depth, datetime.datetime.fromisoformat(oldest) if oldest else None
+
+    def acquire_lease(self, owner, seconds):
+        """
+        Acquires or renews the flush lease.
+
+        Args:
+            owner (str): Identifies the process or command flushing the journal.
+            seconds (float): How long the lease is valid without being renewed.
+
+        Returns:
+            bool: True if owner holds the lease.
+        """
+        now = time.time()
+        cursor = self.connection().execute(
+            'UPDATE lease SET owner = ?, expires = ? WHERE id = 1 AND (owner = ? OR owner IS NULL OR expires < ?)',
+            (owner, now + seconds, owner, now))
+        return cursor.rowcount == 1
+
+    def release_lease(self, owner):
+        self.connection().execute('UPDATE lease SET owner = NULL, expires = 0 WHERE id = 1 AND owner = ?', (owner,))
+
+
+def journal_time(at=None):
+    """
+    Returns the time to journal a punch with, truncated to milliseconds.
+
+    Backends such as MongoDB store milliseconds, so the truncated time can be
+    compared with the stored one to recognise punches that were already applied.
+    """
+    at = at or timezone.now()
+    return at.replace(microsecond=at.microsecond // 1000 * 1000)
+
+
+def apply_punches(punched):
+    """
+    Applies a batch of punches to the database in one transaction.
+
+    The records of the batch are read with one query, new records are inserted
+    with bulk_create and check-outs are written with bulk_update; rollups, the change
+    feed and the response cache are updated once for the whole batch.
+
+    Args:
+        punched (list): (employee_id, at) pairs in the order the punches were made.
+
+    Returns:
+        dict: The number of punches per outcome: check_in, check_out, duplicate and rejected.
+    """
+    outcomes = dict.fromkeys(OUTCOMES, 0)
+    keys = {(employee_id, timezone.localdate(at)) for employee_id, at in punched}
+    employee_ids = {employee_id for employee_id, _ in keys}
+    known = set(CustomUser.objects.filter(pk__in=employee_ids).values_list('pk', flat=True))
+    existing = {(record.employee_id, record.date): record for record in
+                Attendance.objects.filter(employee_id__in=employee_ids, date__in={date for _, date in keys})}
+
+    now = timezone.now()
+    created, checked_out, before = {}, {}, {}
+    for employee_id, at in punched:
+        key = (employee_id, timezone.localdate(at))
+        record = existing.get(key) or created.get(key)
+        if employee_id not in known:
+            outcome = REJECTED
+        elif record is None:
+            created[key] = Attendance(employee_id=employee_id, date=key[1], check_in_time=at)
+            outcome = punches.CHECK_IN
+        elif at in (record.check_in_time, record.check_out_time):
+            outcome = DUPLICATE
+        elif record.check_out_time is None:
+            if key in existing:
+                before[key] = rollups.snapshot(record)
+                checked_out[key] = record
+            record.check_out_time = at
+            record.updated_at = now
+            outcome = punches.CHECK_OUT
+        else:
+            outcome = REJECTED
+        outcomes[outcome] += 1
+
+    with transaction.atomic():
+        Attendance.objects.bulk_create(created.values())
+        Attendance.objects.bulk_update(checked_out.values(), ['check_out_time', 'updated_at'])
+        rollups.apply_changes(removed=before.values(), added=[*created.values(), *checked_out.values()])
+        feed.record(feed.ATTENDANCE, [*feed.inserted_ids(Attendance, list(created.values()), ('employee_id', 'date')),
+                                      *(record.pk for record in checked_out.values())])
+        if created or checked_out:
+            invalidate('attendance')
+    return outcomes
+
+
+def flush(journal, owner, batch_size=None):
+    """
+    Applies the punches of the journal in batches, if owner holds the flush lease.
+
+    Args:
+        journal (PunchJournal): The journal to flush.
+        owner (str): Identifies the flushing process.
+        batch_size (int, optional): The maximum number of punches per batch.
+
+    Returns:
+        dict: The number of punches per outcome, or None if another process holds the lease.
+    """
+    batch_size = batch_size or settings.ATTENDANCE_JOURNAL_BATCH_SIZE
+    lease = max(30.0, 10 * settings.ATTENDANCE_JOURNAL_FLUSH_INTERVAL)
+    totals = dict.fromkeys(OUTCOMES, 0)
+    while True:
+        if not journal.acquire_lease(owner, lease):
+            return None
+        batch = journal.peek(batch_size)
+        if not batch:
+            return totals
+        outcomes = apply_punches([(employee_id, at) for _, employee_id, at in batch])
+        journal.remove(batch[-1][0])
+        for outcome, count in outcomes.items():
+            totals[outcome] += count
+            if count:
+                metrics.increment('attendance_punch_journal_punches_total', (('outcome', outcome),),
+                                  help_text='Journaled punches applied to the database, by outcome.', amount=count)
+        if len(batch) < batch_size:
+            return totals
+
+
+def publish_stats(journal):
+    depth, oldest = journal.stats()
+    metrics.set_gauge('attendance_punch_journal_depth', depth,
+                      help_text='Punches waiting in the write-behind journal.')
+    metrics.set_gauge('attendance_punch_journal_lag_seconds',
+                      (timezone.now() - oldest).total_seconds() if oldest else 0,
+                      help_text='Age of the oldest punch waiting in the write-behind journal.')
+
+
+class PunchFlusher(threading.Thread):
+    """
+    Background thread applying the journaled punches of this host.
+
+    It flushes every ATTENDANCE_JOURNAL_FLUSH_INTERVAL seconds, and as soon as a
+    full batch was appended by this process.
+    """
+
+    def __init__(self, journal):
+        super().__init__(name='punch-journal-flusher', daemon=True)
+        self.journal = journal
+        self.owner = f'{socket.gethostname()}:{os.getpid()}'
+        self.wake = threading.Event()
+        self.stopping = threading.Event()
+        self.appended = 0
+
+    def notify(self):
+        """
+        Called after each append; wakes the flusher up once a full batch is waiting.
+        """
+        self.appended += 1
+        if self.appended >= settings.ATTENDANCE_JOURNAL_BATCH_SIZE:
+            self.wake.set()
+
+    def run(self):
+        while not self.stopping.is_set():
+            self.appended = 0
+            close_old_connections()
+            try:
+                flush(self.journal, self.owner)
+                publish_stats(self.journal)
+            except IntegrityError as e:
+                # A record was written concurrently through another endpoint; the batch is retried
+                logger.warning('Punch journal batch conflicted and will be retried: %s', e)
+            except Exception:
+                logger.exception('Flushing the punch journal failed')
+            finally:
+                close_old_connections()
+            self.wake.wait(settings.ATTENDANCE_JOURNAL_FLUSH_INTERVAL)
+            self.wake.clear()
+
+    def stop(self):
+        self.stopping.set()
+        self.wake.set()
+        self.journal.release_lease(self.owner)
+
+
+_journal = None
+_flusher = None
+_lock = threading.RLock()
+
+
+def get_journal():
+    """
+    Returns the journal at settings.ATTENDANCE_JOURNAL_PATH, shared by the threads of the process.
+    """
+    global _journal
+    with _lock:
+        if _journal is None:
+            _journal = PunchJournal(settings.ATTENDANCE_JOURNAL_PATH)
+        return _journal
+
+
+def start_flusher():
+    """
+    Starts the flusher of this process when write-behind is on, which replays any punches left in the journal.
+
+    Called by the WSGI and ASGI entry points, so management commands never start one.
+
+    Returns:
+        PunchFlusher: The running flusher, or None if write-behind is off.
+    """
+    global _flusher
+    if not settings.ATTENDANCE_WRITE_BEHIND:
+        return None
+    with _lock:
+        if _flusher is None:
+            _flusher = PunchFlusher(get_journal())
+            _flusher.start()
+            # Hand the lease over to the other processes right away on a clean shutdown
+            atexit.register(_flusher.stop)
+        return _flusher
+
+
+def enqueue_punch(employee_id):
+    """
+    Journals a punch of an employee, to be applied by the flusher.
+
+    Args:
+        employee_id (int): The primary key of the employee.
+
+    Returns:
+        datetime: The time of the punch.
+    """
+    at = journal_time()
+    get_journal().append(employee_id, at)
+    if _flusher is not None:
+        _flusher.notify()
+    return at
@@ -0,0 +1,34 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from AttendanceAndAccountsApp.cache import invalidate
+from attendance.archive import archive_records, hot_cutoff
+
+
+class Command(BaseCommand):
+    """
+    Management command moving the attendance records older than the hot window to the archive.
+
+    Run it periodically, e.g. monthly from cron; records are moved in chunks, one transaction per chunk.
+
+    Example:
+        python manage.py archive_attendance --chunk-size 5000
+    """
+
+    help = 'Moves attendance records older than ATTENDANCE_HOT_MONTHS months to the attendance archive.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', type=datetime.date.fromisoformat,
+                            help='First day kept in the hot table, YYYY-MM-DD (default and latest: the hot window start).')
+        parser.add_argument('--chunk-size', type=int,
+                            help='Records moved per transaction (default: ATTENDANCE_ARCHIVE_CHUNK_SIZE).')
+
+    def handle(self, *args, **options):
+        try:
+            moved = archive_records(before=options['before'], chunk_size=options['chunk_size'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        invalidate('attendance')
+        before = options['before'] or hot_cutoff()
+        self.stdout.write(self.style.SUCCESS(f'Archived {moved} attendance records dated before {before}'))
@@ -0,0 +1,27 @@
+from AttendanceAndAccountsApp.export import ExportCommand
+from attendance import archive
+from attendance.models import Attendance
+from attendance.serializers import ATTENDANCE_LIST_FIELDS, AttendanceFilterSerializer, AttendanceSerializer
+
+
+class Command(ExportCommand):
+    """
+    Management command streaming attendance records to a CSV or NDJSON file.
+
+    Example:
+        python manage.py export_attendance --filter date__gte=2023-01-01 --filter date__lt=2024-01-01 \
+            --output attendance-2023.csv.gz
+    """
+
+    help = 'Exports attendance records as CSV or NDJSON, ordered by (date, id).'
+
+    model = Attendance
+    serializer_class = AttendanceSerializer
+    filter_class = AttendanceFilterSerializer
+    list_fields = ATTENDANCE_LIST_FIELDS
+    ordering = archive.ORDERING
+
+    def get_records(self, params, fields, chunk_size):
+        # Date ranges reaching before the hot window also read the archive
+        partitions = [queryset.values(*fields, 'date', 'id') for queryset in archive.filter_partitions(params)]
+        return archive.iterate(partitions, chunk_size)
@@ -0,0 +1,40 @@
+import os
+import socket
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance.journal import flush, get_journal
+
+
+class Command(BaseCommand):
+    """
+    Management command applying the punches left in the write-behind journal, e.g. while the servers are down.
+
+    Example:
+        python manage.py flush_punch_journal --batch-size 1000
+    """
+
+    help = 'Applies the punches waiting in the write-behind journal to the database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+                            help='Punches applied per transaction (default: ATTENDANCE_JOURNAL_BATCH_SIZE).')
+
+    def handle(self, *args, **options):
+        if not os.path.exists(settings.ATTENDANCE_JOURNAL_PATH):
+            self.stdout.write(f'No journal at {settings.ATTENDANCE_JOURNAL_PATH}')
+            return
+
+        journal = get_journal()
+        owner = f'{socket.gethostname()}:{os.getpid()}:flush_punch_journal'
+        try:
+            outcomes = flush(journal, owner, batch_size=options['batch_size'])
+        finally:
+            journal.release_lease(owner)
+        if outcomes is None:
+            raise CommandError('A running server is flushing the journal; try again once it is stopped.')
+
+        depth, _ = journal.stats()
+        summary = ', '.join(f'{count} {outcome}' for outcome, count in outcomes.items())
+        self.stdout.write(self.style.SUCCESS(f'Applied journaled punches: {summary}; {depth} left'))
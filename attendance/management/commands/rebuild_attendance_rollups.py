@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from AttendanceAndAccountsApp.cache import invalidate
+from attendance.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    """
+    Management command recomputing the monthly attendance rollups from scratch.
+
+    Example:
+        python manage.py rebuild_attendance_rollups --chunk-size 5000
+    """
+
+    help = 'Recomputes the monthly attendance rollups from all attendance records.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int,
+                            help='Rows fetched and rollups inserted per chunk (default: ATTENDANCE_ROLLUP_CHUNK_SIZE).')
+
+    def handle(self, *args, **options):
+        written = rebuild_rollups(chunk_size=options['chunk_size'])
+        invalidate('attendance')
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} attendance rollups'))
@@ -0,0 +1,44 @@
+# Generated by Django 4.1.13 on 2026-10-18 10:04
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def merge_duplicates(apps, schema_editor):
+    """
+    Merges the attendance records sharing an (employee, date), so that the unique constraint can be added.
+
+    The check-then-insert create path could store such duplicates under
+    concurrent requests. The record with the lowest id is kept, with the
+    earliest check-in and the latest check-out of its group; the others are deleted.
+    """
+    Attendance = apps.get_model('attendance', 'Attendance')
+    groups = (Attendance.objects.values('employee_id', 'date').annotate(records=Count('id'))
+              .filter(records__gt=1).values_list('employee_id', 'date'))
+    for employee_id, date in list(groups):
+        kept, *others = Attendance.objects.filter(employee_id=employee_id, date=date).order_by('id')
+        records = [kept, *others]
+        kept.check_in_time = min(record.check_in_time for record in records)
+        check_outs = [record.check_out_time for record in records if record.check_out_time is not None]
+        kept.check_out_time = max(check_outs) if check_outs else None
+        kept.save(update_fields=['check_in_time', 'check_out_time'])
+        Attendance.objects.filter(pk__in=[record.pk for record in others]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['date', 'id'], name='attendance_date_id_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='attendance',
+            constraint=models.UniqueConstraint(fields=('employee', 'date'), name='unique_attendance_employee_date'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.1.13 on 2026-10-18 10:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('attendance', '0002_attendance_attendance_date_id_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('month', models.IntegerField()),
+                ('seconds_worked', models.BigIntegerField(default=0)),
+                ('days_present', models.IntegerField(default=0)),
+                ('late_arrivals', models.IntegerField(default=0)),
+                ('missing_checkouts', models.IntegerField(default=0)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='attendancerollup',
+            index=models.Index(fields=['year', 'month'], name='rollup_year_month_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='attendancerollup',
+            constraint=models.UniqueConstraint(fields=('employee', 'year', 'month'), name='unique_rollup_employee_period'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.13 on 2026-10-18 10:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0003_attendancerollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendance',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.1.13 on 2026-10-18 10:36
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('attendance', '0004_attendance_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('check_in_time', models.DateTimeField()),
+                ('check_out_time', models.DateTimeField(blank=True, null=True)),
+                ('date', models.DateField()),
+                ('updated_at', models.DateTimeField()),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='attendancearchive',
+            index=models.Index(fields=['date', 'id'], name='archive_date_id_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='attendancearchive',
+            constraint=models.UniqueConstraint(fields=('employee', 'date'), name='unique_archive_employee_date'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.1.13 on 2026-10-18 12:10
+
+from django.conf import settings
+from django.db import migrations
+from django.utils import timezone
+
+BATCH_SIZE = 2000
+
+
+def seed_rollups(apps, schema_editor):
+    """
+    Recomputes the monthly rollups from the existing attendance records, hot and archived.
+
+    Installs that had attendance before the rollups were introduced got an empty
+    table, which the write paths then drove negative; the rollups are rebuilt
+    from scratch, in one streaming pass.
+    """
+    AttendanceRollup = apps.get_model('attendance', 'AttendanceRollup')
+    totals = {}
+    for model_name in ('Attendance', 'AttendanceArchive'):
+        records = apps.get_model('attendance', model_name).objects.values_list(
+            'employee_id', 'date', 'check_in_time', 'check_out_time')
+        for employee_id, date, check_in_time, check_out_time in records.iterator(chunk_size=BATCH_SIZE):
+            # The counters of attendance.rollups.contribution() at the time of this migration
+            seconds_worked = max(int((check_out_time - check_in_time).total_seconds()), 0) if check_out_time else 0
+            late = timezone.localtime(check_in_time).time() > settings.ATTENDANCE_LATE_AFTER
+            values = totals.setdefault((employee_id, date.year, date.month), [0, 0, 0, 0])
+            values[0] += seconds_worked
+            values[1] += 1
+            values[2] += int(late)
+            values[3] += int(check_out_time is None)
+
+    AttendanceRollup.objects.all().delete()
+    AttendanceRollup.objects.bulk_create(
+        [AttendanceRollup(employee_id=employee_id, year=year, month=month, seconds_worked=seconds_worked,
+                          days_present=days_present, late_arrivals=late_arrivals, missing_checkouts=missing_checkouts)
+         for (employee_id, year, month), (seconds_worked, days_present, late_arrivals, missing_checkouts)
+         in totals.items()],
+        batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0005_attendancearchive'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_rollups, migrations.RunPython.noop),
+    ]
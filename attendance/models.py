@@ -10,6 +10,7 @@ class Attendance(models.Model):
         check_in_time (DateTime): The time when the employee checked in.
         check_out_time (DateTime, optional): The time when the employee checked out (nullable).
         date (Date): The date of the attendance record.
+        updated_at (DateTime): The time the record was last created or changed.
 
     Methods:
         __str__(): Returns a string representation of the attendance record.
@@ -22,6 +23,7 @@ class Attendance(models.Model):
     check_in_time = models.DateTimeField()
     check_out_time = models.DateTimeField(null=True, blank=True)
     date = models.DateField()
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         """
@@ -38,5 +40,126 @@ class Attendance(models.Model):
 
         Attributes:
             app_label (str): Specifies the app label for the attendance model.
+            constraints (list): Allows a single attendance record per employee and date.
+            indexes (list): Supports listing attendance records ordered by (date, id).
         """
         app_label = 'attendance'
+        constraints = [
+            models.UniqueConstraint(fields=['employee', 'date'], name='unique_attendance_employee_date'),
+        ]
+        indexes = [
+            models.Index(fields=['date', 'id'], name='attendance_date_id_idx'),
+        ]
+
+
+class AttendanceRollup(models.Model):
+    """
+    Model holding the monthly attendance totals of an employee.
+
+    Rows are kept up to date incrementally by the attendance write endpoints
+    (see attendance.rollups) and can be rebuilt with the
+    'rebuild_attendance_rollups' management command.
+
+    Attributes:
+        employee (CustomUser): The employee the totals belong to (ForeignKey).
+        year (int): The year of the totals.
+        month (int): The month of the totals.
+        seconds_worked (int): The time between check-in and check-out, summed over the month.
+        days_present (int): The number of attendance records in the month.
+        late_arrivals (int): The number of check-ins after settings.ATTENDANCE_LATE_AFTER.
+        missing_checkouts (int): The number of attendance records without a check-out time.
+
+    Meta:
+        app_label (str): Specifies the app label for the rollup model (used for Django app configuration).
+    """
+
+    employee = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
+    year = models.IntegerField()
+    month = models.IntegerField()
+    seconds_worked = models.BigIntegerField(default=0)
+    days_present = models.IntegerField(default=0)
+    late_arrivals = models.IntegerField(default=0)
+    missing_checkouts = models.IntegerField(default=0)
+
+    def __str__(self):
+        """
+        Returns a string representation of the rollup.
+
+        Returns:
+            str: A formatted string with the employee's username, month and year.
+        """
+        return f"{self.employee.username} - {self.month}/{self.year}"
+
+    class Meta:
+        """
+        Meta class for AttendanceRollup.
+
+        Attributes:
+            app_label (str): Specifies the app label for the rollup model.
+            constraints (list): Allows a single rollup per employee, year and month.
+            indexes (list): Supports reading the rollups of a given month.
+        """
+        app_label = 'attendance'
+        constraints = [
+            models.UniqueConstraint(fields=['employee', 'year', 'month'], name='unique_rollup_employee_period'),
+        ]
+        indexes = [
+            models.Index(fields=['year', 'month'], name='rollup_year_month_idx'),
+        ]
+
+
+class AttendanceArchive(models.Model):
+    """
+    Model holding the attendance records older than the hot window.
+
+    Records are moved here from Attendance, with the same ids, by the
+    'archive_attendance' management command (see attendance.archive), so the
+    Attendance table only grows with the last settings.ATTENDANCE_HOT_MONTHS
+    months. The list endpoints and reports read this table only when the
+    requested date range reaches before the hot window. Archived records are
+    read-only through the API.
+
+    Attributes:
+        id (int): The id the record had in Attendance.
+        employee (CustomUser): The employee associated with the attendance record (ForeignKey).
+        check_in_time (DateTime): The time when the employee checked in.
+        check_out_time (DateTime, optional): The time when the employee checked out (nullable).
+        date (Date): The date of the attendance record.
+        updated_at (DateTime): The time the record was last changed before it was archived.
+
+    Meta:
+        app_label (str): Specifies the app label for the archive model (used for Django app configuration).
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    employee = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
+    check_in_time = models.DateTimeField()
+    check_out_time = models.DateTimeField(null=True, blank=True)
+    date = models.DateField()
+    updated_at = models.DateTimeField()
+
+    def __str__(self):
+        """
+        Returns a string representation of the archived record.
+
+        Returns:
+            str: A formatted string with the employee's username and the date.
+        """
+        return f"{self.employee.username} - {self.date}"
+
+    class Meta:
+        """
+        Meta class for AttendanceArchive.
+
+        Attributes:
+            app_label (str): Specifies the app label for the archive model.
+            constraints (list): Allows a single archived record per employee and date.
+            indexes (list): Supports listing archived records ordered by (date, id).
+        """
+        app_label = 'attendance'
+        constraints = [
+            models.UniqueConstraint(fields=['employee', 'date'], name='unique_archive_employee_date'),
+        ]
+        indexes = [
+            models.Index(fields=['date', 'id'], name='archive_date_id_idx'),
+        ]
@@ -0,0 +1,75 @@
+"""
+Punch-in / punch-out of the authenticated employee.
+
+A punch is the check-in of the day when the employee has no attendance record
+for the day yet, and the check-out otherwise. The check-in is a plain insert,
+which the unique (employee, date) constraint turns into the decision: if the
+insert conflicts, the punch is applied as a conditional update setting the
+check-out time of the existing record, so concurrent punches can never create
+two records or overwrite a check-out.
+"""
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from AttendanceAndAccountsApp.cache import invalidate
+from changes import feed
+from . import rollups
+from .models import Attendance
+
+CHECK_IN = 'check_in'
+CHECK_OUT = 'check_out'
+
+
+class AlreadyCheckedOut(Exception):
+    """
+    Raised when an employee punches after checking out for the day.
+    """
+
+    def __init__(self, employee_id, date):
+        super().__init__(f'Employee {employee_id} already checked out on {date}')
+        self.employee_id = employee_id
+        self.date = date
+
+
+def punch(employee_id, at=None):
+    """
+    Records a punch of an employee.
+
+    Check-ins, the bulk of the morning burst, take a single insert; check-outs
+    take the failed insert, one update and one read of the record.
+
+    Args:
+        employee_id (int): The primary key of the employee.
+        at (datetime, optional): The time of the punch; defaults to now. Its local date is the attendance date.
+
+    Returns:
+        tuple: CHECK_IN or CHECK_OUT, and the attendance record.
+
+    Raises:
+        AlreadyCheckedOut: If the record of the day already has a check-out time.
+    """
+    at = at or timezone.now()
+    date = timezone.localdate(at)
+
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                record = Attendance.objects.create(employee_id=employee_id, date=date, check_in_time=at)
+        except IntegrityError:
+            record = None
+
+        if record is not None:
+            action = CHECK_IN
+            rollups.record_change(after=record)
+        else:
+            action = CHECK_OUT
+            checked_out = Attendance.objects.filter(employee_id=employee_id, date=date, check_out_time__isnull=True) \
+                .update(check_out_time=at, updated_at=timezone.now())
+            if not checked_out:
+                raise AlreadyCheckedOut(employee_id, date)
+            record = Attendance.objects.get(employee_id=employee_id, date=date)
+            rollups.record_change((employee_id, date, record.check_in_time, None), record)
+        feed.record(feed.ATTENDANCE, [record.pk])
+        invalidate('attendance')
+    return action, record
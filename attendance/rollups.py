@@ -0,0 +1,150 @@
+"""
+Incremental maintenance of the monthly attendance rollups.
+
+Every attendance record contributes a fixed set of counters to the rollup of
+its (employee, year, month). When records are added, changed or removed, the
+write endpoints pass the records before and after the change to
+apply_changes(), which subtracts the old contributions, adds the new ones and
+writes one update per affected rollup.
+"""
+
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .archive import iterate_by_employee
+from .models import AttendanceRollup
+
+COUNTERS = ('seconds_worked', 'days_present', 'late_arrivals', 'missing_checkouts')
+
+# The fields of an attendance record that the rollups depend on, in snapshot order
+SNAPSHOT_FIELDS = ('employee_id', 'date', 'check_in_time', 'check_out_time')
+
+
+def snapshot(record):
+    """
+    Captures the fields of an attendance record that the rollups depend on.
+
+    Take the snapshot before an update or delete changes the instance.
+
+    Args:
+        record (Attendance): The attendance record.
+
+    Returns:
+        tuple: (employee_id, date, check_in_time, check_out_time).
+    """
+    return tuple(getattr(record, name) for name in SNAPSHOT_FIELDS)
+
+
+def contribution(employee_id, date, check_in_time, check_out_time):
+    """
+    Computes what one attendance record adds to its monthly rollup.
+
+    Returns:
+        tuple: The rollup key (employee_id, year, month) and the counter values.
+    """
+    if check_out_time is not None:
+        seconds_worked = max(int((check_out_time - check_in_time).total_seconds()), 0)
+    else:
+        seconds_worked = 0
+    late = timezone.localtime(check_in_time).time() > settings.ATTENDANCE_LATE_AFTER
+    counters = (seconds_worked, 1, int(late), int(check_out_time is None))
+    return (employee_id, date.year, date.month), counters
+
+
+def _as_snapshot(record):
+    return record if isinstance(record, tuple) else snapshot(record)
+
+
+def apply_changes(removed=(), added=()):
+    """
+    Updates the rollups for attendance records that were removed and/or added.
+
+    An updated record is passed both as removed (its snapshot from before the
+    change) and as added. Should be called in the same transaction as the change.
+
+    Args:
+        removed (iterable): Snapshots or instances of records as they were before the change.
+        added (iterable): Snapshots or instances of records as they are after the change.
+    """
+    deltas = defaultdict(lambda: [0] * len(COUNTERS))
+    for sign, records in ((-1, removed), (1, added)):
+        for record in records:
+            key, counters = contribution(*_as_snapshot(record))
+            for index, value in enumerate(counters):
+                deltas[key][index] += sign * value
+
+    for (employee_id, year, month), values in deltas.items():
+        if not any(values):
+            continue
+        changes = {name: F(name) + value for name, value in zip(COUNTERS, values)}
+        rollup = AttendanceRollup.objects.filter(employee_id=employee_id, year=year, month=month)
+        if rollup.update(**changes):
+            continue
+        try:
+            with transaction.atomic():
+                AttendanceRollup.objects.create(employee_id=employee_id, year=year, month=month,
+                                                **dict(zip(COUNTERS, values)))
+        except IntegrityError:
+            # Created concurrently by another request
+            rollup.update(**changes)
+
+
+def record_change(before=None, after=None):
+    """
+    Updates the rollups for a single added, updated or deleted attendance record.
+
+    Args:
+        before (tuple, optional): The snapshot of the record before the change, None if it was added.
+        after (Attendance, optional): The record after the change, None if it was deleted.
+    """
+    apply_changes(removed=[before] if before else (), added=[after] if after else ())
+
+
+def rebuild_rollups(chunk_size=None):
+    """
+    Recomputes all rollups from the attendance records in one streaming pass.
+
+    Hot and archived records are read ordered by employee, so only the totals
+    of one employee are held in memory at a time.
+
+    Args:
+        chunk_size (int, optional): Rows fetched and rollups inserted per chunk.
+
+    Returns:
+        int: The number of rollups written.
+    """
+    chunk_size = chunk_size or settings.ATTENDANCE_ROLLUP_CHUNK_SIZE
+    rows = iterate_by_employee(('employee_id', 'date', 'check_in_time', 'check_out_time'), chunk_size)
+    pending = []
+    written = 0
+    current_employee = None
+    totals = {}
+
+    def flush_employee():
+        for (employee_id, year, month), values in totals.items():
+            pending.append(AttendanceRollup(employee_id=employee_id, year=year, month=month,
+                                            **dict(zip(COUNTERS, values))))
+        totals.clear()
+
+    with transaction.atomic():
+        AttendanceRollup.objects.all().delete()
+        for row in rows:
+            if row[0] != current_employee:
+                flush_employee()
+                current_employee = row[0]
+                if len(pending) >= chunk_size:
+                    AttendanceRollup.objects.bulk_create(pending)
+                    written += len(pending)
+                    pending.clear()
+            key, counters = contribution(*row)
+            values = totals.setdefault(key, [0] * len(COUNTERS))
+            for index, value in enumerate(counters):
+                values[index] += value
+        flush_employee()
+        AttendanceRollup.objects.bulk_create(pending, batch_size=chunk_size)
+        written += len(pending)
+    return written
@@ -1,5 +1,8 @@
 from rest_framework import serializers
-from .models import Attendance
+from .models import Attendance, AttendanceRollup
+
+# Fields the attendance list endpoint may return
+ATTENDANCE_LIST_FIELDS = ('id', 'check_in_time', 'check_out_time', 'date', 'employee', 'updated_at')
 
 class AttendanceSerializer(serializers.ModelSerializer):
     """
@@ -33,3 +36,97 @@ class AttendanceSerializer(serializers.ModelSerializer):
         """
         model = Attendance
         fields = '__all__'
+
+
+class AttendanceBulkSerializer(serializers.ModelSerializer):
+    """
+    Serializer class for one item of a bulk attendance upload.
+
+    The employee is taken as a plain id instead of a related field, so validating
+    a batch does not cost one employee lookup per item. The ids of a batch are
+    checked together by the bulk endpoint instead.
+
+    Attributes:
+        employee (int): The primary key of the employee, stored as employee_id.
+    """
+
+    employee = serializers.IntegerField(source='employee_id')
+
+    class Meta:
+        """
+        Meta class for AttendanceBulkSerializer.
+
+        Attributes:
+            model (Attendance): The model associated with this serializer.
+            fields (tuple): The fields accepted for each item.
+        """
+        model = Attendance
+        fields = ('employee', 'check_in_time', 'check_out_time', 'date')
+
+
+class AttendanceRollupSerializer(serializers.ModelSerializer):
+    """
+    Serializer class for the AttendanceRollup model, used by the attendance report.
+
+    Attributes:
+        hours_worked (Decimal): The seconds worked in the month, expressed in hours.
+    """
+
+    hours_worked = serializers.SerializerMethodField()
+
+    def get_hours_worked(self, rollup):
+        return f'{rollup.seconds_worked / 3600:.2f}'
+
+    class Meta:
+        """
+        Meta class for AttendanceRollupSerializer.
+
+        Attributes:
+            model (AttendanceRollup): The model associated with this serializer.
+            fields (tuple): The fields to include in the serialized representation.
+        """
+        model = AttendanceRollup
+        fields = ('employee', 'year', 'month', 'hours_worked', 'days_present', 'late_arrivals', 'missing_checkouts')
+
+
+class ReportQuerySerializer(serializers.Serializer):
+    """
+    Serializer class validating the query parameters of the attendance report.
+
+    Attributes:
+        year (int): The year of the report.
+        month (int): The month of the report (1-12).
+        employee (int, optional): Restricts the report to one employee.
+    """
+
+    year = serializers.IntegerField(min_value=1900, max_value=9999)
+    month = serializers.IntegerField(min_value=1, max_value=12)
+    employee = serializers.IntegerField(required=False, source='employee_id')
+
+
+class WorkHoursQuerySerializer(ReportQuerySerializer):
+    """
+    Serializer class validating the query parameters of the working-hours totals.
+
+    Attributes:
+        department (str, optional): Restricts the totals to the employees of a department.
+    """
+
+    department = serializers.CharField(required=False, source='employee__department')
+
+
+class AttendanceFilterSerializer(serializers.Serializer):
+    """
+    Serializer class declaring the filters of the attendance list endpoint.
+
+    Every filter is backed by an index: (employee, date) for the employee and
+    (date, id) for the date range.
+    """
+
+    id = serializers.IntegerField(required=False)
+    employee = serializers.IntegerField(required=False, source='employee_id')
+    date = serializers.DateField(required=False)
+    date__gte = serializers.DateField(required=False)
+    date__gt = serializers.DateField(required=False)
+    date__lte = serializers.DateField(required=False)
+    date__lt = serializers.DateField(required=False)
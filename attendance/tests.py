@@ -1,3 +1,465 @@
-from django.test import TestCase
+import datetime
+import gzip
+import json
+import os
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from django.utils import timezone
+
+from AttendanceAndAccountsApp.testing import APITestCase, at, make_user
+from . import archive, hours, journal
+from .models import Attendance, AttendanceArchive, AttendanceRollup
+
+
+class KeysetPaginationTests(APITestCase):
+    """
+    The attendance list is paged by (date, id) cursors that neither skip nor repeat records.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.employees = [make_user(f'employee{n}') for n in range(5)]
+        first_day = timezone.localdate() - datetime.timedelta(days=10)
+        for n in range(5):
+            day = first_day + datetime.timedelta(days=n)
+            Attendance.objects.bulk_create([Attendance(employee=employee, date=day, check_in_time=at(day, 9))
+                                            for employee in self.employees])
+
+    def read_pages(self, url, on_page=None):
+        ids, pages = [], 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [record['id'] for record in response.data['results']]
+            pages += 1
+            if on_page:
+                on_page(pages)
+            url = f'/attendance/all/?page_size=7&cursor={response.data["next"]}' if response.data['next'] else None
+        return ids, pages
+
+    def test_pages_cover_every_record_once_in_order(self):
+        ids, pages = self.read_pages('/attendance/all/?page_size=7')
+
+        expected = list(Attendance.objects.order_by('date', 'id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+        self.assertEqual(pages, 4)
+
+    def test_default_response_is_paged(self):
+        with self.settings(LIST_PAGE_SIZE=10):
+            response = self.client.get('/attendance/all/')
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertIsNotNone(response.data['next'])
+
+    def test_inserts_before_the_cursor_do_not_shift_pages(self):
+        before = list(Attendance.objects.order_by('date', 'id').values_list('id', flat=True))
+
+        def insert_earlier(pages):
+            if pages == 1:
+                day = timezone.localdate() - datetime.timedelta(days=20)
+                Attendance.objects.create(employee=self.admin, date=day, check_in_time=at(day, 9))
+
+        with self.settings(RESPONSE_CACHE_ENABLED=False):
+            ids, _ = self.read_pages('/attendance/all/?page_size=7', insert_earlier)
+        self.assertEqual(ids, before)
+
+    def test_stream_returns_every_record(self):
+        response = self.client.get('/attendance/all/?stream=true')
+        self.assertEqual(response.status_code, 200)
+        records = json.loads(b''.join(response.streaming_content))
+        self.assertEqual([record['id'] for record in records],
+                         list(Attendance.objects.order_by('date', 'id').values_list('id', flat=True)))
+
+    def test_date_range_filter(self):
+        first_day = timezone.localdate() - datetime.timedelta(days=10)
+        response = self.client.get(f'/attendance/all/?date__gte={first_day + datetime.timedelta(days=1)}'
+                                   f'&date__lt={first_day + datetime.timedelta(days=3)}&page_size=100')
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertEqual(self.client.get('/attendance/all/?check_in_time__gte=2024-01-01').status_code, 400)
+
+    def test_invalid_cursor_is_rejected(self):
+        self.assertEqual(self.client.get('/attendance/all/?cursor=garbage').status_code, 400)
+
+
+class BulkUploadTests(APITestCase):
+    """
+    The bulk upload reports a status per record and answers a concurrent insert with 409.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.day = timezone.localdate()
+        Attendance.objects.create(employee=self.admin, date=self.day, check_in_time=at(self.day, 9))
+        self.employee = make_user('employee')
+
+    def record(self, employee, day, hour=9):
+        return {'employee': employee.pk, 'date': day.isoformat(), 'check_in_time': at(day, hour).isoformat()}
+
+    def test_statuses(self):
+        yesterday = self.day - datetime.timedelta(days=1)
+        response = self.client.post('/attendance/bulk/', [
+            self.record(self.employee, self.day),
+            self.record(self.admin, self.day),
+            self.record(self.employee, self.day, hour=10),
+            {'employee': 999999, 'date': yesterday.isoformat(), 'check_in_time': at(yesterday, 9).isoformat()},
+            {'employee': self.employee.pk},
+        ], format='json')
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([result['status'] for result in response.data['results']],
+                         ['created', 'duplicate', 'duplicate', 'invalid', 'invalid'])
+        self.assertEqual((response.data['created'], response.data['duplicate'], response.data['invalid']), (1, 2, 2))
+        self.assertEqual(Attendance.objects.filter(employee=self.employee).count(), 1)
+
+    def test_all_created(self):
+        response = self.client.post('/attendance/bulk/', [self.record(self.employee, self.day)], format='json')
+        self.assertEqual(response.status_code, 201)
+
+    def test_concurrent_insert_conflicts(self):
+        # The existing record is not seen by the duplicate check, as if it was inserted concurrently
+        with mock.patch('attendance.views.archive.partitions', return_value=[Attendance.objects.none()]):
+            response = self.client.post('/attendance/bulk/', [
+                self.record(self.employee, self.day),
+                self.record(self.admin, self.day),
+            ], format='json')
+
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Attendance.objects.filter(employee=self.employee).exists())
+
+    def test_not_a_list(self):
+        self.assertEqual(self.client.post('/attendance/bulk/', {}, format='json').status_code, 400)
+
+
+class UniqueAttendanceTests(APITestCase):
+    """
+    The database rejects a second attendance record of an employee for a day.
+    """
+
+    def test_duplicate_record_conflicts(self):
+        day = datetime.date(2024, 3, 4)
+        record = {'employee': self.admin.pk, 'date': day, 'check_in_time': at(day, 9)}
+        self.assertEqual(self.client.post('/attendance/create/', record, format='json').status_code, 200)
+        self.assertEqual(self.client.post('/attendance/create/', record, format='json').status_code, 409)
+        self.assertEqual(Attendance.objects.filter(employee=self.admin, date=day).count(), 1)
+
+
+class RollupTests(APITestCase):
+    """
+    The monthly rollups follow every create, update and delete of an attendance record.
+    """
+
+    def rollup(self, day):
+        return AttendanceRollup.objects.filter(employee=self.admin, year=day.year, month=day.month).values_list(
+            'seconds_worked', 'days_present', 'late_arrivals', 'missing_checkouts').first()
+
+    def test_create_update_delete(self):
+        day = datetime.date(2024, 3, 4)
+        response = self.client.post('/attendance/create/', {
+            'employee': self.admin.pk, 'date': day, 'check_in_time': at(day, 10)}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.rollup(day), (0, 1, 1, 1))
+
+        pk = response.data['id']
+        response = self.client.post(f'/attendance/update/{pk}/', {
+            'employee': self.admin.pk, 'date': day, 'check_in_time': at(day, 9),
+            'check_out_time': at(day, 17, 30)}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.rollup(day), (8 * 3600 + 1800, 1, 0, 0))
+
+        self.client.delete(f'/attendance/{pk}/delete/')
+        self.assertEqual(self.rollup(day), (0, 0, 0, 0))
+
+    def test_batch_move_to_another_month(self):
+        march, april = datetime.date(2024, 3, 29), datetime.date(2024, 4, 1)
+        response = self.client.post('/attendance/create/', {
+            'employee': self.admin.pk, 'date': march, 'check_in_time': at(march, 9),
+            'check_out_time': at(march, 17)}, format='json')
+        record = Attendance.objects.get(pk=response.data['id'])
+        self.assertEqual(self.rollup(march), (8 * 3600, 1, 0, 0))
+
+        response = self.client.patch('/attendance/batch/', [
+            {'id': record.pk, 'date': april.isoformat(), 'check_in_time': at(april, 9, 30).isoformat(),
+             'check_out_time': at(april, 12).isoformat()}], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.rollup(march), (0, 0, 0, 0))
+        self.assertEqual(self.rollup(april), (2 * 3600 + 1800, 1, 1, 0))
+
+        response = self.client.delete('/attendance/batch/', [record.pk, record.pk + 1000], format='json')
+        self.assertEqual([result['status'] for result in response.data['results']], ['deleted', 'not_found'])
+        self.assertEqual(self.rollup(april), (0, 0, 0, 0))
+
+    def test_report_reads_the_rollups(self):
+        day = datetime.date(2024, 3, 4)
+        self.client.post('/attendance/create/', {'employee': self.admin.pk, 'date': day, 'check_in_time': at(day, 9),
+                                                 'check_out_time': at(day, 16, 30)}, format='json')
+        response = self.client.get('/attendance/report/?year=2024&month=3')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(row['employee'], row['hours_worked'], row['days_present']) for row in response.data],
+                         [(self.admin.pk, '7.50', 1)])
+        self.assertEqual(self.client.get('/attendance/report/?year=2024&month=13').status_code, 400)
+
+
+class PunchTests(APITestCase):
+    """
+    The punch endpoint checks the employee in, then out, then refuses further punches for the day.
+    """
+
+    def test_check_in_check_out_then_conflict(self):
+        response = self.client.post('/attendance/punch/')
+        self.assertEqual((response.status_code, response.data['action']), (201, 'check_in'))
+        self.assertIsNone(response.data['attendance']['check_out_time'])
+
+        response = self.client.post('/attendance/punch/')
+        self.assertEqual((response.status_code, response.data['action']), (200, 'check_out'))
+        self.assertIsNotNone(response.data['attendance']['check_out_time'])
+
+        self.assertEqual(self.client.post('/attendance/punch/').status_code, 409)
+        record = Attendance.objects.get(employee=self.admin)
+        self.assertEqual(record.date, timezone.localdate())
+        self.assertEqual(AttendanceRollup.objects.get(employee=self.admin).days_present, 1)
+
+
+class PunchJournalTests(APITestCase):
+    """
+    Journaled punches are applied in batches, idempotently, and removed once applied.
+    """
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.journal = journal.PunchJournal(os.path.join(directory.name, 'journal.sqlite3'))
+        self.day = timezone.localdate()
+
+    def punch(self, employee_id, hour):
+        self.journal.append(employee_id, journal.journal_time(at(self.day, hour)))
+
+    def test_flush_applies_punches_in_batches(self):
+        employee = make_user('employee')
+        self.punch(self.admin.pk, 9)
+        self.punch(employee.pk, 9)
+        self.punch(999999, 9)
+        self.punch(self.admin.pk, 17)
+        self.punch(self.admin.pk, 18)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            totals = journal.flush(self.journal, 'test', batch_size=2)
+
+        self.assertEqual(totals, {'check_in': 2, 'check_out': 1, 'duplicate': 0, 'rejected': 2})
+        self.assertEqual(self.journal.stats(), (0, None))
+        record = Attendance.objects.get(employee=self.admin, date=self.day)
+        self.assertEqual((record.check_in_time, record.check_out_time), (at(self.day, 9), at(self.day, 17)))
+        self.assertIsNone(Attendance.objects.get(employee=employee).check_out_time)
+        self.assertEqual(AttendanceRollup.objects.get(employee=self.admin).seconds_worked, 8 * 3600)
+
+    def test_replayed_batch_is_skipped(self):
+        self.punch(self.admin.pk, 9)
+        self.punch(self.admin.pk, 17)
+        batch = [(employee_id, punched_at) for _, employee_id, punched_at in self.journal.peek(10)]
+        journal.apply_punches(batch)
+
+        self.assertEqual(journal.flush(self.journal, 'test'), {'check_in': 0, 'check_out': 0, 'duplicate': 2,
+                                                               'rejected': 0})
+        self.assertEqual(Attendance.objects.count(), 1)
+
+    def test_flush_needs_the_lease(self):
+        self.punch(self.admin.pk, 9)
+        self.assertTrue(self.journal.acquire_lease('other', 60))
+
+        self.assertIsNone(journal.flush(self.journal, 'test'))
+        self.assertEqual(self.journal.stats()[0], 1)
+
+    @override_settings(ATTENDANCE_WRITE_BEHIND=True)
+    def test_punch_endpoint_queues(self):
+        with mock.patch('attendance.journal.get_journal', return_value=self.journal):
+            response = self.client.post('/attendance/punch/')
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(self.journal.stats()[0], 1)
+        self.assertFalse(Attendance.objects.exists())
+
+
+class ExportTests(APITestCase):
+    """
+    Attendance is exported as CSV or NDJSON, filtered, projected and optionally compressed, to staff only.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.employee = make_user('employee')
+        self.day = datetime.date(2024, 3, 4)
+        for employee in (self.admin, self.employee):
+            Attendance.objects.create(employee=employee, date=self.day, check_in_time=at(self.day, 9))
+
+    def content(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_csv(self):
+        response = self.client.get(f'/attendance/export/?employee={self.employee.pk}&fields=employee,date')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="attendance.csv"')
+        self.assertEqual(self.content(response).decode().splitlines(), ['employee,date', f'{self.employee.pk},2024-03-04'])
+
+    def test_ndjson(self):
+        response = self.client.get('/attendance/export/?export_format=ndjson&fields=employee')
+        records = [json.loads(line) for line in self.content(response).decode().splitlines()]
+        self.assertEqual(records, [{'employee': self.admin.pk}, {'employee': self.employee.pk}])
+
+    def test_gzip(self):
+        response = self.client.get('/attendance/export/?fields=employee', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(self.content(response)).decode().splitlines(),
+                         ['employee', str(self.admin.pk), str(self.employee.pk)])
+
+    def test_errors(self):
+        self.assertEqual(self.client.get('/attendance/export/?export_format=xml').status_code, 400)
+        self.client.force_authenticate(self.employee)
+        self.assertEqual(self.client.get('/attendance/export/').status_code, 403)
+
+
+class ArchiveTests(APITestCase):
+    """
+    Old records move to the archive; reads reach it only when their date range does, and writes never duplicate it.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.old_day = archive.hot_cutoff() - datetime.timedelta(days=40)
+        self.recent_day = timezone.localdate()
+        self.old = Attendance.objects.create(employee=self.admin, date=self.old_day, check_in_time=at(self.old_day, 9))
+        self.recent = Attendance.objects.create(employee=self.admin, date=self.recent_day,
+                                                check_in_time=at(self.recent_day, 9))
+        call_command('archive_attendance', stdout=mock.Mock())
+
+    def dates(self, url):
+        return [record['date'] for record in self.client.get(url).data['results']]
+
+    def test_records_are_moved(self):
+        self.assertEqual(list(AttendanceArchive.objects.values_list('pk', flat=True)), [self.old.pk])
+        self.assertEqual(list(Attendance.objects.values_list('pk', flat=True)), [self.recent.pk])
+
+    def test_reads_are_routed_by_date_range(self):
+        self.assertEqual(self.dates('/attendance/all/'), [self.old_day.isoformat(), self.recent_day.isoformat()])
+        self.assertEqual(self.dates(f'/attendance/all/?date__lte={self.old_day}'), [self.old_day.isoformat()])
+        self.assertEqual(self.dates(f'/attendance/all/?date__gte={archive.hot_cutoff()}'),
+                         [self.recent_day.isoformat()])
+
+        plan = self.client.get(f'/attendance/all/?date__gte={archive.hot_cutoff()}&debug=plan').data
+        self.assertNotIn('partitions', plan)
+        self.assertEqual(len(self.client.get('/attendance/all/?debug=plan').data['partitions']), 2)
+
+    def test_writes_do_not_duplicate_archived_records(self):
+        record = {'employee': self.admin.pk, 'date': self.old_day, 'check_in_time': at(self.old_day, 10)}
+        self.assertEqual(self.client.post('/attendance/create/', record, format='json').status_code, 409)
+
+        response = self.client.post('/attendance/bulk/', [record], format='json')
+        self.assertEqual([result['status'] for result in response.data['results']], ['duplicate'])
+
+        response = self.client.patch('/attendance/batch/', [
+            {'id': self.recent.pk, 'date': self.old_day.isoformat(), 'check_in_time': at(self.old_day, 9).isoformat()},
+            {'id': self.old.pk, 'check_in_time': at(self.old_day, 8).isoformat()},
+        ], format='json')
+        self.assertEqual([result['status'] for result in response.data['results']], ['invalid', 'not_found'])
+        self.assertEqual(Attendance.objects.get().date, self.recent_day)
+
+
+class HoursEngineTests(SimpleTestCase):
+    """
+    The working-hours engine splits punches into worked, overtime, night and weekend seconds.
+    """
+
+    # 2024-01-01 was a Monday
+    first_day = datetime.date(2024, 1, 1)
+
+    def totals(self, shifts, rules=None, last_day=datetime.date(2024, 1, 31)):
+        """
+        Computes the totals of (employee_id, day, check_in, check_out) shifts given as local datetimes.
+        """
+        punches = hours.Punches(self.first_day, last_day, [shift[0] for shift in shifts],
+                                [(shift[1] - self.first_day).days for shift in shifts],
+                                [int(shift[2].timestamp()) for shift in shifts],
+                                [int(shift[3].timestamp()) for shift in shifts])
+        totals = hours.compute_totals(punches, rules or hours.ShiftRules(8, datetime.time(22), datetime.time(6),
+                                                                         (5, 6)))
+        return {name: totals[name].tolist() for name in ('employee', *hours.TOTALS)}
+
+    def test_night_shift_crossing_midnight(self):
+        monday = datetime.date(2024, 1, 1)
+        totals = self.totals([(1, monday, at(monday, 20), at(monday + datetime.timedelta(days=1), 7))])
+
+        self.assertEqual(totals['worked_seconds'], [11 * 3600])
+        self.assertEqual(totals['night_seconds'], [8 * 3600])
+        self.assertEqual(totals['overtime_seconds'], [3 * 3600])
+        self.assertEqual(totals['weekend_seconds'], [0])
+
+    def test_weekend_split_at_midnight(self):
+        friday, sunday = datetime.date(2024, 1, 5), datetime.date(2024, 1, 7)
+        totals = self.totals([
+            (1, friday, at(friday, 20), at(friday + datetime.timedelta(days=1), 2)),
+            (1, sunday, at(sunday, 18), at(sunday + datetime.timedelta(days=1), 1)),
+        ])
+
+        self.assertEqual(totals['weekend_seconds'], [(2 + 6) * 3600])
+        self.assertEqual(totals['night_seconds'], [(4 + 3) * 3600])
+        self.assertEqual(totals['days_worked'], [2])
+
+    def test_overtime_is_counted_per_day(self):
+        monday, tuesday = datetime.date(2024, 1, 1), datetime.date(2024, 1, 2)
+        totals = self.totals([
+            (1, monday, at(monday, 8), at(monday, 18)),
+            (1, tuesday, at(tuesday, 9), at(tuesday, 15)),
+            (2, monday, at(monday, 9), at(monday, 17)),
+        ])
+
+        self.assertEqual(totals['employee'], [1, 2])
+        self.assertEqual(totals['worked_seconds'], [16 * 3600, 8 * 3600])
+        self.assertEqual(totals['overtime_seconds'], [2 * 3600, 0])
+        self.assertEqual(totals['punches'], [2, 1])
+
+    def test_standard_hours_per_employee(self):
+        monday = datetime.date(2024, 1, 1)
+        punches = hours.Punches(monday, monday, [1, 2], [0, 0], [int(at(monday, 8).timestamp())] * 2,
+                                [int(at(monday, 16).timestamp())] * 2)
+        totals = hours.compute_totals(punches, hours.ShiftRules(8), standard_seconds=[6 * 3600, 8 * 3600])
+        self.assertEqual(totals['overtime_seconds'].tolist(), [2 * 3600, 0])
+
+    def test_night_window_without_wrap(self):
+        monday = datetime.date(2024, 1, 1)
+        rules = hours.ShiftRules(8, datetime.time(1), datetime.time(5), ())
+        totals = self.totals([(1, monday, at(monday, 0), at(monday, 12))], rules)
+        self.assertEqual(totals['night_seconds'], [4 * 3600])
+
+    @override_settings(TIME_ZONE='America/New_York')
+    def test_windows_are_in_local_time(self):
+        saturday = datetime.date(2024, 1, 6)
+        totals = self.totals([(1, saturday, at(saturday, 21), at(saturday, 23))])
+
+        self.assertEqual(totals['night_seconds'], [3600])
+        self.assertEqual(totals['weekend_seconds'], [2 * 3600])
+
+    def test_no_punches(self):
+        totals = self.totals([])
+        self.assertEqual(totals['employee'], [])
+
+
+class WorkHoursEndpointTests(APITestCase):
+    """
+    The hours endpoint reports the engine's totals per employee for a month.
+    """
+
+    def test_month_totals(self):
+        saturday = datetime.date(2024, 1, 6)
+        Attendance.objects.create(employee=self.admin, date=saturday, check_in_time=at(saturday, 14),
+                                  check_out_time=at(saturday, 23))
+        Attendance.objects.create(employee=self.admin, date=datetime.date(2024, 2, 1),
+                                  check_in_time=at(datetime.date(2024, 2, 1), 9))
+
+        response = self.client.get('/attendance/hours/?year=2024&month=1')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, [{'employee': self.admin.pk, 'punches': 1, 'days_worked': 1, 'hours': 9.0,
+                                          'overtime_hours': 1.0, 'night_hours': 1.0, 'weekend_hours': 9.0}])
@@ -1,4 +1,5 @@
 
+from django.conf import settings
 from django.urls import path
 from . import views
 """
@@ -8,9 +9,16 @@ Each URL pattern is associated with a specific view function from the 'views' mo
 
 - '' (home): Display the API overview.
 - 'create/': Add new attendance records.
-- 'all/': View all attendance records.
+- 'bulk/': Add a batch of attendance records in one request.
+- 'punch/': Check the authenticated employee in or out for today.
+- 'all/': View all attendance records; served by view_attendance_async when settings.ASYNC_READ_VIEWS is on.
+- 'export/': Stream attendance records as a CSV or NDJSON file.
+- 'changes/': List the attendance records created, changed or deleted after a cursor (?since=).
 - 'update/<int:pk>/': Update attendance records with a specific primary key.
 - '<int:pk>/delete/': Delete attendance records with a specific primary key.
+- 'batch/': Partially update (PATCH) or delete (DELETE) many attendance records in one transaction.
+- 'report/': Monthly attendance totals per employee.
+- 'hours/': Hours worked, overtime, night and weekend hours per employee for a month.
 - 'hello/': Display a hello message.
 
 Note:
@@ -25,9 +33,16 @@ urlpatterns = [
     
     path('', views.ApiOverview, name='home'),
     path('create/', views.add_attendance, name='add-users'),
-    path('all/', views.view_attendance, name='view-users'),
+    path('bulk/', views.bulk_add_attendance, name='bulk-attendance'),
+    path('punch/', views.punch, name='punch'),
+    path('all/', views.view_attendance_async if settings.ASYNC_READ_VIEWS else views.view_attendance, name='view-users'),
+    path('export/', views.export_attendance, name='export-attendance'),
+    path('changes/', views.attendance_changes, name='changes'),
     path('update/<int:pk>/', views.update_attendance, name='update_users'),
     path('<int:pk>/delete/', views.delete_attendance, name='delete-items'),
+    path('batch/', views.batch_attendance, name='batch'),
+    path('report/', views.attendance_report, name='attendance-report'),
+    path('hours/', views.work_hours, name='work-hours'),
     path('hello/', views.hello_message, name='hello'),
 
 ]
\ No newline at end of file
@@ -1,10 +1,28 @@
+import calendar
+import datetime
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
 from django.shortcuts import render
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
-from .models import Attendance
-from .serializers import AttendanceSerializer
-from rest_framework import serializers
+from users.models import CustomUser
+from . import archive, hours, journal, punches, rollups
+from .models import Attendance, AttendanceArchive, AttendanceRollup
+from .serializers import (AttendanceSerializer, AttendanceBulkSerializer, AttendanceRollupSerializer,
+                          AttendanceFilterSerializer, ReportQuerySerializer, WorkHoursQuerySerializer,
+                          ATTENDANCE_LIST_FIELDS)
 from rest_framework import status
+from AttendanceAndAccountsApp import batch
+from AttendanceAndAccountsApp.async_views import async_list_view
+from AttendanceAndAccountsApp.cache import cached_response, invalidate
+from AttendanceAndAccountsApp.export import FORMAT_PARAM, export_response, parse_format
+from AttendanceAndAccountsApp.filters import query_plans, wants_query_plan
+from AttendanceAndAccountsApp.pagination import (PAGINATION_PARAMS, keyset_page_queryset, merge_rows, parse_bool,
+                                                 split_page, stream_json_array)
+from AttendanceAndAccountsApp.serialization import FIELDS_PARAM, LeanSerializer, parse_fields
+from changes import feed
 
 # Create your views here.
 
@@ -38,38 +56,224 @@ def add_attendance(request):
     """
     attendance = AttendanceSerializer(data=request.data)
 
-    # Check if attendance record with the same date and employee already exists
-    if Attendance.objects.filter(date=request.data.get('date'), employee=request.data.get('employee')):
-        raise serializers.ValidationError('Attendance already exists')
-
     if attendance.is_valid():
-        attendance.save()
+        if archive.is_archived(attendance.validated_data['employee'].pk, attendance.validated_data['date']):
+            return Response({'error': 'Attendance already exists'}, status=status.HTTP_409_CONFLICT)
+        # The unique (employee, date) constraint rejects duplicate attendance records
+        try:
+            with transaction.atomic():
+                attendance.save()
+                rollups.record_change(after=attendance.instance)
+                feed.record(feed.ATTENDANCE, [attendance.instance.pk])
+                invalidate('attendance')
+        except IntegrityError:
+            return Response({'error': 'Attendance already exists'}, status=status.HTTP_409_CONFLICT)
         return Response(attendance.data)
     else:
         return Response(attendance.errors, status=status.HTTP_404_NOT_FOUND)
 
+@api_view(['POST'])
+def bulk_add_attendance(request):
+    """
+    API endpoint for adding a batch of attendance records, e.g. a badge-reader upload.
+
+    The whole batch is validated first. Unknown employees and records that already
+    exist for the same employee and date are found with one query each, and the new
+    records are inserted with bulk_create.
+
+    Args:
+        request (Request): The incoming request, whose body is a list of attendance records.
+
+    Returns:
+        Response: A response with counts and a status ('created', 'duplicate' or 'invalid')
+                  for each item, in the order the items were sent.
+    """
+    records = request.data
+    if not isinstance(records, list):
+        return Response({'error': 'Expected a list of attendance records'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(records) > settings.ATTENDANCE_BULK_MAX_RECORDS:
+        return Response({'error': f'At most {settings.ATTENDANCE_BULK_MAX_RECORDS} records per request'},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    results = [None] * len(records)
+    valid = {}
+    for index, record in enumerate(records):
+        item = AttendanceBulkSerializer(data=record)
+        if item.is_valid():
+            valid[index] = item.validated_data
+        else:
+            results[index] = {'index': index, 'status': 'invalid', 'errors': item.errors}
+
+    # Look up employees and already recorded (employee, date) pairs for the whole batch at once;
+    # the archive is only read when the batch has dates before the hot window
+    employee_ids = {data['employee_id'] for data in valid.values()}
+    dates = {data['date'] for data in valid.values()}
+    known_employees = set(CustomUser.objects.filter(pk__in=employee_ids).values_list('pk', flat=True))
+    existing = set()
+    for queryset in archive.partitions(employee_id__in=employee_ids, date__in=dates):
+        existing.update(queryset.values_list('employee_id', 'date'))
+
+    new_records = []
+    for index, data in valid.items():
+        key = (data['employee_id'], data['date'])
+        if data['employee_id'] not in known_employees:
+            results[index] = {'index': index, 'status': 'invalid',
+                              'errors': {'employee': [f'Invalid pk "{data["employee_id"]}" - object does not exist.']}}
+        elif key in existing:
+            results[index] = {'index': index, 'status': 'duplicate'}
+        else:
+            existing.add(key)
+            new_records.append((index, Attendance(**data)))
+
+    try:
+        with transaction.atomic():
+            Attendance.objects.bulk_create([record for _, record in new_records],
+                                           batch_size=settings.ATTENDANCE_BULK_BATCH_SIZE)
+            rollups.apply_changes(added=[record for _, record in new_records])
+            feed.record(feed.ATTENDANCE, feed.inserted_ids(Attendance, [record for _, record in new_records],
+                                                           ('employee_id', 'date')))
+            invalidate('attendance')
+    except IntegrityError:
+        # Another request recorded some of these records in the meantime; nothing was inserted
+        return Response({'error': 'Attendance records were added concurrently, retry the batch'},
+                        status=status.HTTP_409_CONFLICT)
+
+    for index, record in new_records:
+        results[index] = {'index': index, 'status': 'created', 'id': record.pk}
+
+    summary = {
+        'created': len(new_records),
+        'duplicate': sum(1 for result in results if result['status'] == 'duplicate'),
+        'invalid': sum(1 for result in results if result['status'] == 'invalid'),
+        'results': results,
+    }
+    all_created = len(new_records) == len(records)
+    return Response(summary, status=status.HTTP_201_CREATED if all_created else status.HTTP_207_MULTI_STATUS)
+
+@api_view(['POST'])
+def punch(request):
+    """
+    API endpoint for punching in or out: the first punch of the day checks the authenticated
+    employee in, the second one checks them out. The server decides which one it is, using
+    the current time.
+
+    Args:
+        request (Request): The incoming request; no body is needed.
+
+    With settings.ATTENDANCE_WRITE_BEHIND on, the punch is journaled and applied to the
+    database shortly after (see attendance.journal); the response is then 202 with the
+    time of the punch.
+
+    Returns:
+        Response: 201 with the new attendance record on check-in, 200 with the updated record on
+                  check-out, or 409 if the employee already checked out today.
+    """
+    if settings.ATTENDANCE_WRITE_BEHIND:
+        at = journal.enqueue_punch(request.user.id)
+        return Response({'status': 'queued', 'employee': request.user.id, 'at': at}, status=status.HTTP_202_ACCEPTED)
+
+    try:
+        action, record = punches.punch(request.user.id)
+    except punches.AlreadyCheckedOut as e:
+        return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+    return Response({'action': action, 'attendance': AttendanceSerializer(record).data},
+                    status=status.HTTP_201_CREATED if action == punches.CHECK_IN else status.HTTP_200_OK)
+
 @api_view(['GET'])
+@cached_response('attendance')
 def view_attendance(request):
     """
     API endpoint for viewing attendance records.
 
+    Supported filters are declared by AttendanceFilterSerializer (employee and date
+    ranges such as ?date__gte=2024-01-01&date__lt=2024-02-01); other query parameters
+    are rejected, except for the ones below.
+
+    Records are returned one page at a time, ordered by (date, id), together with the
+    cursor of the next page; the response size is bounded whatever the filters.
+
+    - 'page_size' / 'cursor': the size of the page (default: LIST_PAGE_SIZE) and the
+      cursor of the page to return (default: the first page).
+    - 'stream': stream all matching records as a JSON array instead.
+    - 'fields': select the returned fields, e.g. ?fields=employee,date.
+    - 'debug=plan': return the query plan instead of the records (staff only).
+
+    Records older than the hot window are read from the attendance archive, only
+    when the requested date range reaches before it (see attendance.archive).
+
     Args:
         request (Request): The incoming request.
 
     Returns:
         Response: A response containing serialized attendance data.
     """
-    # Filter attendance records based on query parameters if provided
-    if request.query_params:
-        attendance = Attendance.objects.filter(**request.query_params.dict())
-    else:
-        attendance = Attendance.objects.all()
+    params = request.query_params.dict()
+    cursor, page_size, stream = (params.pop(name, None) for name in PAGINATION_PARAMS)
+    lean = LeanSerializer(AttendanceSerializer, parse_fields(params.pop(FIELDS_PARAM, None), ATTENDANCE_LIST_FIELDS))
+    plan = wants_query_plan(request, params)
 
-    if attendance:
-        serializer = AttendanceSerializer(attendance, many=True)
-        return Response(serializer.data)
-    else:
+    # Filter attendance records based on query parameters if provided; date ranges reaching
+    # before the hot window also read the archive. The (date, id) ordering key is always read, for the cursor.
+    partitions = [queryset.values(*lean.fields, 'date', 'id') for queryset in archive.filter_partitions(params)]
+
+    if plan:
+        return Response(query_plans([queryset.order_by(*archive.ORDERING) for queryset in partitions]))
+
+    if parse_bool(stream):
+        return stream_json_array(archive.iterate(partitions), lean.row)
+
+    pages = [keyset_page_queryset(queryset, archive.ORDERING, cursor, page_size) for queryset in partitions]
+    rows = list(merge_rows([list(page) for page, _ in pages], archive.ORDERING))
+    rows, next_cursor = split_page(rows, archive.ORDERING, pages[0][1])
+    if not rows and not cursor:
         return Response(status=status.HTTP_404_NOT_FOUND)
+    return Response({'next': next_cursor, 'results': lean.rows(rows)})
+
+# Async variant of view_attendance, routed instead of it when settings.ASYNC_READ_VIEWS is on
+view_attendance_async = async_list_view(Attendance, AttendanceSerializer, AttendanceFilterSerializer,
+                                        ATTENDANCE_LIST_FIELDS, 'attendance', ordering=archive.ORDERING,
+                                        partitions=archive.filter_partitions)
+
+@api_view(['GET'])
+def attendance_changes(request):
+    """
+    API endpoint returning the attendance records created, changed or deleted after a cursor, for downstream sync.
+
+    Start with ?since=0 and pass the returned 'next' as 'since' on the following call;
+    'limit' caps the number of changes read and 'fields' selects the returned fields.
+    Deleted records are returned as tombstones ('action': 'delete').
+
+    Args:
+        request (Request): The incoming request.
+
+    Returns:
+        Response: A response containing the changes, ordered by change sequence, and the next cursor.
+    """
+    return feed.change_feed_response(request, feed.ATTENDANCE, (Attendance, AttendanceArchive), AttendanceSerializer,
+                                     ATTENDANCE_LIST_FIELDS)
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def export_attendance(request):
+    """
+    API endpoint streaming attendance records as a CSV or NDJSON file, ordered by (date, id).
+
+    Takes the filters of view_attendance (e.g. ?employee=7&date__gte=2023-01-01&date__lt=2024-01-01),
+    'fields' and 'export_format' ('csv', the default, or 'ndjson'). The file is gzip-compressed
+    when the client sends Accept-Encoding: gzip.
+
+    Args:
+        request (Request): The incoming request.
+
+    Returns:
+        StreamingHttpResponse: The streamed export.
+    """
+    params = request.query_params.dict()
+    export_format = parse_format(params.pop(FORMAT_PARAM, None))
+    lean = LeanSerializer(AttendanceSerializer, parse_fields(params.pop(FIELDS_PARAM, None), ATTENDANCE_LIST_FIELDS))
+    partitions = [queryset.values(*lean.fields, 'date', 'id') for queryset in archive.filter_partitions(params)]
+    records = archive.iterate(partitions, settings.EXPORT_CHUNK_SIZE)
+    return export_response(request, records, lean, export_format, 'attendance')
 
 @api_view(['POST'])
 def update_attendance(request, pk):
@@ -84,10 +288,20 @@ def update_attendance(request, pk):
         Response: A response containing updated attendance data if successful, or error messages if validation fails.
     """
     attendance = Attendance.objects.get(pk=pk)
+    before = rollups.snapshot(attendance)
     data = AttendanceSerializer(instance=attendance, data=request.data)
 
     if data.is_valid():
-        data.save()
+        if archive.is_archived(data.validated_data['employee'].pk, data.validated_data['date']):
+            return Response({'error': 'Attendance already exists'}, status=status.HTTP_409_CONFLICT)
+        try:
+            with transaction.atomic():
+                data.save()
+                rollups.record_change(before, attendance)
+                feed.record(feed.ATTENDANCE, [pk])
+                invalidate('attendance')
+        except IntegrityError:
+            return Response({'error': 'Attendance already exists'}, status=status.HTTP_409_CONFLICT)
         return Response(data.data)
     else:
         return Response(data.errors, status=status.HTTP_404_NOT_FOUND)
@@ -106,12 +320,136 @@ def delete_attendance(request, pk):
     """
     try:
         attendance = Attendance.objects.get(pk=pk)
-        attendance.delete()
+        before = rollups.snapshot(attendance)
+        with transaction.atomic():
+            attendance.delete()
+            rollups.record_change(before=before)
+            feed.record(feed.ATTENDANCE, [pk], deleted=True)
+            invalidate('attendance')
         return Response(status=status.HTTP_202_ACCEPTED)
     except Exception as e:
         response_html = f'Error: {str(e)}'
         return Response(response_html)
 
+@api_view(['PATCH', 'DELETE'])
+def batch_attendance(request):
+    """
+    API endpoint for changing or deleting many attendance records at once, e.g. to correct
+    a department's records after a badge-system outage.
+
+    PATCH takes a list of partial updates, each with the 'id' of the record and the fields
+    to set (employee, date, check_in_time, check_out_time); records given the same changes
+    are updated by one set-based query. DELETE takes a list of ids. Everything is applied
+    in one transaction; archived records cannot be changed.
+
+    Args:
+        request (Request): The incoming request.
+
+    Returns:
+        Response: A response with counts and a status ('updated' or 'deleted', 'not_found' or
+                  'invalid') for each item, in the order the items were sent; 409 if a change
+                  would duplicate an existing record, in which case nothing is applied.
+    """
+    items = request.data
+    error = batch.check_batch(items, 'partial updates' if request.method == 'PATCH' else 'ids')
+    if error is not None:
+        return error
+    results = [None] * len(items)
+
+    if request.method == 'DELETE':
+        ids = batch.validate_ids(items, results)
+        with transaction.atomic():
+            before = {row[0]: row[1:] for row in Attendance.objects.select_for_update().filter(pk__in=ids.values())
+                      .values_list('pk', *rollups.SNAPSHOT_FIELDS)}
+            ids = batch.drop_missing(ids, before, results)
+            Attendance.objects.filter(pk__in=ids.values()).delete()
+            rollups.apply_changes(removed=[before[pk] for pk in ids.values()])
+            feed.record(feed.ATTENDANCE, list(ids.values()), deleted=True)
+            invalidate('attendance')
+        return batch.batch_response(results, ids, batch.DELETED)
+
+    updates = batch.validate_updates(items, AttendanceBulkSerializer, results)
+    try:
+        with transaction.atomic():
+            before = {row[0]: row[1:] for row in Attendance.objects.select_for_update()
+                      .filter(pk__in=[pk for pk, _ in updates.values()]).values_list('pk', *rollups.SNAPSHOT_FIELDS)}
+            updates = batch.drop_missing(updates, before, results)
+            after = {pk: tuple(changes.get(name, value) for name, value in zip(rollups.SNAPSHOT_FIELDS, before[pk]))
+                     for pk, changes in updates.values()}
+
+            # New employees are checked with one query; moves onto an archived (employee, date) are rejected
+            employee_ids = {changes['employee_id'] for _, changes in updates.values() if 'employee_id' in changes}
+            known_employees = set(CustomUser.objects.filter(pk__in=employee_ids).values_list('pk', flat=True))
+            for index, (pk, changes) in list(updates.items()):
+                if 'employee_id' in changes and changes['employee_id'] not in known_employees:
+                    errors = {'employee': [f'Invalid pk "{changes["employee_id"]}" - object does not exist.']}
+                elif after[pk][:2] != before[pk][:2] and archive.is_archived(*after[pk][:2]):
+                    errors = {'date': ['Attendance already exists for this date.']}
+                else:
+                    continue
+                results[index] = batch.invalid(index, errors)
+                del updates[index]
+
+            batch.apply_updates(Attendance, updates.values())
+            rollups.apply_changes(removed=[before[pk] for pk, _ in updates.values()],
+                                  added=[after[pk] for pk, _ in updates.values()])
+            feed.record(feed.ATTENDANCE, [pk for pk, _ in updates.values()])
+            invalidate('attendance')
+    except IntegrityError:
+        return Response({'error': 'The changes would duplicate attendance records; nothing was applied'},
+                        status=status.HTTP_409_CONFLICT)
+    return batch.batch_response(results, updates, batch.UPDATED)
+
+@api_view(['GET'])
+def attendance_report(request):
+    """
+    API endpoint for the monthly attendance report.
+
+    The report is read from the attendance rollups, which are kept up to date
+    whenever attendance records are added, updated or deleted.
+
+    Args:
+        request (Request): The incoming request with 'year', 'month' and optionally 'employee'.
+
+    Returns:
+        Response: A response containing hours worked, days present, late arrivals and
+                  missing check-outs per employee.
+    """
+    params = ReportQuerySerializer(data=request.query_params)
+    if not params.is_valid():
+        return Response(params.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    report = AttendanceRollup.objects.filter(**params.validated_data).order_by('employee_id')
+    serializer = AttendanceRollupSerializer(report, many=True)
+    return Response(serializer.data)
+
+@api_view(['GET'])
+@cached_response('attendance')
+def work_hours(request):
+    """
+    API endpoint for the hours worked per employee in a month, as used by payroll.
+
+    The month's punches are loaded into arrays and the shift rules (WORK_* settings)
+    are applied to all of them at once by the working-hours engine.
+
+    Args:
+        request (Request): The incoming request with 'year', 'month' and optionally 'employee' or 'department'.
+
+    Returns:
+        Response: A response containing, per employee, the punches and days worked and the
+                  hours worked, overtime, night and weekend hours.
+    """
+    params = WorkHoursQuerySerializer(data=request.query_params)
+    if not params.is_valid():
+        return Response(params.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    filters = dict(params.validated_data)
+    year, month = filters.pop('year'), filters.pop('month')
+    first_day = datetime.date(year, month, 1)
+    last_day = datetime.date(year, month, calendar.monthrange(year, month)[1])
+    totals = hours.compute_totals(hours.load_punches(first_day, last_day, **filters))
+    return Response(hours.totals_rows(totals))
+
 @api_view(['GET'])
 def hello_message(request):
     """
@@ -0,0 +1,123 @@
+"""
+Side-by-side comparison of database backends on the workloads of the three apps.
+
+compare_backends() runs the same ORM workloads against several configured
+databases holding the same data (see the copy_database command), without the
+HTTP and serialization layers, so the difference between backends is what the
+backend itself costs: query translation (djongo), the driver, the network round
+trip and the execution. Each workload reports its latency and its time per query.
+"""
+
+import datetime
+import time
+
+from django.db import connections, transaction
+from django.db.models import Count, Sum
+from django.test.utils import CaptureQueriesContext
+
+from accounts.models import Accounts
+from attendance.models import Attendance, AttendanceRollup
+from users.models import CustomUser
+from .runner import percentile
+
+
+def build_workloads(alias):
+    """
+    Builds the workloads from rows picked in a database.
+
+    Args:
+        alias (str): The database to pick the rows from; they must exist in every compared database.
+
+    Returns:
+        list: (name, function of the database alias) pairs.
+    """
+    users = CustomUser.objects.using(alias)
+    leaf = users.filter(manager__isnull=False).order_by('-org_path').first()
+    root = users.filter(manager__isnull=True).annotate(reports=Count('customuser')).order_by('-reports').first()
+    latest = Attendance.objects.using(alias).order_by('-date').first()
+    account = Accounts.objects.using(alias).order_by('-year', '-month').first()
+    if not (leaf and root and latest and account):
+        raise ValueError('The database has no data to compare; run generate_synthetic_org first')
+    month_start = latest.date.replace(day=1)
+    month_end = (month_start + datetime.timedelta(days=32)).replace(day=1)
+    future = datetime.date(2099, 1, 1)
+
+    def insert_rolled_back(db):
+        with transaction.atomic(using=db):
+            Attendance.objects.using(db).create(employee_id=leaf.pk, date=future,
+                                                check_in_time=datetime.datetime(2099, 1, 1, 9, tzinfo=datetime.timezone.utc))
+            transaction.set_rollback(True, using=db)
+
+    return [
+        ('users:get-by-pk', lambda db: CustomUser.objects.using(db).get(pk=leaf.pk)),
+        ('users:department', lambda db: list(CustomUser.objects.using(db).filter(department=leaf.department)
+                                             .values('id', 'username', 'position'))),
+        ('users:reports-count', lambda db: CustomUser.objects.using(db)
+            .filter(org_path__startswith=root.org_path).count()),
+        ('attendance:employee', lambda db: list(Attendance.objects.using(db).filter(employee_id=leaf.pk).values())),
+        ('attendance:month-page', lambda db: list(Attendance.objects.using(db)
+                                                  .filter(date__gte=month_start, date__lt=month_end)
+                                                  .order_by('date', 'id').values()[:100])),
+        ('attendance:rollup-month', lambda db: list(AttendanceRollup.objects.using(db)
+                                                    .filter(year=month_start.year, month=month_start.month).values())),
+        ('attendance:insert', insert_rolled_back),
+        ('accounts:employee', lambda db: list(Accounts.objects.using(db).filter(employee_id=account.employee_id)
+                                              .values())),
+        ('accounts:year-total', lambda db: Accounts.objects.using(db).filter(year=account.year)
+            .aggregate(total=Sum('salary'))),
+    ]
+
+
+def measure(workload, alias, iterations, warmup):
+    """
+    Runs a workload repeatedly against one database.
+
+    Returns:
+        dict: Latency percentiles in milliseconds, queries per run and the mean time per query.
+    """
+    latencies = []
+    queries = 0
+    for iteration in range(warmup + iterations):
+        with CaptureQueriesContext(connections[alias]) as captured:
+            start = time.perf_counter()
+            workload(alias)
+            elapsed = time.perf_counter() - start
+        if iteration >= warmup:
+            latencies.append(elapsed * 1000)
+            queries += len(captured)
+    latencies.sort()
+    mean = sum(latencies) / len(latencies)
+    return {
+        'p50_ms': round(percentile(latencies, 0.50), 3),
+        'p99_ms': round(percentile(latencies, 0.99), 3),
+        'mean_ms': round(mean, 3),
+        'queries': round(queries / iterations, 2),
+        'ms_per_query': round(sum(latencies) / queries, 3) if queries else None,
+    }
+
+
+def compare_backends(aliases, iterations=100, warmup=10, log=print):
+    """
+    Runs every workload against every database.
+
+    Args:
+        aliases (list): The database aliases to compare; the first one is where the rows are picked.
+        iterations (int): Measured runs per workload and database.
+        warmup (int): Unmeasured runs per workload and database.
+        log (function): Receives one line per measurement.
+
+    Returns:
+        dict: The engine of every database and, per workload, the measurements of every database.
+    """
+    results = {}
+    for name, workload in build_workloads(aliases[0]):
+        results[name] = {}
+        for alias in aliases:
+            result = results[name][alias] = measure(workload, alias, iterations, warmup)
+            log(f"{name:<28} {alias:<12} p50 {result['p50_ms']:>9.3f} ms  p99 {result['p99_ms']:>9.3f} ms  "
+                f"{result['ms_per_query'] or 0:>8.3f} ms/query")
+    return {
+        'databases': {alias: connections[alias].settings_dict['ENGINE'] for alias in aliases},
+        'iterations': iterations,
+        'workloads': results,
+    }
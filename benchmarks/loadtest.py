@@ -0,0 +1,97 @@
+"""
+HTTP load generator comparing the throughput of WSGI and ASGI deployments.
+
+Unlike BenchmarkRunner, which calls the views in-process one request at a
+time, run_load() sends concurrent requests over HTTP to a running server, so
+it measures what the deployment (worker model, sync or async views) sustains
+under load. Run it once against a WSGI server and once against an ASGI server
+serving the same database, and compare the two reports (see the README).
+"""
+
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from .runner import percentile
+
+# The list endpoints that have async variants (settings.ASYNC_READ_VIEWS)
+DEFAULT_PATHS = ('/user/all/?fields=id,username', '/attendance/all/?page_size=100', '/account/all/')
+
+
+def fetch(url, token, timeout):
+    """
+    Sends one GET request.
+
+    Returns:
+        tuple: The HTTP status (None on a connection error) and the latency in seconds.
+    """
+    request = urllib.request.Request(url, headers={'Authorization': f'Bearer {token}'})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except (urllib.error.URLError, OSError):
+        status = None
+    return status, time.perf_counter() - start
+
+
+def run_load(base_url, token, paths=DEFAULT_PATHS, concurrency=50, duration=30.0, timeout=30.0):
+    """
+    Requests the paths in a loop from concurrent clients for a fixed duration.
+
+    Args:
+        base_url (str): The address of the server, e.g. 'http://127.0.0.1:8000'.
+        token (str): A JWT access token.
+        paths (tuple): The paths to request, in turn.
+        concurrency (int): The number of concurrent clients.
+        duration (float): How long to send requests, in seconds.
+        timeout (float): The timeout of a single request, in seconds.
+
+    Returns:
+        dict: Throughput, latency percentiles in milliseconds and status counts, overall and per path.
+    """
+    urls = [base_url.rstrip('/') + path for path in paths]
+    results = {url: [] for url in urls}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client(offset):
+        index = offset
+        while time.perf_counter() < deadline:
+            url = urls[index % len(urls)]
+            outcome = fetch(url, token, timeout)
+            with lock:
+                results[url].append(outcome)
+            index += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(client, range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    def summarize(outcomes):
+        latencies = sorted(latency * 1000 for _, latency in outcomes)
+        statuses = {}
+        for status, _ in outcomes:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        return {
+            'requests': len(outcomes),
+            'requests_per_second': round(len(outcomes) / elapsed, 2),
+            'p50_ms': percentile(latencies, 0.50),
+            'p95_ms': percentile(latencies, 0.95),
+            'p99_ms': percentile(latencies, 0.99),
+            'statuses': statuses,
+        }
+
+    return {
+        'base_url': base_url,
+        'concurrency': concurrency,
+        'duration_s': round(elapsed, 3),
+        'total': summarize([outcome for outcomes in results.values() for outcome in outcomes]),
+        'paths': {url[len(base_url.rstrip('/')):]: summarize(outcomes) for url, outcomes in results.items()},
+    }
@@ -0,0 +1,45 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from benchmarks.backends import compare_backends
+
+
+class Command(BaseCommand):
+    """
+    Management command timing the query workloads of the three apps on several databases side by side.
+
+    Example:
+        TARGET_DATABASE_ENGINE=postgres TARGET_DATABASE_NAME=bench python manage.py compare_backends \
+            --databases default,target --output bench/backends.json --settings=AttendanceAndAccountsApp.settings_bench
+    """
+
+    help = 'Compares the per-query latency of configured database backends holding the same data.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--databases', default='default,target',
+                            help='Comma separated database aliases to compare (default: default,target).')
+        parser.add_argument('--iterations', type=int, default=100, help='Measured runs per workload and database.')
+        parser.add_argument('--warmup', type=int, default=10, help='Unmeasured runs per workload and database.')
+        parser.add_argument('--output', help='Path of the JSON report.')
+
+    def handle(self, *args, **options):
+        aliases = [alias.strip() for alias in options['databases'].split(',') if alias.strip()]
+        unknown = [alias for alias in aliases if alias not in connections.databases]
+        if unknown:
+            raise CommandError(f'Unknown databases {unknown}; configure them with TARGET_DATABASE_* or in settings')
+        try:
+            report = compare_backends(aliases, options['iterations'], options['warmup'], log=self.stdout.write)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        header = ''.join(f'{alias:>14}' for alias in aliases)
+        self.stdout.write(f"\n{'ms per query':<28}{header}")
+        for name, results in report['workloads'].items():
+            self.stdout.write(f'{name:<28}' + ''.join(f"{results[alias]['ms_per_query'] or 0:>14.3f}" for alias in aliases))
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
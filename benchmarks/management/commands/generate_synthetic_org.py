@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.synthetic import SyntheticOrg
+
+
+class Command(BaseCommand):
+    """
+    Management command filling the database with a synthetic organization for benchmarks.
+
+    Run it against a disposable database, e.g. the SQLite one of the benchmark settings:
+        python manage.py generate_synthetic_org --users 20000 --years 3 \
+            --settings=AttendanceAndAccountsApp.settings_bench
+    """
+
+    help = 'Generates users with a manager tree, attendance, accounts and pay rules for benchmarking.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--years', type=int, default=1, help='Years of attendance and accounts history.')
+        parser.add_argument('--fanout', type=int, default=8, help='Direct reports per manager.')
+        parser.add_argument('--presence', type=float, default=0.95, help='Probability of attending on a weekday.')
+        parser.add_argument('--prefix', default='synthetic', help='Username prefix of the generated users.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        org = SyntheticOrg(
+            users=options['users'],
+            years=options['years'],
+            fanout=options['fanout'],
+            presence=options['presence'],
+            prefix=options['prefix'],
+            batch_size=options['batch_size'],
+            seed=options['seed'],
+        )
+        try:
+            counts = org.generate(log=self.stdout.write)
+        except ValueError as e:
+            raise CommandError(str(e))
+        for model, count in counts.items():
+            self.stdout.write(f'{model}: {count}')
+        self.stdout.write(self.style.SUCCESS('Synthetic organization generated'))
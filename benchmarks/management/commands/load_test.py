@@ -0,0 +1,50 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from benchmarks.loadtest import DEFAULT_PATHS, run_load
+from benchmarks.runner import BENCHMARK_USERNAME
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    """
+    Management command sending concurrent requests to a running server and reporting its throughput.
+
+    Example:
+        python manage.py load_test --url http://127.0.0.1:8000 --concurrency 100 --duration 60 \
+            --output bench/asgi.json --settings=AttendanceAndAccountsApp.settings_bench
+    """
+
+    help = 'Measures the throughput and latency of a running WSGI or ASGI deployment under concurrent load.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Address of the server under test.')
+        parser.add_argument('--path', action='append', dest='paths',
+                            help='Path to request; repeat for several (default: the list endpoints).')
+        parser.add_argument('--concurrency', type=int, default=50, help='Number of concurrent clients.')
+        parser.add_argument('--duration', type=float, default=30.0, help='Seconds to send requests for.')
+        parser.add_argument('--username', default=BENCHMARK_USERNAME,
+                            help='User to issue the access token for; created if missing.')
+        parser.add_argument('--output', help='Path of the JSON report.')
+
+    def handle(self, *args, **options):
+        if options['duration'] >= settings.SIMPLE_JWT['ACCESS_TOKEN_LIFETIME'].total_seconds():
+            raise CommandError('The duration must be shorter than the access token lifetime.')
+        user, _ = CustomUser.objects.get_or_create(
+            username=options['username'], defaults={'is_staff': True, 'department': 'Benchmark', 'position': 'Admin'})
+
+        report = run_load(options['url'], str(AccessToken.for_user(user)), paths=options['paths'] or DEFAULT_PATHS,
+                          concurrency=options['concurrency'], duration=options['duration'])
+
+        self.stdout.write(f"{'path':<45} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}  statuses")
+        for path, summary in list(report['paths'].items()) + [('total', report['total'])]:
+            self.stdout.write(f"{path:<45} {summary['requests_per_second']:>9.1f} {summary['p50_ms'] or 0:>9.1f} "
+                              f"{summary['p95_ms'] or 0:>9.1f} {summary['p99_ms'] or 0:>9.1f}  {summary['statuses']}")
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
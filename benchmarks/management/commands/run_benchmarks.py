@@ -0,0 +1,57 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from benchmarks.runner import BenchmarkRunner, compare
+
+
+class Command(BaseCommand):
+    """
+    Management command benchmarking every endpoint of the users, attendance and accounts apps.
+
+    Example:
+        python manage.py run_benchmarks --iterations 50 --output bench/run.json \
+            --baseline bench/previous.json --settings=AttendanceAndAccountsApp.settings_bench
+    """
+
+    help = 'Measures latency percentiles, queries per request and peak memory of every endpoint.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20, help='Measured requests per scenario.')
+        parser.add_argument('--warmup', type=int, default=3, help='Unmeasured requests per scenario.')
+        parser.add_argument('--only', help='Only run scenarios whose key contains this text, e.g. "attendance:".')
+        parser.add_argument('--output', help='Path of the JSON results (default: benchmarks/results/<time>.json).')
+        parser.add_argument('--baseline', help='JSON results of a previous run to compare with.')
+        parser.add_argument('--disable-response-cache', action='store_true',
+                            help='Measure the list endpoints without the response cache.')
+
+    def handle(self, *args, **options):
+        runner = BenchmarkRunner(iterations=options['iterations'], warmup=options['warmup'], only=options['only'])
+        cache_enabled = settings.RESPONSE_CACHE_ENABLED and not options['disable_response_cache']
+        try:
+            with override_settings(RESPONSE_CACHE_ENABLED=cache_enabled):
+                report = runner.run(log=self.stdout.write)
+        except ValueError as e:
+            raise CommandError(str(e))
+        report['response_cache'] = cache_enabled
+
+        for endpoint in report['uncovered_endpoints']:
+            self.stdout.write(self.style.WARNING(f'No scenario for {endpoint}'))
+
+        output = options['output'] or os.path.join(
+            settings.BASE_DIR, 'benchmarks', 'results', report['started_at'][:19].replace(':', '') + '.json')
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'Results written to {output}'))
+
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+            self.stdout.write(f"{'scenario':<45} {'p50 before':>11} {'p50 after':>11} {'change':>8} {'queries':>12}")
+            for key, old, new, change, old_queries, new_queries in compare(report, baseline):
+                change = f'{change:+.1f}%' if change is not None else '-'
+                self.stdout.write(f'{key:<45} {old:>11.3f} {new:>11.3f} {change:>8} {old_queries:>5} -> {new_queries:<5}')
@@ -0,0 +1,375 @@
+"""
+Benchmark runner for the endpoints of the users, attendance and accounts apps.
+
+Every route of users/urls.py, attendance/urls.py and accounts/urls.py is
+discovered from the urlconfs and matched with one or more scenarios (method,
+path and body). Each scenario is requested through the full middleware and
+JWT authentication stack with django.test.Client; write requests run in a
+transaction that is rolled back, so the dataset is the same for every run.
+
+For every scenario the runner records latency percentiles, the number of
+queries per request, the time spent in the database and the peak memory
+allocated while handling a request.
+"""
+
+import datetime
+import json
+import time
+import tracemalloc
+from importlib import import_module
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.models import Accounts
+from attendance.models import Attendance
+from users.models import CustomUser
+
+# (URL prefix, urlconf) of the apps whose endpoints are benchmarked
+URLCONFS = (
+    ('user', 'users.urls'),
+    ('attendance', 'attendance.urls'),
+    ('account', 'accounts.urls'),
+)
+
+BENCHMARK_USERNAME = 'benchmark_admin'
+
+# Records changed or deleted by each batch scenario
+BATCH_SIZE = 200
+
+
+def discover_endpoints():
+    """
+    Lists the routes of the benchmarked apps.
+
+    Returns:
+        list: (prefix, url name, route, allowed methods) tuples.
+    """
+    endpoints = []
+    for prefix, module in URLCONFS:
+        for pattern in import_module(module).urlpatterns:
+            view_class = getattr(pattern.callback, 'cls', None)
+            methods = [method.upper() for method in getattr(view_class, 'http_method_names', ['get'])
+                       if method != 'options']
+            endpoints.append((prefix, pattern.name, str(pattern.pattern), methods))
+    return endpoints
+
+
+class Scenario:
+    """
+    One benchmarked request.
+
+    Attributes:
+        prefix (str): The URL prefix of the app, e.g. 'attendance'.
+        name (str): The url name of the route within the app.
+        method (str): The HTTP method.
+        path (str): The full path including the query string.
+        data (dict, list or callable): The JSON body, or a function of the iteration number returning it.
+        label (str): Distinguishes several scenarios of the same route.
+        headers (dict): Additional request headers, as WSGI environ keys (e.g. HTTP_IF_NONE_MATCH).
+    """
+
+    def __init__(self, prefix, name, method, path, data=None, label='', headers=None):
+        self.prefix = prefix
+        self.name = name
+        self.method = method
+        self.path = path
+        self.data = data
+        self.label = label
+        self.headers = headers or {}
+
+    @property
+    def key(self):
+        return f'{self.prefix}:{self.name}:{self.method}' + (f':{self.label}' if self.label else '')
+
+    def body(self, iteration):
+        data = self.data(iteration) if callable(self.data) else self.data
+        return '' if data is None else json.dumps(data)
+
+
+class Samples:
+    """
+    Existing rows the scenarios operate on, picked from the benchmark dataset.
+    """
+
+    def __init__(self):
+        self.staff, _ = CustomUser.objects.get_or_create(
+            username=BENCHMARK_USERNAME, defaults={'is_staff': True, 'department': 'Benchmark', 'position': 'Admin'})
+        self.root = (CustomUser.objects.filter(manager__isnull=True).annotate(reports=Count('customuser'))
+                     .order_by('-reports').first())
+        managers = CustomUser.objects.filter(manager__isnull=False).values('manager')
+        self.leaf = CustomUser.objects.exclude(pk__in=managers).exclude(pk=self.staff.pk).order_by('-org_path').first()
+        self.attendance = Attendance.objects.filter(employee=self.leaf).order_by('-date').first() \
+            or Attendance.objects.order_by('-date').first()
+        self.account = Accounts.objects.order_by('-year', '-month').first()
+        self.batch_users = list(CustomUser.objects.exclude(pk__in=managers).exclude(pk=self.staff.pk)
+                                .order_by('pk').values_list('pk', flat=True)[:BATCH_SIZE])
+        self.batch_attendance = list(Attendance.objects.order_by('-date', '-id').values_list('pk', flat=True)[:BATCH_SIZE])
+        self.batch_accounts = list(Accounts.objects.order_by('-year', '-month', '-id')
+                                   .values_list('pk', flat=True)[:BATCH_SIZE])
+        latest = self.attendance.date if self.attendance else datetime.date.today()
+        self.year, self.month = latest.year, latest.month
+        self.month_start = latest.replace(day=1)
+
+    def check(self):
+        if not (self.root and self.leaf and self.attendance and self.account):
+            raise ValueError('The database has no data to benchmark; run generate_synthetic_org first')
+
+
+def user_payload(user, **changes):
+    data = {
+        'username': user.username, 'department': user.department, 'position': user.position,
+        'address': user.address, 'phone_number': user.phone_number, 'manager': user.manager_id,
+        'password': 'benchmark-password',
+    }
+    data.update(changes)
+    return data
+
+
+def build_scenarios(s):
+    """
+    Builds the benchmark scenarios for the given samples.
+
+    Args:
+        s (Samples): The rows to operate on.
+
+    Returns:
+        list: The scenarios.
+    """
+    leaf, attendance, account = s.leaf, s.attendance, s.account
+    future = datetime.date(2099, 1, 1)
+    month_range = f'date__gte={s.month_start}&date__lt={(s.month_start + datetime.timedelta(days=32)).replace(day=1)}'
+    attendance_data = {'employee': attendance.employee_id, 'date': str(attendance.date),
+                       'check_in_time': attendance.check_in_time.isoformat(),
+                       'check_out_time': attendance.check_out_time.isoformat() if attendance.check_out_time else None}
+
+    def new_attendance(i, count=1):
+        return [{'employee': leaf.pk, 'date': str(future + datetime.timedelta(days=i * count + n)),
+                 'check_in_time': f'{future + datetime.timedelta(days=i * count + n)}T09:00:00Z'}
+                for n in range(count)]
+
+    return [
+        Scenario('user', 'home', 'GET', '/user/'),
+        Scenario('user', 'add-users', 'POST', '/user/create/',
+                 lambda i: user_payload(leaf, username=f'benchmark_new_{i}', phone_number=f'{i}')),
+        Scenario('user', 'import-users', 'POST', '/user/import/',
+                 lambda i: [user_payload(leaf, username=f'benchmark_import_{i}_{n}', manager=None,
+                                         manager_username=f'benchmark_import_{i}_0' if n else leaf.username)
+                            for n in range(20)]),
+        Scenario('user', 'view-users', 'GET', '/user/all/', label='all'),
+        Scenario('user', 'view-users', 'GET', f'/user/all/?department={leaf.department}', label='department'),
+        Scenario('user', 'view-users', 'GET', '/user/all/?fields=id,username,manager', label='sparse'),
+        # A client revalidating a response it already has; '*' matches any current ETag
+        Scenario('user', 'view-users', 'GET', '/user/all/', label='not-modified', headers={'HTTP_IF_NONE_MATCH': '*'}),
+        Scenario('user', 'changes', 'GET', '/user/changes/?since=0&limit=1000'),
+        Scenario('user', 'update_users', 'POST', f'/user/update/{leaf.pk}/', user_payload(leaf)),
+        Scenario('user', 'delete-items', 'DELETE', f'/user/{leaf.pk}/delete/'),
+        # Moving BATCH_SIZE people to a new manager is one UPDATE and one org path recomputation
+        Scenario('user', 'batch', 'PATCH', '/user/batch/', [{'id': pk, 'manager': s.root.pk} for pk in s.batch_users]),
+        Scenario('user', 'batch', 'DELETE', '/user/batch/', s.batch_users),
+        Scenario('user', 'org-reports', 'GET', f'/user/{s.root.pk}/reports/'),
+        Scenario('user', 'org-chain', 'GET', f'/user/{leaf.pk}/chain/'),
+        Scenario('user', 'workforce-analytics', 'GET', '/user/analytics/'),
+        Scenario('user', 'hello', 'GET', '/user/hello/'),
+
+        Scenario('attendance', 'home', 'GET', '/attendance/'),
+        Scenario('attendance', 'add-users', 'POST', '/attendance/create/', lambda i: new_attendance(i)[0]),
+        Scenario('attendance', 'bulk-attendance', 'POST', '/attendance/bulk/', lambda i: new_attendance(i, 500)),
+        # Writes are rolled back, so every punch is the check-in of the day
+        Scenario('attendance', 'punch', 'POST', '/attendance/punch/'),
+        Scenario('attendance', 'view-users', 'GET', '/attendance/all/?page_size=100', label='page'),
+        Scenario('attendance', 'view-users', 'GET', f'/attendance/all/?employee={leaf.pk}', label='employee'),
+        Scenario('attendance', 'view-users', 'GET', f'/attendance/all/?{month_range}&page_size=1000', label='month-page'),
+        Scenario('attendance', 'view-users', 'GET', f'/attendance/all/?{month_range}&stream=true', label='month-stream'),
+        # Recent records only read the hot table; a range without lower bound also reads the archive
+        Scenario('attendance', 'view-users', 'GET',
+                 f'/attendance/all/?date__gte={attendance.date - datetime.timedelta(days=7)}&page_size=1000', label='week'),
+        Scenario('attendance', 'view-users', 'GET', f'/attendance/all/?employee={leaf.pk}&page_size=1000',
+                 label='employee-history'),
+        Scenario('attendance', 'view-users', 'GET', '/attendance/all/?page_size=100', label='not-modified',
+                 headers={'HTTP_IF_NONE_MATCH': '*'}),
+        Scenario('attendance', 'changes', 'GET', '/attendance/changes/?since=0&limit=1000'),
+        Scenario('attendance', 'export-attendance', 'GET', f'/attendance/export/?{month_range}'),
+        Scenario('attendance', 'update_users', 'POST', f'/attendance/update/{attendance.pk}/', attendance_data),
+        Scenario('attendance', 'delete-items', 'DELETE', f'/attendance/{attendance.pk}/delete/'),
+        Scenario('attendance', 'batch', 'PATCH', '/attendance/batch/',
+                 [{'id': pk, 'check_out_time': None} for pk in s.batch_attendance]),
+        Scenario('attendance', 'batch', 'DELETE', '/attendance/batch/', s.batch_attendance),
+        Scenario('attendance', 'attendance-report', 'GET', f'/attendance/report/?year={s.year}&month={s.month}'),
+        Scenario('attendance', 'work-hours', 'GET', f'/attendance/hours/?year={s.year}&month={s.month}'),
+        Scenario('attendance', 'hello', 'GET', '/attendance/hello/'),
+
+        Scenario('account', 'home', 'GET', '/account/'),
+        Scenario('account', 'add-users', 'POST', '/account/create/',
+                 lambda i: {'employee': leaf.pk, 'year': 2100 + i // 12, 'month': i % 12 + 1, 'salary': '1000.00'}),
+        Scenario('account', 'view-users', 'GET', f'/account/all/?year={account.year}&month={account.month}',
+                 label='month'),
+        Scenario('account', 'view-users', 'GET', f'/account/all/?employee={account.employee_id}', label='employee'),
+        Scenario('account', 'changes', 'GET', '/account/changes/?since=0&limit=1000'),
+        Scenario('account', 'export-accounts', 'GET', f'/account/export/?year={account.year}&export_format=ndjson'),
+        Scenario('account', 'update_users', 'POST', f'/account/update/{account.pk}/',
+                 {'employee': account.employee_id, 'year': account.year, 'month': account.month,
+                  'salary': str(account.salary)}),
+        Scenario('account', 'delete-items', 'DELETE', f'/account/{account.pk}/delete/'),
+        Scenario('account', 'batch', 'PATCH', '/account/batch/',
+                 [{'id': pk, 'salary': '1000.00'} for pk in s.batch_accounts]),
+        Scenario('account', 'batch', 'DELETE', '/account/batch/', s.batch_accounts),
+        Scenario('account', 'salary-ledger', 'GET', f'/account/ledger/{account.employee_id}/'),
+        Scenario('account', 'department-ledger', 'GET', f'/account/ledger/departments/?year={account.year}'),
+        Scenario('account', 'pay-rates', 'GET', f'/account/rates/?employee={leaf.pk}'),
+        Scenario('account', 'pay-rates', 'POST', '/account/rates/', {'employee': leaf.pk, 'hourly_rate': '25.00'}),
+        Scenario('account', 'payroll', 'POST', '/account/payroll/', {'year': s.year, 'month': s.month, 'dry_run': True}),
+        Scenario('account', 'hello', 'GET', '/account/hello/'),
+    ]
+
+
+def percentile(values, fraction):
+    """
+    Returns the nearest-rank percentile of sorted values.
+    """
+    if not values:
+        return None
+    index = min(len(values) - 1, max(0, round(fraction * len(values) + 0.5) - 1))
+    return values[index]
+
+
+class BenchmarkRunner:
+    """
+    Runs the scenarios and collects their measurements.
+
+    Attributes:
+        iterations (int): Measured requests per scenario.
+        warmup (int): Unmeasured requests sent before the measured ones.
+        only (str, optional): Only run scenarios whose key contains this text.
+    """
+
+    def __init__(self, iterations=20, warmup=3, only=None):
+        self.iterations = iterations
+        self.warmup = warmup
+        self.only = only
+        self.client = Client(SERVER_NAME='localhost')
+
+    def execute(self, scenario, iteration, headers):
+        """
+        Sends one request; write requests are rolled back afterwards.
+
+        Returns:
+            int: The status code of the response.
+        """
+        with transaction.atomic():
+            response = self.client.generic(scenario.method, scenario.path, scenario.body(iteration),
+                                           content_type='application/json', **headers, **scenario.headers)
+            if response.streaming:
+                for _ in response.streaming_content:
+                    pass
+            if scenario.method != 'GET':
+                transaction.set_rollback(True)
+        return response.status_code
+
+    def measure(self, scenario, headers):
+        latencies = []
+        queries = []
+        db_seconds = 0.0
+        statuses = set()
+        for iteration in range(self.warmup + self.iterations):
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                statuses.add(self.execute(scenario, iteration, headers))
+                elapsed = time.perf_counter() - start
+            if iteration >= self.warmup:
+                latencies.append(elapsed * 1000)
+                queries.append(len(captured))
+                db_seconds += sum(float(query['time']) for query in captured.captured_queries)
+
+        # Memory is traced in a separate request, as tracing slows down the measured ones
+        tracemalloc.start()
+        self.execute(scenario, self.warmup + self.iterations, headers)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        latencies.sort()
+        return {
+            'key': scenario.key,
+            'method': scenario.method,
+            'path': scenario.path,
+            'status': sorted(statuses),
+            'iterations': self.iterations,
+            'latency_ms': {
+                'min': round(latencies[0], 3),
+                'p50': round(percentile(latencies, 0.50), 3),
+                'p90': round(percentile(latencies, 0.90), 3),
+                'p99': round(percentile(latencies, 0.99), 3),
+                'max': round(latencies[-1], 3),
+                'mean': round(sum(latencies) / len(latencies), 3),
+            },
+            'queries_per_request': round(sum(queries) / len(queries), 2),
+            'db_ms_per_request': round(db_seconds * 1000 / self.iterations, 3),
+            'ms_per_query': round(db_seconds * 1000 / sum(queries), 3) if sum(queries) else None,
+            'peak_memory_kb': round(peak / 1024, 1),
+        }
+
+    def run(self, log=print):
+        """
+        Runs every scenario and reports the routes that have no scenario.
+
+        Returns:
+            dict: The run metadata, the dataset size and one result per scenario.
+        """
+        samples = Samples()
+        samples.check()
+        scenarios = build_scenarios(samples)
+        covered = {(scenario.prefix, scenario.name, scenario.method) for scenario in scenarios}
+        uncovered = [f'{prefix}:{name}:{method} ({route})' for prefix, name, route, methods in discover_endpoints()
+                     for method in methods if (prefix, name, method) not in covered]
+
+        results = []
+        for scenario in scenarios:
+            if self.only and self.only not in scenario.key:
+                continue
+            # A fresh token per scenario, as access tokens are short-lived
+            headers = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(samples.staff)}'}
+            result = self.measure(scenario, headers)
+            log(f"{result['key']:<45} p50 {result['latency_ms']['p50']:>10.3f} ms  "
+                f"queries {result['queries_per_request']:>7}  peak {result['peak_memory_kb']:>10} KB")
+            results.append(result)
+
+        return {
+            'started_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'settings': settings.SETTINGS_MODULE,
+            'database': {'vendor': connection.vendor, 'engine': connection.settings_dict['ENGINE']},
+            'dataset': {
+                'users': CustomUser.objects.count(),
+                'attendance': Attendance.objects.count(),
+                'accounts': Accounts.objects.count(),
+            },
+            'iterations': self.iterations,
+            'uncovered_endpoints': uncovered,
+            'results': results,
+        }
+
+
+def compare(current, baseline):
+    """
+    Compares the p50 latency and query counts of two runs.
+
+    Args:
+        current (dict): The result of BenchmarkRunner.run().
+        baseline (dict): A previous result, loaded from its JSON file.
+
+    Returns:
+        list: (key, baseline p50, current p50, change in percent, baseline queries, current queries) tuples.
+    """
+    previous = {result['key']: result for result in baseline['results']}
+    rows = []
+    for result in current['results']:
+        before = previous.get(result['key'])
+        if before is None:
+            continue
+        old, new = before['latency_ms']['p50'], result['latency_ms']['p50']
+        change = round((new - old) / old * 100, 1) if old else None
+        rows.append((result['key'], old, new, change, before['queries_per_request'], result['queries_per_request']))
+    return rows
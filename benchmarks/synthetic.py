@@ -0,0 +1,201 @@
+"""
+Synthetic organization generator for benchmarks.
+
+Builds a balanced management tree of CustomUser rows with departments and
+positions, pay rules, a working day of attendance for every employee present
+on every weekday, and a monthly Accounts record per employee. Everything is
+inserted with bulk_create in batches, so millions of attendance rows can be
+generated in minutes on a local SQLite database.
+"""
+
+import datetime
+import random
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from accounts.models import Accounts, PayRate
+from attendance.models import Attendance
+from attendance.rollups import rebuild_rollups
+from users.hierarchy import rebuild_hierarchy
+from users.models import CustomUser
+
+DEPARTMENTS = ('Engineering', 'Sales', 'Finance', 'HR', 'Operations', 'Support', 'Marketing', 'Legal')
+POSITIONS = ('Director', 'Manager', 'Lead', 'Senior Associate', 'Associate')
+
+
+def _batched_create(model, objects, batch_size):
+    batch = []
+    created = 0
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) >= batch_size:
+            with transaction.atomic():
+                model.objects.bulk_create(batch)
+            created += len(batch)
+            batch = []
+    if batch:
+        with transaction.atomic():
+            model.objects.bulk_create(batch)
+        created += len(batch)
+    return created
+
+
+def _months(start, end):
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        yield year, month
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+class SyntheticOrg:
+    """
+    Generates a synthetic organization.
+
+    Attributes:
+        users (int): The number of employees.
+        years (int): The number of years of attendance and accounts history.
+        fanout (int): The number of direct reports per manager.
+        presence (float): The probability that an employee shows up on a weekday.
+        prefix (str): The username prefix of the generated users.
+        batch_size (int): Rows per bulk insert.
+        end_date (date): The last day of the generated history.
+    """
+
+    def __init__(self, users=1000, years=1, fanout=8, presence=0.95, prefix='synthetic',
+                 batch_size=5000, end_date=None, seed=0):
+        self.users = users
+        self.years = years
+        self.fanout = fanout
+        self.presence = presence
+        self.prefix = prefix
+        self.batch_size = batch_size
+        self.end_date = end_date or datetime.date.today()
+        self.start_date = self.end_date - datetime.timedelta(days=365 * years)
+        self.rng = random.Random(seed)
+
+    def generate(self, log=print):
+        """
+        Generates the whole organization.
+
+        Args:
+            log (callable): Receives progress messages.
+
+        Returns:
+            dict: The number of rows created per model.
+        """
+        if CustomUser.objects.filter(username__startswith=self.prefix).exists():
+            raise ValueError(f'Users with the prefix "{self.prefix}" already exist')
+
+        employees = self.create_users()
+        log(f'Created {len(employees)} users')
+        counts = {'users': len(employees)}
+        counts['pay_rates'] = _batched_create(PayRate, self.pay_rates(employees), self.batch_size)
+        counts['attendance'] = _batched_create(Attendance, self.attendance(employees), self.batch_size)
+        log(f"Created {counts['attendance']} attendance records")
+        counts['accounts'] = _batched_create(Accounts, self.accounts(employees), self.batch_size)
+        log(f"Created {counts['accounts']} accounts records")
+        counts['attendance_rollups'] = rebuild_rollups()
+        return counts
+
+    def create_users(self):
+        """
+        Inserts the users, then links every user to their manager and builds the org paths.
+
+        Returns:
+            list: (pk, joining_date, termination_date) for every user, in creation order.
+        """
+        # Passwords are unusable, so that generating users does not spend time on hashing
+        password = make_password(None)
+        users = []
+        departments = []
+        for index in range(self.users):
+            manager_index = (index - 1) // self.fanout if index else None
+            if index == 0:
+                department = 'Management'
+            elif manager_index == 0:
+                department = DEPARTMENTS[(index - 1) % len(DEPARTMENTS)]
+            else:
+                department = departments[manager_index]
+            departments.append(department)
+
+            depth = 0
+            parent = manager_index
+            while parent is not None:
+                depth += 1
+                parent = (parent - 1) // self.fanout if parent else None
+            if self.rng.random() < 0.7:
+                # Most employees joined before the generated history starts
+                joining_date = self.start_date - datetime.timedelta(days=self.rng.randint(0, 3650))
+            else:
+                joining_date = self.start_date + datetime.timedelta(
+                    days=self.rng.randint(0, (self.end_date - self.start_date).days))
+            termination_date = None
+            if index and self.rng.random() < 0.05:
+                termination_date = joining_date + datetime.timedelta(days=self.rng.randint(30, 1500))
+                if termination_date > self.end_date:
+                    termination_date = None
+
+            users.append(CustomUser(
+                username=f'{self.prefix}{index:07d}',
+                password=password,
+                first_name=f'First{index}',
+                last_name=f'Last{index}',
+                email=f'{self.prefix}{index}@example.com',
+                is_active=termination_date is None,
+                department=department,
+                position=POSITIONS[min(depth, len(POSITIONS) - 1)],
+                address=f'{index} Synthetic Street',
+                phone_number=f'+1555{index:07d}'[:15],
+                joining_date=joining_date,
+                termination_date=termination_date,
+            ))
+        _batched_create(CustomUser, users, self.batch_size)
+
+        pks = dict(CustomUser.objects.filter(username__startswith=self.prefix).values_list('username', 'pk'))
+        for index, user in enumerate(users):
+            user.pk = pks[user.username]
+            user.manager_id = users[(index - 1) // self.fanout].pk if index else None
+        with transaction.atomic():
+            CustomUser.objects.bulk_update(users, ['manager'], batch_size=self.batch_size)
+            rebuild_hierarchy()
+        return [(user.pk, user.joining_date, user.termination_date) for user in users]
+
+    def pay_rates(self, employees):
+        for pk, _, _ in employees:
+            yield PayRate(employee_id=pk, base_salary=Decimal(self.rng.randrange(1500, 6000)),
+                          hourly_rate=Decimal(self.rng.randrange(10, 60)))
+
+    def attendance(self, employees):
+        """
+        Yields one attendance record per employee and weekday, for employees present that day.
+        """
+        utc = datetime.timezone.utc
+        day = self.start_date
+        while day <= self.end_date:
+            if day.weekday() < 5:
+                for pk, joining_date, termination_date in employees:
+                    if day < joining_date or (termination_date and day > termination_date):
+                        continue
+                    if self.rng.random() > self.presence:
+                        continue
+                    check_in = datetime.datetime.combine(day, datetime.time(8, 30), tzinfo=utc) \
+                        + datetime.timedelta(minutes=self.rng.gauss(0, 25))
+                    check_out = None
+                    if self.rng.random() > 0.02:
+                        check_out = check_in + datetime.timedelta(minutes=self.rng.gauss(510, 45))
+                    yield Attendance(employee_id=pk, date=day, check_in_time=check_in, check_out_time=check_out)
+            day += datetime.timedelta(days=1)
+
+    def accounts(self, employees):
+        """
+        Yields one accounts record per employee and month they were employed in.
+        """
+        for year, month in _months(self.start_date, self.end_date):
+            month_start = datetime.date(year, month, 1)
+            for pk, joining_date, termination_date in employees:
+                if joining_date > month_start or (termination_date and termination_date < month_start):
+                    continue
+                salary = Decimal(self.rng.randrange(150000, 900000)) / 100
+                yield Accounts(employee_id=pk, year=year, month=month, salary=salary)
@@ -0,0 +1,188 @@
+"""
+Incremental change feed of the users, attendance and accounts collections.
+
+Every write path appends one Change entry per written or deleted record, in
+the transaction of the write, so an entry exists exactly when its write
+committed. Sequence numbers come from the auto-incremented primary key. A
+client syncs a collection by calling its feed with the cursor ('next') of its
+previous call and applying the returned records and tombstones. A record
+changed several times since the cursor is returned once, in its current state.
+
+Concurrent transactions can commit their entries out of sequence order. As a
+heuristic against that, entries recorded less than CHANGE_FEED_SETTLE_SECONDS
+ago are held back, so a cursor does not move past a recent entry that a lower,
+still uncommitted one may follow. The age is taken from the time the entry was
+recorded, not from its commit: a transaction that stays open for longer than
+the settle time after recording its entries can commit them below a cursor
+already handed out, and clients holding that cursor skip them. Keep the
+settle time above the longest write transaction, and have clients that must
+not miss a change resync from a lower cursor now and then.
+
+The compact_change_feed command removes entries superseded by a later entry of
+the same record. That keeps the feed bounded by the number of records and
+tombstones, without changing what any cursor returns.
+"""
+
+import datetime
+
+from django.conf import settings
+from django.db.models import Exists, Max, OuterRef
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from AttendanceAndAccountsApp.serialization import LeanSerializer, parse_fields
+from .models import Change
+from .serializers import ChangeFeedQuerySerializer
+
+# Collections of the feed, named like the response cache collections
+USERS = 'users'
+ATTENDANCE = 'attendance'
+ACCOUNTS = 'accounts'
+
+# Actions of the returned changes
+UPSERT = 'upsert'
+DELETE = 'delete'
+
+
+def record(collection, record_ids, deleted=False):
+    """
+    Appends feed entries for records that were written or deleted.
+
+    Call it inside the transaction of the write, so the entries commit with it.
+
+    Args:
+        collection (str): USERS, ATTENDANCE or ACCOUNTS.
+        record_ids (iterable): The primary keys of the records.
+        deleted (bool): Whether the records were deleted.
+    """
+    now = timezone.now()
+    entries = [Change(collection=collection, record_id=record_id, deleted=deleted, changed_at=now)
+               for record_id in dict.fromkeys(record_ids)]
+    if entries:
+        Change.objects.bulk_create(entries, batch_size=settings.CHANGE_FEED_BATCH_SIZE)
+
+
+def inserted_ids(model, records, key_fields):
+    """
+    Returns the primary keys of records inserted with bulk_create.
+
+    Backends that do not return primary keys from bulk inserts leave them unset;
+    the records are then looked up with one query by key_fields, which must be
+    unique together, and their primary keys are set.
+
+    Args:
+        model (Model): The model of the records.
+        records (list): The inserted records.
+        key_fields (tuple): Attribute names identifying a record, e.g. ('employee_id', 'date').
+
+    Returns:
+        list: The primary keys, in the order of the records.
+    """
+    if any(item.pk is None for item in records):
+        lookups = {f'{name}__in': {getattr(item, name) for item in records} for name in key_fields}
+        ids = {tuple(row[:-1]): row[-1] for row in model.objects.filter(**lookups).values_list(*key_fields, 'pk')}
+        for item in records:
+            item.pk = ids[tuple(getattr(item, name) for name in key_fields)]
+    return [item.pk for item in records]
+
+
+def read_changes(collection, model, lean, since, limit=None):
+    """
+    Reads the changes of a collection after a cursor.
+
+    Takes two queries: one for the feed entries and one for the current state of
+    the records that were not deleted.
+
+    Args:
+        collection (str): USERS, ATTENDANCE or ACCOUNTS.
+        model (Model): The model of the collection, or a tuple of the models holding its records
+            (e.g. Attendance and AttendanceArchive).
+        lean (LeanSerializer): Converts the records to their representation.
+        since (int): The cursor; only entries after it are read.
+        limit (int, optional): The maximum number of entries read (default: CHANGE_FEED_PAGE_SIZE).
+
+    Returns:
+        dict: 'changes' ordered by sequence number, each with the 'seq', 'id' and 'action'
+              ('upsert' with the 'record', or 'delete'); 'next', the cursor of the next call;
+              and 'has_more', whether more entries can be read right away.
+    """
+    limit = limit or settings.CHANGE_FEED_PAGE_SIZE
+    entries = list(Change.objects.filter(collection=collection, seq__gt=since).order_by('seq')
+                   .values_list('seq', 'record_id', 'deleted', 'changed_at')[:limit + 1])
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    # Stop before the first entry recent enough to be preceded by an uncommitted one
+    settled = timezone.now() - datetime.timedelta(seconds=settings.CHANGE_FEED_SETTLE_SECONDS)
+    for index, (_, _, _, changed_at) in enumerate(entries):
+        if changed_at > settled:
+            entries = entries[:index]
+            has_more = False
+            break
+
+    # The latest entry of each record decides its action
+    latest = {}
+    for seq, record_id, deleted, _ in entries:
+        latest[record_id] = (seq, deleted)
+    live = [record_id for record_id, (_, deleted) in latest.items() if not deleted]
+    rows = {}
+    if live:
+        for table in model if isinstance(model, tuple) else (model,):
+            rows.update((row['id'], row) for row in table.objects.filter(pk__in=live)
+                        .values(*dict.fromkeys(('id', *lean.fields))))
+
+    changes = []
+    for record_id, (seq, _) in sorted(latest.items(), key=lambda item: item[1][0]):
+        row = rows.get(record_id)
+        if row is None:
+            # Deleted, now or by a later entry
+            changes.append({'seq': seq, 'id': record_id, 'action': DELETE})
+        else:
+            changes.append({'seq': seq, 'id': record_id, 'action': UPSERT, 'record': lean.row(row)})
+    return {'next': entries[-1][0] if entries else since, 'has_more': has_more, 'changes': changes}
+
+
+def change_feed_response(request, collection, model, serializer_class, list_fields):
+    """
+    Answers a change feed request: ?since=<cursor>, optionally with 'limit' and 'fields'.
+
+    Args:
+        request (Request): The incoming request.
+        collection (str): USERS, ATTENDANCE or ACCOUNTS.
+        model (Model): The model of the collection, or a tuple of models (see read_changes).
+        serializer_class (Serializer): The serializer whose representation is returned.
+        list_fields (tuple): The fields that may be returned.
+
+    Returns:
+        Response: The changes, or the validation errors of the query parameters.
+    """
+    query = ChangeFeedQuerySerializer(data=request.query_params)
+    if not query.is_valid():
+        return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+    lean = LeanSerializer(serializer_class, parse_fields(query.validated_data.get('fields'), list_fields))
+    return Response(read_changes(collection, model, lean, query.validated_data['since'],
+                                 query.validated_data.get('limit')))
+
+
+def compact(chunk_size=None):
+    """
+    Deletes the feed entries superseded by a later entry of the same record.
+
+    Works through the feed in ranges of chunk_size sequence numbers, one delete per range.
+
+    Args:
+        chunk_size (int, optional): The sequence numbers per range (default: CHANGE_FEED_BATCH_SIZE).
+
+    Returns:
+        int: The number of entries deleted.
+    """
+    chunk_size = chunk_size or settings.CHANGE_FEED_BATCH_SIZE
+    later = Change.objects.filter(collection=OuterRef('collection'), record_id=OuterRef('record_id'),
+                                  seq__gt=OuterRef('seq'))
+    superseded = Change.objects.filter(Exists(later))
+    last = Change.objects.aggregate(last=Max('seq'))['last'] or 0
+    deleted = 0
+    for start in range(0, last, chunk_size):
+        deleted += superseded.filter(seq__gt=start, seq__lte=start + chunk_size).delete()[0]
+    return deleted
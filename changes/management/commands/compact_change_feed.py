@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from changes.feed import compact
+
+
+class Command(BaseCommand):
+    """
+    Management command removing change feed entries superseded by a later change of the same record.
+
+    Example:
+        python manage.py compact_change_feed --chunk-size 10000
+    """
+
+    help = 'Deletes change feed entries that a later entry of the same record supersedes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int,
+                            help='Sequence numbers compacted per delete (default: CHANGE_FEED_BATCH_SIZE).')
+
+    def handle(self, *args, **options):
+        deleted = compact(options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} superseded change feed entries'))
@@ -0,0 +1,33 @@
+# Generated by Django 4.1.13 on 2026-10-18 10:30
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Change',
+            fields=[
+                ('seq', models.BigAutoField(primary_key=True, serialize=False)),
+                ('collection', models.CharField(max_length=20)),
+                ('record_id', models.BigIntegerField()),
+                ('deleted', models.BooleanField(default=False)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='change',
+            index=models.Index(fields=['collection', 'seq'], name='change_collection_seq_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='change',
+            index=models.Index(fields=['collection', 'record_id', 'seq'], name='change_record_seq_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.1.13 on 2026-10-18 10:31
+
+from django.db import migrations
+
+# (collection, app label, model) of the records the feed covers
+COLLECTIONS = (
+    ('users', 'users', 'CustomUser'),
+    ('attendance', 'attendance', 'Attendance'),
+    ('accounts', 'accounts', 'Accounts'),
+)
+BATCH_SIZE = 2000
+
+
+def seed_changes(apps, schema_editor):
+    """
+    Records every existing record once, so a client starting from since=0 receives the whole dataset.
+    """
+    Change = apps.get_model('changes', 'Change')
+    for collection, app_label, model_name in COLLECTIONS:
+        model = apps.get_model(app_label, model_name)
+        batch = []
+        for record_id in model.objects.order_by('pk').values_list('pk', flat=True).iterator(chunk_size=BATCH_SIZE):
+            batch.append(Change(collection=collection, record_id=record_id))
+            if len(batch) == BATCH_SIZE:
+                Change.objects.bulk_create(batch)
+                batch = []
+        Change.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('changes', '0001_initial'),
+        ('users', '0007_customuser_updated_at'),
+        ('attendance', '0004_attendance_updated_at'),
+        ('accounts', '0004_accounts_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_changes, migrations.RunPython.noop),
+    ]
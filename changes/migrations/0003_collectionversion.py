@@ -0,0 +1,20 @@
+# Generated by Django 4.1.13 on 2026-10-18 11:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('changes', '0002_seed_existing_records'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CollectionVersion',
+            fields=[
+                ('collection', models.CharField(max_length=20, primary_key=True, serialize=False)),
+                ('generation', models.BigIntegerField()),
+            ],
+        ),
+    ]
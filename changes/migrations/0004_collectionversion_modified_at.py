@@ -0,0 +1,19 @@
+# Generated by Django 4.1.13 on 2026-10-18 11:01
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('changes', '0003_collectionversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='collectionversion',
+            name='modified_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,95 @@
+from django.db import models
+from django.utils import timezone
+
+class Change(models.Model):
+    """
+    Model recording that a record of the users, attendance or accounts collection was written or deleted.
+
+    Entries are appended by the write paths of the three apps, in the transaction
+    of the write, and read back by the change feed endpoints (see changes.feed).
+
+    Attributes:
+        seq (int): The position of the change in the feed; increases with every change.
+        collection (str): The collection of the record: 'users', 'attendance' or 'accounts'.
+        record_id (int): The primary key of the record.
+        deleted (bool): Whether the record was deleted (a tombstone).
+        changed_at (DateTime): The time the change was recorded.
+
+    Methods:
+        __str__(): Returns a string representation of the change.
+
+    Meta:
+        app_label (str): Specifies the app label for the change model (used for Django app configuration).
+    """
+
+    seq = models.BigAutoField(primary_key=True)
+    collection = models.CharField(max_length=20)
+    record_id = models.BigIntegerField()
+    deleted = models.BooleanField(default=False)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        """
+        Returns a string representation of the change.
+
+        Returns:
+            str: A formatted string with the sequence number, collection and record id.
+        """
+        return f"{self.seq} - {self.collection}:{self.record_id}{' (deleted)' if self.deleted else ''}"
+
+    class Meta:
+        """
+        Meta class for Change.
+
+        Attributes:
+            app_label (str): Specifies the app label for the change model.
+            indexes (list): Supports reading the changes of a collection after a sequence number,
+                            and finding the earlier changes of a record when compacting the feed.
+        """
+        app_label = 'changes'
+        indexes = [
+            models.Index(fields=['collection', 'seq'], name='change_collection_seq_idx'),
+            models.Index(fields=['collection', 'record_id', 'seq'], name='change_record_seq_idx'),
+        ]
+
+
+class CollectionVersion(models.Model):
+    """
+    Model holding the version stamp of a collection whose list responses are cached.
+
+    The stamp is kept in the database, so that a write handled by one worker
+    process invalidates the responses cached by all of them (see AttendanceAndAccountsApp.cache).
+
+    Attributes:
+        collection (str): The collection name: 'users', 'attendance' or 'accounts'.
+        generation (int): The generation number; increases with every committed write to the collection.
+        modified_at (DateTime): The time of the last committed write to the collection.
+
+    Methods:
+        __str__(): Returns a string representation of the version.
+
+    Meta:
+        app_label (str): Specifies the app label for the collection version model.
+    """
+
+    collection = models.CharField(max_length=20, primary_key=True)
+    generation = models.BigIntegerField()
+    modified_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        """
+        Returns a string representation of the version.
+
+        Returns:
+            str: A formatted string with the collection and generation number.
+        """
+        return f"{self.collection} - {self.generation}"
+
+    class Meta:
+        """
+        Meta class for CollectionVersion.
+
+        Attributes:
+            app_label (str): Specifies the app label for the collection version model.
+        """
+        app_label = 'changes'
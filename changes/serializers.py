@@ -0,0 +1,22 @@
+from django.conf import settings
+from rest_framework import serializers
+
+
+class ChangeFeedQuerySerializer(serializers.Serializer):
+    """
+    Serializer class validating the query parameters of the change feed endpoints.
+
+    Attributes:
+        since (int): The cursor returned by the previous call, or 0 for the whole feed.
+        limit (int, optional): The maximum number of feed entries read (default: CHANGE_FEED_PAGE_SIZE).
+        fields (str, optional): Comma separated fields returned for each record.
+    """
+
+    since = serializers.IntegerField(min_value=0)
+    limit = serializers.IntegerField(min_value=1, required=False)
+    fields = serializers.CharField(required=False)
+
+    def validate_limit(self, value):
+        if value > settings.CHANGE_FEED_MAX_PAGE_SIZE:
+            raise serializers.ValidationError(f'Ensure this value is less than or equal to {settings.CHANGE_FEED_MAX_PAGE_SIZE}.')
+        return value
@@ -0,0 +1,184 @@
+"""
+Headcount, tenure and termination analytics backed by the workforce summary.
+
+Every user counts once in the WorkforceSummary row of its (department,
+position, joining year, termination year). When users are created, changed
+or deleted, apply_changes() receives the users before and after the change,
+subtracts and adds their counts and writes one update per affected row. The
+signals in users.signals call it for single saves and deletes; paths writing
+with bulk_create, bulk_update or update() call it themselves.
+
+The dashboard figures are derived from the summary rows at read time, so
+tenure, which moves with the calendar, never needs a write.
+"""
+
+import datetime
+from collections import Counter
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import CustomUser, WorkforceSummary
+
+# The user fields the summary depends on
+FIELDS = ('department', 'position', 'joining_date', 'termination_date')
+
+# The columns of a summary row
+GROUP = ('department', 'position', 'joined_year', 'terminated_year')
+
+
+def _year(value):
+    # joining_date has a string default, so a user created without one holds a string until it is reloaded
+    if value is None:
+        return 0
+    return datetime.date.fromisoformat(value).year if isinstance(value, str) else value.year
+
+
+def group(department, position, joining_date, termination_date):
+    """
+    Computes the summary row a user counts in.
+
+    Returns:
+        tuple: (department, position, joined_year, terminated_year), terminated_year being 0 without termination.
+    """
+    return department, position, _year(joining_date), _year(termination_date)
+
+
+def snapshot(user):
+    """
+    Captures the fields of a user that the summary depends on.
+
+    Args:
+        user (CustomUser): The user.
+
+    Returns:
+        tuple: The fields in FIELDS order.
+    """
+    return tuple(getattr(user, name) for name in FIELDS)
+
+
+def _as_snapshot(user):
+    return user if isinstance(user, tuple) else snapshot(user)
+
+
+def apply_changes(removed=(), added=()):
+    """
+    Updates the summary for users that were removed and/or added.
+
+    An updated user is passed both as removed (its snapshot from before the
+    change) and as added. Should be called in the same transaction as the change.
+
+    Args:
+        removed (iterable): Snapshots or instances of users as they were before the change.
+        added (iterable): Snapshots or instances of users as they are after the change.
+    """
+    deltas = Counter()
+    for sign, users in ((-1, removed), (1, added)):
+        for user in users:
+            deltas[group(*_as_snapshot(user))] += sign
+
+    for key, delta in deltas.items():
+        if not delta:
+            continue
+        row = WorkforceSummary.objects.filter(**dict(zip(GROUP, key)))
+        if row.update(employees=F('employees') + delta):
+            continue
+        try:
+            with transaction.atomic():
+                WorkforceSummary.objects.create(**dict(zip(GROUP, key)), employees=delta)
+        except IntegrityError:
+            # Created concurrently by another request
+            row.update(employees=F('employees') + delta)
+
+
+def rebuild_summary(chunk_size=None):
+    """
+    Recomputes the workforce summary from all users in one streaming pass.
+
+    Only the counters, one per summary row, are held in memory.
+
+    Args:
+        chunk_size (int, optional): Users fetched per chunk (default: WORKFORCE_SUMMARY_CHUNK_SIZE).
+
+    Returns:
+        int: The number of summary rows written.
+    """
+    chunk_size = chunk_size or settings.WORKFORCE_SUMMARY_CHUNK_SIZE
+    counts = Counter(group(*row) for row in CustomUser.objects.values_list(*FIELDS).iterator(chunk_size=chunk_size))
+    with transaction.atomic():
+        WorkforceSummary.objects.all().delete()
+        WorkforceSummary.objects.bulk_create(
+            [WorkforceSummary(**dict(zip(GROUP, key)), employees=count) for key, count in counts.items() if count],
+            batch_size=chunk_size)
+    return len(counts)
+
+
+def tenure_label(low, high):
+    return f'{low}-{high}' if high is not None else f'{low}+'
+
+
+def workforce_analytics(department=None, today=None):
+    """
+    Computes the dashboard figures from the summary rows, with one query.
+
+    Users with a termination date no longer count in the headcount and tenure.
+    Tenure is counted in whole calendar years since the joining year.
+
+    Args:
+        department (str, optional): Restricts the figures to one department.
+        today (date, optional): The date tenure is measured at (default: today).
+
+    Returns:
+        dict: 'headcount'; 'departments', the headcount per department and position;
+              'tenure', the headcount per tenure bucket (settings.USER_TENURE_BUCKETS);
+              'years', the hires, terminations, headcount at the start of the year and
+              termination rate of every year with hires or terminations.
+    """
+    today = today or timezone.localdate()
+    rows = WorkforceSummary.objects.filter(employees__gt=0)
+    if department is not None:
+        rows = rows.filter(department=department)
+    rows = list(rows.values_list(*GROUP, 'employees'))
+
+    positions = {}
+    joined = Counter()
+    hires = Counter()
+    terminations = Counter()
+    for department_name, position, joined_year, terminated_year, employees in rows:
+        hires[joined_year] += employees
+        if terminated_year:
+            terminations[terminated_year] += employees
+            continue
+        department_positions = positions.setdefault(department_name, Counter())
+        department_positions[position] += employees
+        joined[joined_year] += employees
+
+    edges = (0, *settings.USER_TENURE_BUCKETS)
+    tenure = Counter()
+    for joined_year, employees in joined.items():
+        years = max(today.year - joined_year, 0)
+        low = max(edge for edge in edges if edge <= years)
+        tenure[low] += employees
+
+    years = []
+    for year in sorted(hires.keys() | terminations.keys()):
+        start = sum(employees for _, _, joined_year, terminated_year, employees in rows
+                    if joined_year < year and not (terminated_year and terminated_year < year))
+        years.append({
+            'year': year,
+            'hires': hires[year],
+            'terminations': terminations[year],
+            'headcount_start': start,
+            'termination_rate': round(terminations[year] / start, 4) if start else None,
+        })
+
+    return {
+        'headcount': sum(joined.values()),
+        'departments': [{'department': name, 'headcount': sum(counts.values()),
+                         'positions': dict(sorted(counts.items()))} for name, counts in sorted(positions.items())],
+        'tenure': [{'years': tenure_label(low, high), 'employees': tenure[low]}
+                   for low, high in zip(edges, (*edges[1:], None))],
+        'years': years,
+    }
@@ -0,0 +1,339 @@
+"""
+Materialized org hierarchy over CustomUser.manager.
+
+Every user stores the ids of their management chain, root first and
+themselves last, in 'org_path' (for example '/1/5/23/'). The transitive
+reports of a user are then the users whose path starts with theirs, and the
+management chain can be read straight from the path, so both take a single
+query whatever the depth of the org chart.
+
+Users caught in a manager cycle, and everyone reporting to them, have no
+path to a root; their org_path is empty (PENDING) until the cycle is broken.
+The hierarchy writes give them a path again as soon as their chain reaches
+a root, and never treat the empty path as a prefix.
+"""
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from changes import feed
+from .models import CustomUser
+
+# The org path of the users whose management chain does not reach a root
+PENDING = ''
+
+
+class HierarchyCycleError(ValueError):
+    """
+    Raised when a manager assignment would make a user report to themselves.
+
+    Attributes:
+        user_ids (list): The ids of the users forming the cycle.
+    """
+
+    def __init__(self, user_ids):
+        self.user_ids = sorted(user_ids)
+        super().__init__(f'Manager assignment forms a cycle involving users {self.user_ids}')
+
+
+def path_ids(path):
+    """
+    Returns the user ids stored in an org path, root first.
+    """
+    return [int(part) for part in path.strip('/').split('/') if part]
+
+
+def child_path(manager_path, user_id):
+    """
+    Returns the org path of a user reporting to a manager with the given path; '/' for roots.
+    """
+    return f'{manager_path}{user_id}/' if manager_path != PENDING else PENDING
+
+
+def _walk(pairs, manager_paths):
+    """
+    Computes the org paths reachable from the roots; see compute_paths().
+
+    Returns:
+        tuple: {user_id: org_path} for the reachable users, and the set of all user ids.
+    """
+    reports = {}
+    user_ids = set()
+    for user_id, manager_id in pairs:
+        user_ids.add(user_id)
+        reports.setdefault(manager_id, []).append(user_id)
+
+    paths = {}
+    stack = [(user_id, '/') for user_id in reports.get(None, [])]
+    # Users whose manager is not among the pairs hang below that manager's known path, or are roots
+    stack += [(user_id, manager_paths.get(manager_id, '/')) for manager_id, ids in reports.items()
+              if manager_id is not None and manager_id not in user_ids for user_id in ids]
+    while stack:
+        user_id, parent_path = stack.pop()
+        paths[user_id] = child_path(parent_path, user_id)
+        stack.extend((report_id, paths[user_id]) for report_id in reports.get(user_id, []))
+    return paths, user_ids
+
+
+def compute_paths(pairs, manager_paths=None):
+    """
+    Computes the org path of every user from (id, manager_id) pairs.
+
+    Args:
+        pairs (iterable): (user_id, manager_id) tuples; manager_id is None for roots.
+        manager_paths (dict, optional): The org paths of managers outside the pairs; users whose
+            manager is neither in the pairs nor here are roots, and users below a manager whose
+            path is PENDING get PENDING too.
+
+    Returns:
+        dict: {user_id: org_path}.
+
+    Raises:
+        HierarchyCycleError: If some users are not reachable from a root because of a cycle.
+    """
+    paths, user_ids = _walk(pairs, manager_paths or {})
+    if len(paths) != len(user_ids):
+        raise HierarchyCycleError(user_ids - paths.keys())
+    return paths
+
+
+def rebuild_hierarchy():
+    """
+    Recomputes the org path of every user.
+
+    Returns:
+        int: The number of users whose path changed.
+
+    Raises:
+        HierarchyCycleError: If the manager assignments contain a cycle; nothing is written then.
+    """
+    paths = compute_paths(CustomUser.objects.values_list('pk', 'manager_id').iterator())
+    now = timezone.now()
+    changed = [CustomUser(pk=user_id, org_path=paths[user_id], updated_at=now)
+               for user_id, org_path in CustomUser.objects.values_list('pk', 'org_path').iterator()
+               if paths[user_id] != org_path]
+    with transaction.atomic():
+        CustomUser.objects.bulk_update(changed, ['org_path', 'updated_at'], batch_size=settings.ORG_HIERARCHY_BATCH_SIZE)
+        feed.record(feed.USERS, [user.pk for user in changed])
+    return len(changed)
+
+
+def recompute_subtrees(old_paths, moved_ids=()):
+    """
+    Recomputes the org paths below a set of users after a batch of manager changes or deletions.
+
+    Only the users whose path starts with one of old_paths are read and rewritten,
+    along with the paths of their managers outside that set. When one of the users
+    had no path (PENDING), the paths of all pending users are recomputed too, as the
+    change may have broken their cycle.
+
+    Args:
+        old_paths (iterable): The org paths the moved or deleted users had; their manager
+            changes and deletions must already be saved.
+        moved_ids (iterable): The users whose manager changed.
+
+    Returns:
+        int: The number of users whose path changed.
+
+    Raises:
+        HierarchyCycleError: If the manager changes form a cycle; the caller's transaction should be rolled back.
+    """
+    old_paths = set(old_paths)
+    prefixes = sorted(old_paths - {PENDING})
+    # A path below another one of the set is covered by it
+    prefixes = [path for index, path in enumerate(prefixes)
+                if not any(path.startswith(other) for other in prefixes[:index])]
+    changed = 0
+    if prefixes:
+        condition = Q()
+        for path in prefixes:
+            condition |= Q(org_path__startswith=path)
+        rows = list(CustomUser.objects.filter(condition).values_list('pk', 'manager_id', 'org_path'))
+        affected = {user_id for user_id, _, _ in rows}
+        outside = {manager_id for _, manager_id, _ in rows if manager_id is not None and manager_id not in affected}
+        manager_paths = dict(CustomUser.objects.filter(pk__in=outside).values_list('pk', 'org_path')) if outside else {}
+
+        paths = compute_paths(((user_id, manager_id) for user_id, manager_id, _ in rows), manager_paths)
+        changed = _write_paths((user_id, paths[user_id]) for user_id, _, org_path in rows if paths[user_id] != org_path)
+    if PENDING in old_paths:
+        changed += repair_pending(moved_ids)
+    return changed
+
+
+def repair_pending(moved_ids=()):
+    """
+    Gives an org path back to the pending users whose management chain reaches a root again.
+
+    Args:
+        moved_ids (iterable): The users whose manager just changed; they must not be part of a cycle.
+
+    Returns:
+        int: The number of users whose path changed.
+
+    Raises:
+        HierarchyCycleError: If one of moved_ids is part of a cycle.
+    """
+    managers = dict(CustomUser.objects.filter(org_path=PENDING).values_list('pk', 'manager_id'))
+    for user_id in moved_ids:
+        cycle = _cycle(user_id, managers)
+        if cycle:
+            raise HierarchyCycleError(cycle)
+    if not managers:
+        return 0
+    outside = {manager_id for manager_id in managers.values() if manager_id is not None and manager_id not in managers}
+    manager_paths = dict(CustomUser.objects.filter(pk__in=outside).values_list('pk', 'org_path')) if outside else {}
+    # Users still in a cycle, or below one, are not reached and stay pending
+    paths, _ = _walk(managers.items(), manager_paths)
+    return _write_paths((user_id, path) for user_id, path in paths.items() if path != PENDING)
+
+
+def _cycle(user_id, managers):
+    """
+    Returns the users of the cycle through user_id, following the {user_id: manager_id} links, or [].
+    """
+    chain = []
+    current = user_id
+    while current in managers and current not in chain:
+        chain.append(current)
+        current = managers[current]
+    return chain if current == user_id else []
+
+
+def _write_paths(paths):
+    now = timezone.now()
+    changed = [CustomUser(pk=user_id, org_path=path, updated_at=now) for user_id, path in paths]
+    CustomUser.objects.bulk_update(changed, ['org_path', 'updated_at'], batch_size=settings.ORG_HIERARCHY_BATCH_SIZE)
+    feed.record(feed.USERS, [user.pk for user in changed])
+    return len(changed)
+
+
+def lock_for_move(user_id, manager_id):
+    """
+    Locks a user and the management chain of their new manager, and reads them.
+
+    Two concurrent manager changes can only form a cycle if each moved user is in
+    the chain of the other one's new manager, so the two transactions lock a
+    common row and the second one sees the first one's change.
+    Should be called in a transaction.
+
+    Args:
+        user_id (int): The user whose manager changes.
+        manager_id (int): The new manager.
+
+    Returns:
+        tuple: The user and the manager, as locked.
+    """
+    while True:
+        manager_path = CustomUser.objects.values_list('org_path', flat=True).get(pk=manager_id)
+        ids = {user_id, manager_id, *path_ids(manager_path)}
+        rows = {row.pk: row for row in CustomUser.objects.select_for_update().filter(pk__in=ids).order_by('pk')}
+        # The chain may have changed before the rows were locked
+        if set(path_ids(rows[manager_id].org_path)) <= ids:
+            return rows[user_id], rows[manager_id]
+
+
+def check_manager(user, manager):
+    """
+    Checks that the user may report to the given manager.
+
+    Args:
+        user (CustomUser): The user being updated.
+        manager (CustomUser): The new manager, or None.
+
+    Raises:
+        HierarchyCycleError: If the manager is the user or one of their transitive reports.
+    """
+    if manager is None:
+        return
+    if manager.pk == user.pk:
+        raise HierarchyCycleError([user.pk])
+    if user.org_path != PENDING and manager.org_path.startswith(user.org_path):
+        raise HierarchyCycleError(path_ids(manager.org_path[len(user.org_path) - len(f'{user.pk}/'):]))
+    if user.org_path == PENDING and manager.org_path == PENDING:
+        # Neither has a path; the manager's chain is followed through the other pending users
+        managers = dict(CustomUser.objects.filter(org_path=PENDING).values_list('pk', 'manager_id'))
+        managers[user.pk] = manager.pk
+        cycle = _cycle(user.pk, managers)
+        if cycle:
+            raise HierarchyCycleError(cycle)
+
+
+def _replace_prefix(old_prefix, new_prefix):
+    """
+    Rewrites the org path of every user whose path starts with old_prefix.
+    """
+    if old_prefix == PENDING:
+        raise ValueError('The empty org path is not the prefix of a subtree')
+    now = timezone.now()
+    moved = [CustomUser(pk=user_id, org_path=new_prefix + org_path[len(old_prefix):], updated_at=now)
+             for user_id, org_path in CustomUser.objects.filter(org_path__startswith=old_prefix)
+             .values_list('pk', 'org_path').iterator()]
+    CustomUser.objects.bulk_update(moved, ['org_path', 'updated_at'], batch_size=settings.ORG_HIERARCHY_BATCH_SIZE)
+    feed.record(feed.USERS, [user.pk for user in moved])
+
+
+def assign_path(user):
+    """
+    Sets the org path of a newly created user from their manager.
+
+    Args:
+        user (CustomUser): The saved user.
+    """
+    # The stored path, as the manager instance may predate a change of their own manager
+    manager_path = (CustomUser.objects.values_list('org_path', flat=True).get(pk=user.manager_id)
+                    if user.manager_id else '/')
+    user.org_path = child_path(manager_path, user.pk)
+    CustomUser.objects.filter(pk=user.pk).update(org_path=user.org_path)
+
+
+def move_subtree(user):
+    """
+    Updates the org paths of a user and all their reports after a manager change.
+
+    Args:
+        user (CustomUser): The saved user, with org_path still holding the old path.
+    """
+    old_path = user.org_path
+    manager_path = user.manager.org_path if user.manager_id else '/'
+    if PENDING in (old_path, manager_path):
+        recompute_subtrees([old_path], [user.pk])
+        user.org_path = CustomUser.objects.values_list('org_path', flat=True).get(pk=user.pk)
+        return
+    user.org_path = f'{manager_path}{user.pk}/'
+    if user.org_path != old_path:
+        _replace_prefix(old_path, user.org_path)
+
+
+def detach_subtree(old_path):
+    """
+    Turns the direct reports of a deleted user into roots, along with their subtrees.
+
+    Args:
+        old_path (str): The org path the deleted user had.
+    """
+    if old_path == PENDING:
+        # The deleted user may have been part of a cycle, which is now broken
+        repair_pending()
+    else:
+        _replace_prefix(old_path, '/')
+
+
+def subtree_sizes(rows, root_path):
+    """
+    Counts the transitive reports of every user in a subtree.
+
+    Args:
+        rows (list): Dicts with 'id' and 'org_path' for every user below the root.
+        root_path (str): The org path of the root of the subtree.
+
+    Returns:
+        dict: {user_id: number of transitive reports}.
+    """
+    sizes = {row['id']: 0 for row in rows}
+    for row in rows:
+        # Every user counts towards each of their managers inside the subtree
+        for manager_id in path_ids(row['org_path'][len(root_path):])[:-1]:
+            sizes[manager_id] += 1
+    return sizes
@@ -0,0 +1,216 @@
+"""
+Bulk user import, e.g. for onboarding a whole office at once.
+
+The import validates every row without touching the database, then looks up
+the usernames of the rows and of the managers they reference with a single
+query. Passwords are hashed in a process pool, as hashing is deliberately
+CPU-bound. The users are inserted with bulk_create; a second pass sets the
+managers that are rows of the same import and the org path of every new user.
+The API hashes in its own process (workers=1), as a pool per request would
+fork the server; the management command uses the pool.
+
+Files too large for one transaction are imported in batches, in the order
+given by manager_order(), so that the row of a manager is always imported in
+the same batch as its reports or in an earlier one.
+"""
+
+import csv
+import io
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import Q
+
+from AttendanceAndAccountsApp.cache import invalidate
+from changes import feed
+from . import analytics
+from .hierarchy import HierarchyCycleError, child_path, compute_paths
+from .models import CustomUser
+from .serializers import UserImportSerializer
+
+
+def read_csv(text):
+    """
+    Reads import rows from CSV text with a header row; empty cells are left out.
+
+    Args:
+        text (str): The CSV document.
+
+    Returns:
+        list: One dict per row.
+    """
+    return [{key: value for key, value in row.items() if key and value not in ('', None)}
+            for row in csv.DictReader(io.StringIO(text))]
+
+
+def hash_passwords(passwords):
+    return [make_password(password) for password in passwords]
+
+
+def hash_all(passwords, workers=None):
+    """
+    Hashes passwords, spread over a pool of processes.
+
+    Args:
+        passwords (list): The raw passwords; None gives an unusable password.
+        workers (int, optional): The size of the process pool; 1 hashes in-process.
+
+    Returns:
+        list: The hashes, in the order of the passwords.
+    """
+    workers = min(workers or settings.USER_IMPORT_WORKERS, len(passwords))
+    if workers <= 1:
+        return hash_passwords(passwords)
+    size = -(-len(passwords) // workers)
+    chunks = [passwords[start:start + size] for start in range(0, len(passwords), size)]
+    # Workers never touch the database, so the caller's connection stays usable
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return [password for chunk in pool.map(hash_passwords, chunks) for password in chunk]
+
+
+def manager_order(rows):
+    """
+    Orders import rows so that the rows of managers come before the rows of their reports.
+
+    Rows keep their relative order otherwise; rows whose manager is not a row of
+    the file come first. A manager_username naming several rows refers to the first one.
+
+    Args:
+        rows (list): The rows of the file, as read by read_csv() or from JSON.
+
+    Returns:
+        list: The indexes of the rows, managers first.
+    """
+    def field(row, name):
+        value = row.get(name) if isinstance(row, dict) else None
+        return value if isinstance(value, str) else None
+
+    row_indexes = {}
+    for index, row in enumerate(rows):
+        if field(row, 'username') is not None:
+            row_indexes.setdefault(field(row, 'username'), index)
+
+    # depths[index]: the number of rows of the file above the row in its management chain
+    depths = {}
+    for index in range(len(rows)):
+        chain, seen = [], set()
+        current = index
+        while current is not None and current not in depths and current not in seen:
+            chain.append(current)
+            seen.add(current)
+            current = row_indexes.get(field(rows[current], 'manager_username'))
+        # A chain ending in a cycle gets any order; import_users() rejects its rows
+        base = depths.get(current, 0) if current is not None else -1
+        for offset, member in enumerate(reversed(chain), 1):
+            depths[member] = base + offset
+    return sorted(range(len(rows)), key=depths.__getitem__)
+
+
+def import_users(rows, workers=None):
+    """
+    Validates and creates a batch of users.
+
+    Args:
+        rows (list): The users to create, as dicts of UserImportSerializer fields.
+        workers (int, optional): The number of processes hashing passwords.
+
+    Returns:
+        dict: Counts and a status ('created', 'duplicate' or 'invalid') for each row, in order.
+
+    Raises:
+        IntegrityError: If some of the users were created concurrently; nothing is created then.
+    """
+    results = [None] * len(rows)
+    valid = {}
+    for index, row in enumerate(rows):
+        item = UserImportSerializer(data=row)
+        if item.is_valid():
+            valid[index] = dict(item.validated_data)
+        else:
+            results[index] = {'index': index, 'status': 'invalid', 'errors': item.errors}
+
+    # Existing users among the rows and their managers, found with one query
+    usernames = {data['username'] for data in valid.values()}
+    manager_usernames = {data['manager_username'] for data in valid.values() if data.get('manager_username')}
+    manager_ids = {data['manager_id'] for data in valid.values() if data.get('manager_id') is not None}
+    existing = list(CustomUser.objects.filter(Q(username__in=usernames | manager_usernames) | Q(pk__in=manager_ids))
+                    .values_list('pk', 'username', 'org_path'))
+    existing_ids = {username: pk for pk, username, _ in existing}
+    existing_paths = {pk: org_path for pk, _, org_path in existing}
+
+    def reject(index, errors):
+        results[index] = {'index': index, 'status': 'invalid', 'errors': errors}
+
+    # Rows to create by username; a manager_username that is not an existing user refers to a row
+    new = {}
+    for index, data in valid.items():
+        username = data['username']
+        if username in existing_ids or username in new:
+            results[index] = {'index': index, 'status': 'duplicate'}
+            continue
+        manager_username = data.pop('manager_username', None)
+        if manager_username in existing_ids:
+            data['manager_id'] = existing_ids[manager_username]
+        elif data.get('manager_id') is not None and data['manager_id'] not in existing_paths:
+            reject(index, {'manager': [f'Invalid pk "{data["manager_id"]}" - object does not exist.']})
+            continue
+        new[username] = (index, data, manager_username if manager_username not in existing_ids else None)
+
+    # Drop rows whose manager row is missing or was dropped, and rows forming manager cycles
+    while True:
+        missing = [username for username, (_, _, manager) in new.items() if manager is not None and manager not in new]
+        if not missing:
+            break
+        for username in missing:
+            index, data, manager = new.pop(username)
+            reject(index, {'manager_username': [f'No user or row with username "{manager}".']})
+    try:
+        depths = compute_paths((username, manager) for username, (_, _, manager) in new.items())
+    except HierarchyCycleError as e:
+        for username in e.user_ids:
+            reject(new.pop(username)[0], {'manager_username': [str(e)]})
+        depths = compute_paths((username, manager) for username, (_, _, manager) in new.items())
+
+    passwords = hash_all([data.get('password') for _, data, _ in new.values()], workers)
+    users = {}
+    for (username, (_, data, _)), password in zip(new.items(), passwords):
+        users[username] = CustomUser(**{**data, 'password': password})
+
+    with transaction.atomic():
+        CustomUser.objects.bulk_create(users.values(), batch_size=settings.USER_IMPORT_BATCH_SIZE)
+        if any(user.pk is None for user in users.values()):
+            # The backend does not return primary keys from bulk inserts
+            ids = dict(CustomUser.objects.filter(username__in=users.keys()).values_list('username', 'pk'))
+            for username, user in users.items():
+                user.pk = ids[username]
+
+        # Second pass: managers within the import, and org paths, managers first
+        for username in sorted(users, key=lambda username: depths[username].count('/')):
+            user = users[username]
+            manager = new[username][2]
+            if manager is not None:
+                user.manager_id = users[manager].pk
+                manager_path = users[manager].org_path
+            else:
+                manager_path = existing_paths.get(user.manager_id, '/')
+            # Reports of a manager caught in a cycle have no path until it is broken
+            user.org_path = child_path(manager_path, user.pk)
+        CustomUser.objects.bulk_update(users.values(), ['manager', 'org_path'],
+                                       batch_size=settings.USER_IMPORT_BATCH_SIZE)
+        feed.record(feed.USERS, [user.pk for user in users.values()])
+        # bulk_create sends no post_save, so the workforce summary is updated here
+        analytics.apply_changes(added=users.values())
+        invalidate('users')
+
+    for username, user in users.items():
+        index = new[username][0]
+        results[index] = {'index': index, 'status': 'created', 'id': user.pk}
+
+    return {
+        'created': len(users),
+        'duplicate': sum(1 for result in results if result['status'] == 'duplicate'),
+        'invalid': sum(1 for result in results if result['status'] == 'invalid'),
+        'results': results,
+    }
@@ -0,0 +1,95 @@
+from django.apps import apps
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connections, transaction
+
+from AttendanceAndAccountsApp.cache import invalidate
+
+# The models copied, in an order where foreign keys point to models copied before
+MODELS = (
+    'users.CustomUser',
+    'users.WorkforceSummary',
+    'attendance.Attendance',
+    'attendance.AttendanceArchive',
+    'attendance.AttendanceRollup',
+    'accounts.Accounts',
+    'accounts.PayRate',
+    'changes.Change',
+)
+
+
+class Command(BaseCommand):
+    """
+    Management command copying the data of the three apps from one database to another,
+    e.g. from MongoDB (djongo) to PostgreSQL.
+
+    Rows keep their primary keys and their updated_at times. The target is migrated
+    first and must not hold any of the copied rows yet; everything is copied in one
+    transaction of the target, and the sequences of the target are reset afterwards.
+    Groups and permissions of the users are not copied.
+
+    Example:
+        TARGET_DATABASE_ENGINE=postgres TARGET_DATABASE_NAME=employees python manage.py copy_database
+    """
+
+    help = 'Copies users, attendance, accounts and the change feed into another configured database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', default='default', help='The database alias to copy from (default: default).')
+        parser.add_argument('--target', default='target', help='The database alias to copy into (default: target).')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Rows read and inserted per batch.')
+
+    def handle(self, *args, **options):
+        source, target, batch_size = options['source'], options['target'], options['batch_size']
+        for alias in (source, target):
+            if alias not in connections.databases:
+                raise CommandError(f'No database {alias!r}; set TARGET_DATABASE_ENGINE and TARGET_DATABASE_* '
+                                   f'to configure the target')
+        if source == target:
+            raise CommandError('The source and target databases must differ')
+
+        call_command('migrate', database=target, verbosity=0)
+        models = [apps.get_model(label) for label in MODELS]
+        for model in models:
+            if model._base_manager.using(target).exists():
+                raise CommandError(f'The target database already holds {model._meta.verbose_name_plural}')
+
+        connection = connections[target]
+        with transaction.atomic(using=target):
+            for model in models:
+                copied = self.copy(model, source, target, batch_size)
+                self.stdout.write(f'Copied {copied} {model._meta.verbose_name_plural}')
+            # Rows were inserted with their primary keys, so new rows must continue after them
+            with connection.cursor() as cursor:
+                for statement in connection.ops.sequence_reset_sql(no_style(), models):
+                    cursor.execute(statement)
+
+        for model in models:
+            expected = model._base_manager.using(source).count()
+            found = model._base_manager.using(target).count()
+            if expected != found:
+                raise CommandError(f'{model._meta.verbose_name_plural}: {expected} rows in {source}, {found} in {target}')
+        # Responses cached before the copy must not be served once the servers read the copied data
+        invalidate('users', 'attendance', 'accounts')
+        self.stdout.write(self.style.SUCCESS(f'Copied {", ".join(MODELS)} from {source} to {target}'))
+
+    def copy(self, model, source, target, batch_size):
+        fields = model._meta.local_concrete_fields
+        manager = model._base_manager.using(target)
+        ops = connections[target].ops
+        copied = 0
+        batch = []
+        for obj in model._base_manager.using(source).order_by('pk').iterator(chunk_size=batch_size):
+            batch.append(obj)
+            if len(batch) == batch_size:
+                copied += self.insert(manager, ops, fields, batch, target)
+                batch = []
+        return copied + self.insert(manager, ops, fields, batch, target)
+
+    def insert(self, manager, ops, fields, batch, target):
+        # A raw insert writes the values as they are, instead of stamping auto_now fields with the current time
+        size = max(ops.bulk_batch_size(fields, batch), 1)
+        for start in range(0, len(batch), size):
+            manager._insert(batch[start:start + size], fields=fields, raw=True, using=target)
+        return len(batch)
@@ -0,0 +1,47 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from users.importer import import_users, manager_order, read_csv
+
+
+class Command(BaseCommand):
+    """
+    Management command creating users from a CSV or JSON file.
+
+    Example:
+        python manage.py import_users new_office.csv --workers 8
+    """
+
+    help = 'Creates users in bulk from a CSV file with a header row or a JSON list.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='The .csv or .json file to import.')
+        parser.add_argument('--workers', type=int, help='Processes hashing passwords (default: USER_IMPORT_WORKERS).')
+        parser.add_argument('--chunk-size', type=int, default=settings.USER_IMPORT_MAX_ROWS,
+                            help='Rows imported per transaction (default: USER_IMPORT_MAX_ROWS).')
+
+    def handle(self, *args, **options):
+        with open(options['path'], encoding='utf-8-sig') as f:
+            text = f.read()
+        try:
+            rows = json.loads(text) if options['path'].endswith('.json') else read_csv(text)
+        except ValueError as e:
+            raise CommandError(f'Cannot read {options["path"]}: {e}')
+        if not isinstance(rows, list):
+            raise CommandError('Expected a list of users')
+
+        # Managers are imported before their reports, so a manager_username may name a row of any chunk
+        order = manager_order(rows)
+        chunk_size = options['chunk_size']
+        for start in range(0, len(rows), chunk_size):
+            indexes = order[start:start + chunk_size]
+            summary = import_users([rows[index] for index in indexes], workers=options['workers'])
+            for result in summary['results']:
+                if result['status'] != 'created':
+                    self.stdout.write(self.style.WARNING(
+                        f"Row {indexes[result['index']] + 1}: {result['status']} {result.get('errors', '')}".rstrip()))
+            self.stdout.write(self.style.SUCCESS(
+                f"Batch {start // chunk_size + 1} ({len(indexes)} rows): {summary['created']} created, "
+                f"{summary['duplicate']} duplicate, {summary['invalid']} invalid"))
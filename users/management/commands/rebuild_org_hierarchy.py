@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from AttendanceAndAccountsApp.cache import invalidate
+from users.hierarchy import HierarchyCycleError, rebuild_hierarchy
+
+
+class Command(BaseCommand):
+    """
+    Management command recomputing the materialized org hierarchy from CustomUser.manager.
+
+    Example:
+        python manage.py rebuild_org_hierarchy
+    """
+
+    help = 'Recomputes the org path of every user and reports manager cycles.'
+
+    def handle(self, *args, **options):
+        try:
+            changed = rebuild_hierarchy()
+        except HierarchyCycleError as e:
+            raise CommandError(str(e))
+        invalidate('users')
+        self.stdout.write(self.style.SUCCESS(f'Updated the org path of {changed} users'))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from users.analytics import rebuild_summary
+
+
+class Command(BaseCommand):
+    """
+    Management command recomputing the workforce summary behind the analytics endpoint from scratch.
+
+    Example:
+        python manage.py rebuild_workforce_summary --chunk-size 5000
+    """
+
+    help = 'Recomputes the headcount summary rows from all users.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int,
+                            help='Users fetched per chunk (default: WORKFORCE_SUMMARY_CHUNK_SIZE).')
+
+    def handle(self, *args, **options):
+        written = rebuild_summary(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} workforce summary rows'))
@@ -0,0 +1,47 @@
+# Generated by Django 4.1.13 on 2026-10-18 10:07
+
+from django.db import migrations, models
+
+
+def build_org_paths(apps, schema_editor):
+    """
+    Computes the org path of every existing user, a copy of users.hierarchy.compute_paths()
+    at the time of this migration.
+
+    Users caught in a management cycle are not reachable from a root and keep an
+    empty path; the rebuild_org_hierarchy command reports them.
+    """
+    CustomUser = apps.get_model('users', 'CustomUser')
+    reports = {}
+    user_ids = set()
+    for user_id, manager_id in CustomUser.objects.values_list('pk', 'manager_id'):
+        user_ids.add(user_id)
+        reports.setdefault(manager_id, []).append(user_id)
+
+    paths = {}
+    stack = [(user_id, '/') for user_id in reports.get(None, [])]
+    stack += [(user_id, '/') for manager_id, ids in reports.items()
+              if manager_id is not None and manager_id not in user_ids for user_id in ids]
+    while stack:
+        user_id, parent_path = stack.pop()
+        paths[user_id] = f'{parent_path}{user_id}/'
+        stack.extend((report_id, paths[user_id]) for report_id in reports.get(user_id, []))
+
+    for user_id, org_path in paths.items():
+        CustomUser.objects.filter(pk=user_id).update(org_path=org_path)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_alter_customuser_date_of_birth'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='org_path',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=1000),
+        ),
+        migrations.RunPython(build_org_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.1.13 on 2026-10-18 10:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_customuser_org_path'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['department', 'position'], name='user_department_position_idx'),
+        ),
+    ]
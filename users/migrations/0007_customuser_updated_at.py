@@ -0,0 +1,18 @@
+# Generated by Django 4.1.13 on 2026-10-18 10:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_customuser_department_position_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.1.13 on 2026-10-18 10:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_customuser_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkforceSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('department', models.CharField(max_length=50)),
+                ('position', models.CharField(max_length=50)),
+                ('joined_year', models.IntegerField()),
+                ('terminated_year', models.IntegerField(default=0)),
+                ('employees', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='workforcesummary',
+            constraint=models.UniqueConstraint(fields=('department', 'position', 'joined_year', 'terminated_year'), name='unique_workforce_summary_group'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.1.13 on 2026-10-18 11:02
+
+from collections import Counter
+
+from django.db import migrations
+
+BATCH_SIZE = 2000
+
+
+def seed_summary(apps, schema_editor):
+    """
+    Counts the existing users into the workforce summary, in one streaming pass.
+    """
+    CustomUser = apps.get_model('users', 'CustomUser')
+    WorkforceSummary = apps.get_model('users', 'WorkforceSummary')
+    counts = Counter(
+        (department, position, joining_date.year, termination_date.year if termination_date else 0)
+        for department, position, joining_date, termination_date in CustomUser.objects
+        .values_list('department', 'position', 'joining_date', 'termination_date').iterator(chunk_size=BATCH_SIZE))
+    WorkforceSummary.objects.bulk_create(
+        [WorkforceSummary(department=department, position=position, joined_year=joined_year,
+                          terminated_year=terminated_year, employees=employees)
+         for (department, position, joined_year, terminated_year), employees in counts.items()],
+        batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_workforcesummary'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_summary, migrations.RunPython.noop),
+    ]
@@ -16,6 +16,9 @@ class CustomUser(AbstractUser):
         joining_date (Date): The date when the user joined the organization.
         termination_date (Date, optional): The date when the user was terminated (if applicable).
         skills_expertise (str, optional): Any skills or expertise the user possesses.
+        org_path (str): The materialized management chain of the user, e.g. '/1/5/23/' for user 23
+                        reporting to 5 who reports to 1. Maintained by users.hierarchy.
+        updated_at (DateTime): The time the user was last created or changed.
 
     Methods:
         __str__(): Returns a string representation of the user, using the username.
@@ -34,6 +37,8 @@ class CustomUser(AbstractUser):
     joining_date = models.DateField(default='2005-03-15')
     termination_date = models.DateField(blank=True, null=True)
     skills_expertise = models.TextField(blank=True)
+    org_path = models.CharField(max_length=1000, blank=True, default='', db_index=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         """
@@ -50,5 +55,60 @@ class CustomUser(AbstractUser):
 
         Attributes:
             app_label (str): Specifies the app label for the user model (used for Django app configuration).
+            indexes (list): Supports filtering users by department and position.
         """
         app_label = 'users'
+        indexes = [
+            models.Index(fields=['department', 'position'], name='user_department_position_idx'),
+        ]
+
+
+class WorkforceSummary(models.Model):
+    """
+    Model counting the users that share a department, position, joining year and termination year.
+
+    The HR analytics endpoint reads these rows instead of the users, so its cost
+    depends on the number of departments and years, not on the headcount. Rows are
+    kept up to date by signals on CustomUser and by the bulk write paths (see
+    users.analytics), and can be rebuilt with the 'rebuild_workforce_summary'
+    management command.
+
+    Attributes:
+        department (str): The department of the users.
+        position (str): The position of the users.
+        joined_year (int): The year of their joining date.
+        terminated_year (int): The year of their termination date, 0 if they have none.
+        employees (int): The number of users.
+
+    Meta:
+        app_label (str): Specifies the app label for the summary model (used for Django app configuration).
+    """
+
+    department = models.CharField(max_length=50)
+    position = models.CharField(max_length=50)
+    joined_year = models.IntegerField()
+    terminated_year = models.IntegerField(default=0)
+    employees = models.IntegerField(default=0)
+
+    def __str__(self):
+        """
+        Returns a string representation of the summary row.
+
+        Returns:
+            str: A formatted string with the department, position, years and count.
+        """
+        return f"{self.department} / {self.position} - {self.joined_year}-{self.terminated_year or ''}: {self.employees}"
+
+    class Meta:
+        """
+        Meta class for WorkforceSummary.
+
+        Attributes:
+            app_label (str): Specifies the app label for the summary model.
+            constraints (list): Allows a single row per department, position, joining year and termination year.
+        """
+        app_label = 'users'
+        constraints = [
+            models.UniqueConstraint(fields=['department', 'position', 'joined_year', 'terminated_year'],
+                                    name='unique_workforce_summary_group'),
+        ]
@@ -1,6 +1,16 @@
+from django.contrib.auth.validators import UnicodeUsernameValidator
 from rest_framework import serializers
 from .models import CustomUser
 
+# Fields the user list endpoint may return; auth fields (password, groups,
+# user_permissions) are never part of a list response.
+USER_LIST_FIELDS = (
+    'id', 'last_login', 'is_superuser', 'username', 'first_name', 'last_name', 'email', 'is_staff',
+    'is_active', 'date_joined', 'department', 'position', 'manager', 'date_of_birth', 'address',
+    'phone_number', 'emergency_contact_info', 'joining_date', 'termination_date', 'skills_expertise',
+    'org_path', 'updated_at',
+)
+
 class UserSerializer(serializers.ModelSerializer):
     """
     Serializer class for the CustomUser model.
@@ -30,6 +40,110 @@ class UserSerializer(serializers.ModelSerializer):
         Attributes:
             model (CustomUser): The model associated with this serializer.
             fields (str): The fields to include in the serialized representation.
+            extra_kwargs (dict): Keeps the password hash out of every response.
         """
         model = CustomUser
         fields = '__all__'
+        extra_kwargs = {'password': {'write_only': True}}
+
+
+
+class UserImportSerializer(serializers.ModelSerializer):
+    """
+    Serializer class for one row of a bulk user import.
+
+    Validating a row never queries the database: the username is only checked
+    against the username pattern, and the manager is a plain id or username.
+    Duplicate usernames and managers are checked for the whole import at once
+    by users.importer.
+
+    Attributes:
+        manager (int, optional): The id of an existing user, stored as manager_id.
+        manager_username (str, optional): The username of an existing user or of another row of the import.
+    """
+
+    manager = serializers.IntegerField(source='manager_id', required=False, allow_null=True)
+    manager_username = serializers.CharField(required=False)
+
+    class Meta:
+        """
+        Meta class for UserImportSerializer.
+
+        Attributes:
+            model (CustomUser): The model associated with this serializer.
+            exclude (tuple): Fields that are not imported.
+            extra_kwargs (dict): Drops the per-row unique username query; rows without a password
+                                 get an unusable one.
+        """
+        model = CustomUser
+        exclude = ('groups', 'user_permissions', 'last_login', 'date_joined', 'org_path')
+        extra_kwargs = {
+            'username': {'validators': [UnicodeUsernameValidator()]},
+            'password': {'write_only': True, 'required': False},
+        }
+
+    def validate(self, data):
+        if data.get('manager_id') is not None and data.get('manager_username'):
+            raise serializers.ValidationError({'manager': 'Give either manager or manager_username, not both.'})
+        return data
+
+
+class UserBatchSerializer(serializers.ModelSerializer):
+    """
+    Serializer class for one item of a batch user update.
+
+    Like UserImportSerializer, validating an item never queries the database;
+    usernames and managers are checked for the whole batch at once by the
+    batch endpoint. Passwords are not updatable in a batch, as they have to be
+    hashed one by one.
+
+    Attributes:
+        manager (int, optional): The id of an existing user, stored as manager_id.
+    """
+
+    manager = serializers.IntegerField(source='manager_id', allow_null=True)
+
+    class Meta:
+        """
+        Meta class for UserBatchSerializer.
+
+        Attributes:
+            model (CustomUser): The model associated with this serializer.
+            exclude (tuple): Fields that are not updatable in a batch.
+            extra_kwargs (dict): Drops the per-item unique username query.
+        """
+        model = CustomUser
+        exclude = ('password', 'groups', 'user_permissions', 'last_login', 'date_joined', 'org_path')
+        extra_kwargs = {'username': {'validators': [UnicodeUsernameValidator()]}}
+
+
+class UserFilterSerializer(serializers.Serializer):
+    """
+    Serializer class declaring the filters of the user list endpoint.
+
+    Every filter is backed by an index: the primary key, the unique username,
+    the manager foreign key and the (department, position) index.
+    """
+
+    id = serializers.IntegerField(required=False)
+    username = serializers.CharField(required=False)
+    department = serializers.CharField(required=False)
+    position = serializers.CharField(required=False)
+    manager = serializers.IntegerField(required=False, source='manager_id')
+
+    def validate(self, data):
+        # position is only indexed as the second column of (department, position)
+        if 'position' in data and 'department' not in data:
+            raise serializers.ValidationError({'position': 'Filtering on position requires department.'})
+        return data
+
+
+class WorkforceQuerySerializer(serializers.Serializer):
+    """
+    Serializer class validating the parameters of the workforce analytics endpoint.
+
+    Attributes:
+        department (str, optional): Restricts the figures to one department.
+    """
+
+    department = serializers.CharField(required=False)
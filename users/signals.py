@@ -0,0 +1,56 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import analytics, hierarchy
+from .models import CustomUser
+
+
+@receiver(post_save, sender=CustomUser)
+def set_org_path(sender, instance, created, **kwargs):
+    """
+    Gives users created through any path (API, createsuperuser, shell) their org path.
+
+    Users inserted with bulk_create do not send post_save; their paths are set by the
+    code doing the insert.
+    """
+    if created and not kwargs.get('raw'):
+        hierarchy.assign_path(instance)
+
+
+@receiver(pre_save, sender=CustomUser)
+def capture_workforce_fields(sender, instance, update_fields=None, **kwargs):
+    """
+    Reads the stored fields of a user about to be updated, for the workforce summary.
+
+    Saves restricted to other fields (e.g. last_login) are skipped.
+    """
+    if instance._state.adding or kwargs.get('raw'):
+        return
+    if update_fields is not None and not set(update_fields) & set(analytics.FIELDS):
+        return
+    instance._workforce_before = CustomUser.objects.filter(pk=instance.pk).values_list(*analytics.FIELDS).first()
+
+
+@receiver(post_save, sender=CustomUser)
+def update_workforce_summary(sender, instance, created, **kwargs):
+    """
+    Counts users created or changed through any path that saves instances in the workforce summary.
+
+    Users written with bulk_create, bulk_update or update() do not send these
+    signals; the code doing the write updates the summary.
+    """
+    if kwargs.get('raw'):
+        return
+    if created:
+        analytics.apply_changes(added=[instance])
+    elif '_workforce_before' in instance.__dict__:
+        before = instance.__dict__.pop('_workforce_before')
+        analytics.apply_changes(removed=[before] if before else (), added=[instance])
+
+
+@receiver(post_delete, sender=CustomUser)
+def remove_from_workforce_summary(sender, instance, **kwargs):
+    """
+    Removes deleted users from the workforce summary.
+    """
+    analytics.apply_changes(removed=[instance])
@@ -1,7 +1,381 @@
-from django.test import TestCase
+import datetime
+import json
+import os
+import tempfile
+from unittest import mock
 
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.test import override_settings
 
-# Create your tests here.
+from AttendanceAndAccountsApp.testing import APITestCase, make_user
+from . import analytics, hierarchy, importer
+from .models import CustomUser
 
 
-    
+class OrgHierarchyTests(APITestCase):
+    """
+    Reports and chains are read from the org paths, which follow manager changes and deletions.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.ceo = make_user('ceo')
+        self.cto = make_user('cto', manager=self.ceo)
+        self.dev = make_user('dev', manager=self.cto)
+
+    def change_manager(self, user, manager):
+        data = {'username': user.username, 'password': 'secret', 'department': user.department,
+                'position': user.position, 'address': user.address, 'phone_number': user.phone_number,
+                'manager': manager.pk if manager else None}
+        return self.client.post(f'/user/update/{user.pk}/', data, format='json')
+
+    def path(self, user):
+        return CustomUser.objects.values_list('org_path', flat=True).get(pk=user.pk)
+
+    def make_cycle(self):
+        """
+        Leaves cto and dev reporting to each other, as the org path migration finds such data.
+        """
+        CustomUser.objects.filter(pk=self.cto.pk).update(manager=self.dev)
+        CustomUser.objects.filter(pk__in=[self.cto.pk, self.dev.pk]).update(org_path=hierarchy.PENDING)
+
+    def test_reports_and_chain(self):
+        response = self.client.get(f'/user/{self.ceo.pk}/reports/')
+        self.assertEqual(response.data['subtree_size'], 2)
+        self.assertEqual([(report['username'], report['depth'], report['subtree_size'])
+                          for report in response.data['reports']], [('cto', 1, 1), ('dev', 2, 0)])
+
+        response = self.client.get(f'/user/{self.dev.pk}/chain/')
+        self.assertEqual([manager['username'] for manager in response.data['chain']], ['cto', 'ceo'])
+
+    def test_manager_change_moves_the_subtree(self):
+        self.assertEqual(self.change_manager(self.cto, None).status_code, 200)
+        self.assertEqual(self.path(self.dev), f'/{self.cto.pk}/{self.dev.pk}/')
+        self.assertEqual(self.client.get(f'/user/{self.ceo.pk}/reports/').data['subtree_size'], 0)
+
+    def test_manager_cycle_is_rejected(self):
+        response = self.change_manager(self.ceo, self.dev)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('manager', response.data)
+        self.assertEqual(self.path(self.ceo), f'/{self.ceo.pk}/')
+
+        self.assertEqual(self.change_manager(self.ceo, self.ceo).status_code, 400)
+
+    def test_deleting_a_manager_makes_their_reports_roots(self):
+        self.assertEqual(self.client.delete(f'/user/{self.cto.pk}/delete/').status_code, 202)
+        self.assertEqual(self.path(self.dev), f'/{self.dev.pk}/')
+        self.assertEqual(self.path(self.ceo), f'/{self.ceo.pk}/')
+
+    def test_pending_paths_are_not_read(self):
+        self.make_cycle()
+        self.assertEqual(self.client.get(f'/user/{self.cto.pk}/reports/').status_code, 409)
+        self.assertEqual(self.client.get(f'/user/{self.dev.pk}/chain/').status_code, 409)
+        # The empty path is not a prefix of everyone
+        self.assertEqual(self.client.get(f'/user/{self.ceo.pk}/reports/').data['subtree_size'], 0)
+
+    def test_breaking_a_cycle_gives_paths_back(self):
+        self.make_cycle()
+        intern = make_user('intern', manager=self.dev)
+        self.assertEqual(self.path(intern), hierarchy.PENDING)
+
+        # Closing the cycle again through another pending user is still rejected
+        self.assertEqual(self.change_manager(self.dev, intern).status_code, 400)
+        self.assertEqual(self.change_manager(self.cto, self.ceo).status_code, 200)
+        self.assertEqual(self.path(self.cto), f'/{self.ceo.pk}/{self.cto.pk}/')
+        self.assertEqual(self.path(intern), f'/{self.ceo.pk}/{self.cto.pk}/{self.dev.pk}/{intern.pk}/')
+        self.assertEqual(self.path(self.admin), f'/{self.admin.pk}/')
+
+    def test_deleting_a_user_of_a_cycle_breaks_it(self):
+        self.make_cycle()
+        self.assertEqual(self.client.delete(f'/user/{self.cto.pk}/delete/').status_code, 202)
+        self.assertEqual(self.path(self.dev), f'/{self.dev.pk}/')
+        self.assertEqual(self.path(self.ceo), f'/{self.ceo.pk}/')
+        self.assertEqual(self.path(self.admin), f'/{self.admin.pk}/')
+
+    def test_batch_moves_pending_users(self):
+        self.make_cycle()
+        response = self.client.patch('/user/batch/', [{'id': self.dev.pk, 'manager': self.ceo.pk}], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.path(self.cto), f'/{self.ceo.pk}/{self.dev.pk}/{self.cto.pk}/')
+
+        response = self.client.patch('/user/batch/', [{'id': self.ceo.pk, 'manager': self.cto.pk}], format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_moving_below_a_pending_manager_makes_the_subtree_pending(self):
+        self.make_cycle()
+        self.assertEqual(self.change_manager(self.ceo, self.dev).status_code, 200)
+        self.assertEqual(self.path(self.ceo), hierarchy.PENDING)
+        self.assertEqual(self.path(self.admin), f'/{self.admin.pk}/')
+
+
+class ResponseCacheTests(APITestCase):
+    """
+    The user list is cached, invalidated by writes, from the API or from management commands,
+    and answers conditional GETs with 304.
+    """
+
+    def test_conditional_get_is_not_modified_until_a_write(self):
+        response = self.client.get('/user/all/')
+        self.assertEqual(response.status_code, 200)
+        etag, modified = response['ETag'], response['Last-Modified']
+
+        self.assertEqual(self.client.get('/user/all/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get('/user/all/', HTTP_IF_MODIFIED_SINCE=modified).status_code, 304)
+        self.assertEqual(self.client.get('/user/all/?fields=id', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch('/user/batch/', [{'id': self.admin.pk, 'position': 'Director'}], format='json')
+        response = self.client.get('/user/all/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_writes_invalidate_cached_responses(self):
+        self.assertEqual([user['username'] for user in self.client.get('/user/all/').data], ['admin'])
+        hits = self.client.get('/cache/stats/').data['hits']
+        self.client.get('/user/all/')
+        self.assertEqual(self.client.get('/cache/stats/').data['hits'], hits + 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch('/user/batch/', [{'id': self.admin.pk, 'username': 'root'}], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([user['username'] for user in self.client.get('/user/all/').data], ['root'])
+
+    def test_commands_invalidate_cached_responses(self):
+        manager = make_user('manager')
+        self.client.get('/user/all/')
+        CustomUser.objects.filter(pk=self.admin.pk).update(manager=manager, org_path='')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('rebuild_org_hierarchy', stdout=mock.Mock())
+        paths = {user['username']: user['org_path'] for user in self.client.get('/user/all/').data}
+        self.assertEqual(paths['admin'], f'/{manager.pk}/{self.admin.pk}/')
+
+
+class UserListTests(APITestCase):
+    """
+    The user list never returns passwords and projects the fields asked for.
+    """
+
+    def test_password_is_never_listed(self):
+        users = self.client.get('/user/all/').data
+        self.assertNotIn('password', users[0])
+        self.assertEqual(self.client.get('/user/all/?fields=username,password').status_code, 400)
+
+    def test_fields_projection(self):
+        make_user('employee', manager=self.admin)
+        users = self.client.get('/user/all/?fields=username,manager').data
+        self.assertEqual([dict(user) for user in users],
+                         [{'username': 'admin', 'manager': None}, {'username': 'employee', 'manager': self.admin.pk}])
+        self.assertEqual(self.client.get('/user/all/?fields=nope').status_code, 400)
+
+
+class UserFilterTests(APITestCase):
+    """
+    The user list accepts the declared filters only, and shows query plans to staff only.
+    """
+
+    def test_filters(self):
+        make_user('employee', department='HR', position='Recruiter')
+        users = self.client.get('/user/all/?department=HR&position=Recruiter').data
+        self.assertEqual([user['username'] for user in users], ['employee'])
+
+        self.assertEqual(self.client.get('/user/all/?password=secret').status_code, 400)
+        self.assertEqual(self.client.get('/user/all/?position=Recruiter').status_code, 400)
+        self.assertEqual(self.client.get('/user/all/?manager=boss').status_code, 400)
+
+    def test_query_plan_is_for_staff_only(self):
+        response = self.client.get('/user/all/?department=HR&debug=plan')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('plan', response.data)
+
+        self.client.force_authenticate(make_user('employee'))
+        self.assertEqual(self.client.get('/user/all/?debug=plan').status_code, 403)
+
+
+@override_settings(CHANGE_FEED_SETTLE_SECONDS=0)
+class ChangeFeedTests(APITestCase):
+    """
+    The user change feed returns the current state of changed users and tombstones for deleted ones.
+    """
+
+    def test_deleted_user_is_a_tombstone(self):
+        employee = make_user('employee')
+        response = self.client.patch('/user/batch/', [{'id': employee.pk, 'department': 'HR'}], format='json')
+        self.assertEqual(response.status_code, 200)
+
+        feed = self.client.get('/user/changes/?since=0').data
+        self.assertEqual([(change['id'], change['action']) for change in feed['changes']],
+                         [(employee.pk, 'upsert')])
+        self.assertEqual(feed['changes'][0]['record']['department'], 'HR')
+
+        self.client.delete(f'/user/{employee.pk}/delete/')
+        later = self.client.get(f'/user/changes/?since={feed["next"]}').data
+        self.assertEqual(later['changes'], [{'seq': later['next'], 'id': employee.pk, 'action': 'delete'}])
+
+    def test_cursor_returns_each_record_once(self):
+        employee = make_user('employee')
+        for department in ('HR', 'Sales', 'Legal'):
+            self.client.patch('/user/batch/', [{'id': employee.pk, 'department': department}], format='json')
+
+        feed = self.client.get('/user/changes/?since=0').data
+        self.assertEqual([change['id'] for change in feed['changes']], [employee.pk])
+        self.assertEqual(feed['changes'][0]['record']['department'], 'Legal')
+        self.assertEqual(self.client.get(f'/user/changes/?since={feed["next"]}').data['changes'], [])
+
+
+class WorkforceAnalyticsTests(APITestCase):
+    """
+    The workforce figures are read from a summary that follows every user write.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.recruiter = make_user('recruiter', department='HR', position='Recruiter',
+                                   joining_date=datetime.date(2022, 3, 1))
+        make_user('leaver', department='HR', position='Recruiter', joining_date=datetime.date(2022, 5, 1),
+                  termination_date=datetime.date(2023, 2, 1))
+
+    def figures(self):
+        return analytics.workforce_analytics(today=datetime.date(2024, 6, 1))
+
+    def test_figures(self):
+        figures = self.figures()
+
+        self.assertEqual(figures['headcount'], 2)
+        self.assertEqual(figures['departments'], [
+            {'department': 'HR', 'headcount': 1, 'positions': {'Recruiter': 1}},
+            {'department': 'IT', 'headcount': 1, 'positions': {'Engineer': 1}},
+        ])
+        self.assertEqual({bucket['years']: bucket['employees'] for bucket in figures['tenure']},
+                         {'0-1': 0, '1-2': 0, '2-5': 1, '5-10': 0, '10+': 1})
+        self.assertEqual(figures['years'][-1], {'year': 2023, 'hires': 0, 'terminations': 1, 'headcount_start': 3,
+                                                'termination_rate': 0.3333})
+
+    def test_summary_follows_writes(self):
+        self.client.patch('/user/batch/', [{'id': self.recruiter.pk, 'department': 'IT'}], format='json')
+        self.client.delete(f'/user/{self.admin.pk}/delete/')
+        figures = self.figures()
+
+        self.assertEqual(figures['departments'], [{'department': 'IT', 'headcount': 1, 'positions': {'Recruiter': 1}}])
+        analytics.rebuild_summary()
+        self.assertEqual(self.figures(), figures)
+
+    def test_department_filter(self):
+        response = self.client.get('/user/analytics/?department=HR')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['headcount'], 1)
+
+
+class BatchTests(APITestCase):
+    """
+    Batch PATCH and DELETE report a status per item and apply nothing on conflicts.
+    """
+
+    def test_patch_statuses(self):
+        employee = make_user('employee')
+        response = self.client.patch('/user/batch/', [
+            {'id': employee.pk, 'manager': self.admin.pk},
+            {'id': 999999, 'department': 'HR'},
+            {'id': employee.pk, 'department': 'HR'},
+            {'id': self.admin.pk, 'password': 'secret'},
+            {'department': 'HR'},
+        ], format='json')
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([result['status'] for result in response.data['results']],
+                         ['updated', 'not_found', 'invalid', 'invalid', 'invalid'])
+        self.assertEqual((response.data['updated'], response.data['not_found'], response.data['invalid']), (1, 1, 3))
+        employee.refresh_from_db()
+        self.assertEqual(employee.manager_id, self.admin.pk)
+        self.assertEqual(employee.org_path, f'/{self.admin.pk}/{employee.pk}/')
+
+    def test_manager_cycle_is_rejected(self):
+        employee = make_user('employee', manager=self.admin)
+        response = self.client.patch('/user/batch/', [{'id': self.admin.pk, 'manager': employee.pk}], format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.admin.refresh_from_db()
+        self.assertIsNone(self.admin.manager_id)
+
+    def test_taken_username_is_invalid(self):
+        first, second = make_user('first'), make_user('second')
+        response = self.client.patch('/user/batch/', [
+            {'id': first.pk, 'department': 'HR'},
+            {'id': second.pk, 'username': 'first'},
+            {'id': self.admin.pk, 'username': 'first'},
+        ], format='json')
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([result['status'] for result in response.data['results']], ['updated', 'invalid', 'invalid'])
+        self.assertEqual(set(CustomUser.objects.values_list('username', flat=True)), {'admin', 'first', 'second'})
+
+    def test_delete_statuses(self):
+        manager = make_user('manager')
+        report = make_user('report', manager=manager)
+
+        response = self.client.delete('/user/batch/', [manager.pk, 999999, 'x', manager.pk], format='json')
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([result['status'] for result in response.data['results']],
+                         ['deleted', 'not_found', 'invalid', 'invalid'])
+        self.assertFalse(CustomUser.objects.filter(pk=manager.pk).exists())
+        report.refresh_from_db()
+        self.assertEqual((report.manager_id, report.org_path), (None, f'/{report.pk}/'))
+
+
+class ImportTests(APITestCase):
+    """
+    The bulk user import reports duplicates, resolves managers among its rows and answers conflicts with 409.
+    """
+
+    def row(self, username, **fields):
+        return {'username': username, 'department': 'IT', 'position': 'Engineer', 'address': 'Main Street 1',
+                'phone_number': '555-0100', **fields}
+
+    def test_duplicates_and_managers_within_the_import(self):
+        with mock.patch('users.importer.hash_all', wraps=importer.hash_all) as hash_all:
+            response = self.client.post('/user/import/', [
+                self.row('report', manager_username='lead'),
+                self.row('lead', manager_username='admin'),
+                self.row('admin'),
+                self.row('lead'),
+                self.row('orphan', manager_username='nobody'),
+            ], format='json')
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([result['status'] for result in response.data['results']],
+                         ['created', 'created', 'duplicate', 'duplicate', 'invalid'])
+        lead = CustomUser.objects.get(username='lead')
+        report = CustomUser.objects.get(username='report')
+        self.assertEqual(report.manager_id, lead.pk)
+        self.assertEqual(report.org_path, f'/{self.admin.pk}/{lead.pk}/{report.pk}/')
+        # The API never starts a process pool
+        self.assertEqual(hash_all.call_args.args[1], 1)
+
+    def test_reports_of_a_pending_manager_are_pending(self):
+        CustomUser.objects.filter(pk=self.admin.pk).update(org_path=hierarchy.PENDING)
+        response = self.client.post('/user/import/', [self.row('new', manager=self.admin.pk)], format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(CustomUser.objects.get(username='new').org_path, hierarchy.PENDING)
+
+    def test_concurrent_import_conflicts(self):
+        with mock.patch('users.importer.CustomUser.objects.bulk_create', side_effect=IntegrityError):
+            response = self.client.post('/user/import/', [self.row('new')], format='json')
+
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(CustomUser.objects.filter(username='new').exists())
+
+    def test_command_resolves_managers_across_chunks(self):
+        rows = [self.row(f'level{level}', manager_username=f'level{level + 1}') for level in range(4)]
+        rows.append(self.row('level4'))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'users.json')
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(rows, f)
+            call_command('import_users', path, chunk_size=2, workers=1, stdout=mock.Mock())
+
+        paths = dict(CustomUser.objects.filter(username__startswith='level').values_list('username', 'org_path'))
+        self.assertEqual(len(paths), 5)
+        self.assertEqual(paths['level0'].count('/'), 6)
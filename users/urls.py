@@ -1,4 +1,5 @@
 
+from django.conf import settings
 from django.urls import path
 from . import views
  
@@ -9,9 +10,15 @@ Each URL pattern is associated with a specific view function from the 'views' mo
 
 - '' (home): Display the API overview.
 - 'create/': Add new users.
-- 'all/': View all users.
+- 'import/': Create many users at once from a JSON list or a CSV file.
+- 'all/': View all users; served by view_users_async when settings.ASYNC_READ_VIEWS is on.
+- 'changes/': List the users created, changed or deleted after a cursor (?since=).
 - 'update/<int:pk>/': Update users with a specific primary key.
 - '<int:pk>/delete/': Delete users with a specific primary key.
+- 'batch/': Partially update (PATCH) or delete (DELETE) many users in one transaction.
+- '<int:pk>/reports/': List everyone reporting to a user, directly or indirectly.
+- '<int:pk>/chain/': List the management chain of a user.
+- 'analytics/': Headcount, tenure and termination figures for HR dashboards.
 - 'hello/': Display a hello message.
 
 Note:
@@ -25,9 +32,15 @@ See Also:
 urlpatterns = [
     path('', views.ApiOverview, name='home'),
     path('create/', views.add_users, name='add-users'),
-    path('all/', views.view_users, name='view-users'),
+    path('import/', views.import_users, name='import-users'),
+    path('all/', views.view_users_async if settings.ASYNC_READ_VIEWS else views.view_users, name='view-users'),
+    path('changes/', views.user_changes, name='changes'),
     path('update/<int:pk>/', views.update_users, name='update_users'),
     path('<int:pk>/delete/', views.delete_users, name='delete-items'),
+    path('batch/', views.batch_users, name='batch'),
+    path('<int:pk>/reports/', views.org_reports, name='org-reports'),
+    path('<int:pk>/chain/', views.org_chain, name='org-chain'),
+    path('analytics/', views.workforce_analytics, name='workforce-analytics'),
     path('hello/', views.hello_message, name='hello'),
 
 
@@ -1,9 +1,27 @@
-from rest_framework.decorators import api_view
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
+from . import analytics, hierarchy, importer
 from .models import CustomUser
-from .serializers import UserSerializer
+from .serializers import (UserSerializer, UserBatchSerializer, UserFilterSerializer, WorkforceQuerySerializer,
+                          USER_LIST_FIELDS)
 from rest_framework import serializers
 from rest_framework import status
+from AttendanceAndAccountsApp import batch
+from AttendanceAndAccountsApp.async_views import async_list_view
+from AttendanceAndAccountsApp.authentication import invalidate_user
+from AttendanceAndAccountsApp.cache import cached_response, invalidate
+from AttendanceAndAccountsApp.filters import filter_queryset, query_plan, wants_query_plan
+from AttendanceAndAccountsApp.serialization import FIELDS_PARAM, LeanSerializer, parse_fields
+from attendance.models import Attendance, AttendanceArchive
+from accounts.ledger import invalidate_ledgers
+from accounts.models import Accounts
+from changes import feed
+
+# Fields returned for each user by the org hierarchy endpoints
+ORG_NODE_FIELDS = ('id', 'username', 'first_name', 'last_name', 'department', 'position', 'manager', 'org_path')
 
 @api_view(['GET'])
 def ApiOverview(request):
@@ -40,34 +58,104 @@ def add_users(request):
         raise serializers.ValidationError('User with this data already exists')
 
     if user.is_valid():
-        user.save()
+        with transaction.atomic():
+            user.save()
+            feed.record(feed.USERS, [user.instance.pk])
+            invalidate('users')
         return Response(user.data, status=status.HTTP_201_CREATED)
     else:
         return Response(user.errors, status=status.HTTP_404_NOT_FOUND)
 
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def import_users(request):
+    """
+    API endpoint for creating many users at once, e.g. when onboarding a new office.
+
+    The body is either a JSON list of users or a CSV file uploaded as 'file' (multipart),
+    with a header row naming the fields. A user's manager is given as 'manager' (the id of
+    an existing user) or 'manager_username' (an existing user or another row of the import).
+
+    Args:
+        request (Request): The incoming request.
+
+    Returns:
+        Response: A response with counts and a status ('created', 'duplicate' or 'invalid')
+                  for each row, in the order the rows were sent.
+    """
+    if 'file' in request.FILES:
+        try:
+            rows = importer.read_csv(request.FILES['file'].read().decode('utf-8-sig'))
+        except (UnicodeDecodeError, ValueError) as e:
+            return Response({'error': f'Invalid CSV file: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+    else:
+        rows = request.data
+    if not isinstance(rows, list):
+        return Response({'error': 'Expected a list of users or a CSV file'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(rows) > settings.USER_IMPORT_MAX_ROWS:
+        return Response({'error': f'At most {settings.USER_IMPORT_MAX_ROWS} users per request'},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        # Passwords are hashed in the request's process; the import_users command uses a pool
+        summary = importer.import_users(rows, workers=1)
+    except IntegrityError:
+        # Some of the usernames were taken concurrently; nothing was inserted
+        return Response({'error': 'Users were added concurrently, retry the import'}, status=status.HTTP_409_CONFLICT)
+    all_created = summary['created'] == len(rows)
+    return Response(summary, status=status.HTTP_201_CREATED if all_created else status.HTTP_207_MULTI_STATUS)
+
 @api_view(['GET'])
+@cached_response('users')
 def view_users(request):
     """
     API endpoint for viewing users.
 
+    Supported filters are declared by UserFilterSerializer; other query parameters are rejected.
+    'fields' selects the returned fields, e.g. ?fields=id,username,department, and
+    'debug=plan' returns the query plan instead of the users (staff only).
+
     Args:
         request (Request): The incoming request.
 
     Returns:
         Response: A response containing serialized user data.
     """
+    params = request.query_params.dict()
+    lean = LeanSerializer(UserSerializer, parse_fields(params.pop(FIELDS_PARAM, None), USER_LIST_FIELDS))
+    plan = wants_query_plan(request, params)
+
     # Filter users based on query parameters if provided
-    if request.query_params:
-        users = CustomUser.objects.filter(**request.query_params.dict())
-    else:
-        users = CustomUser.objects.all()
+    users = filter_queryset(CustomUser.objects.all(), UserFilterSerializer, params).values(*lean.fields)
+
+    if plan:
+        return Response(query_plan(users))
 
     if users:
-        serializer = UserSerializer(users, many=True)
-        return Response(serializer.data)
+        return Response(lean.rows(users))
     else:
         return Response(status=status.HTTP_404_NOT_FOUND)
 
+# Async variant of view_users, routed instead of it when settings.ASYNC_READ_VIEWS is on
+view_users_async = async_list_view(CustomUser, UserSerializer, UserFilterSerializer, USER_LIST_FIELDS, 'users')
+
+@api_view(['GET'])
+def user_changes(request):
+    """
+    API endpoint returning the user records created, changed or deleted after a cursor, for downstream sync.
+
+    Start with ?since=0 and pass the returned 'next' as 'since' on the following call;
+    'limit' caps the number of changes read and 'fields' selects the returned fields.
+    Deleted records are returned as tombstones ('action': 'delete').
+
+    Args:
+        request (Request): The incoming request.
+
+    Returns:
+        Response: A response containing the changes, ordered by change sequence, and the next cursor.
+    """
+    return feed.change_feed_response(request, feed.USERS, CustomUser, UserSerializer, USER_LIST_FIELDS)
+
 @api_view(['POST'])
 def update_users(request, pk):
     """
@@ -78,13 +166,30 @@ def update_users(request, pk):
         pk (int): The primary key of the user to be updated.
 
     Returns:
-        Response: A response containing updated user data if successful, or error messages if validation fails.
+        Response: A response containing updated user data if successful, or error messages if validation
+                  fails; 400 if the new manager is the user or one of their reports.
     """
     user = CustomUser.objects.get(pk=pk)
+    old_manager_id = user.manager_id
     data = UserSerializer(instance=user, data=request.data)
 
     if data.is_valid():
-        data.save()
+        try:
+            with transaction.atomic():
+                manager = data.validated_data.get('manager')
+                if manager is not None and manager.pk != old_manager_id:
+                    # Checked on locked rows, so that a concurrent manager change cannot close a cycle with this one
+                    locked_user, locked_manager = hierarchy.lock_for_move(user.pk, manager.pk)
+                    hierarchy.check_manager(locked_user, locked_manager)
+                    user.org_path, manager.org_path = locked_user.org_path, locked_manager.org_path
+                data.save()
+                if user.manager_id != old_manager_id:
+                    hierarchy.move_subtree(user)
+                feed.record(feed.USERS, [user.pk])
+                invalidate('users')
+                invalidate_user(user.pk)
+        except hierarchy.HierarchyCycleError as e:
+            return Response({'manager': [str(e)]}, status=status.HTTP_400_BAD_REQUEST)
         return Response(data.data)
     else:
         return Response(data.errors, status=status.HTTP_404_NOT_FOUND)
@@ -103,12 +208,209 @@ def delete_users(request, pk):
     """
     try:
         user = CustomUser.objects.get(pk=pk)
-        user.delete()
+        with transaction.atomic():
+            # Tombstones for the user and for the records deleted along with it
+            for model in (Attendance, AttendanceArchive):
+                feed.record(feed.ATTENDANCE, model.objects.filter(employee=user).values_list('pk', flat=True),
+                            deleted=True)
+            feed.record(feed.ACCOUNTS, Accounts.objects.filter(employee=user).values_list('pk', flat=True),
+                        deleted=True)
+            feed.record(feed.USERS, [pk], deleted=True)
+            user.delete()
+            # The reports of the user lose their manager and become roots
+            hierarchy.detach_subtree(user.org_path)
+            invalidate_user(pk)
+            invalidate_ledgers(pk)
+        # Attendance and accounts records of the user are deleted with it
+        invalidate('users', 'attendance', 'accounts')
         return Response(status=status.HTTP_202_ACCEPTED)
     except Exception as e:
         response_html = f'Error: {str(e)}'
         return Response(response_html)
 
+@api_view(['PATCH', 'DELETE'])
+def batch_users(request):
+    """
+    API endpoint for changing or deleting many users at once.
+
+    PATCH takes a list of partial updates, each with the 'id' of the user and the fields
+    to set; users given the same changes, e.g. a new manager, are updated by one set-based
+    query, and the org paths below the moved users are recomputed once for the whole batch.
+    Passwords are not updatable in a batch. DELETE takes a list of ids; the attendance and
+    accounts records of the users are deleted with them and their reports become roots.
+    Everything is applied in one transaction.
+
+    Args:
+        request (Request): The incoming request.
+
+    Returns:
+        Response: A response with counts and a status ('updated' or 'deleted', 'not_found' or
+                  'invalid') for each item, in the order the items were sent; 400 if the manager
+                  changes form a cycle and 409 if they would duplicate a username, in which
+                  cases nothing is applied.
+    """
+    items = request.data
+    error = batch.check_batch(items, 'partial updates' if request.method == 'PATCH' else 'ids')
+    if error is not None:
+        return error
+    results = [None] * len(items)
+
+    if request.method == 'DELETE':
+        ids = batch.validate_ids(items, results)
+        with transaction.atomic():
+            paths = dict(CustomUser.objects.select_for_update().filter(pk__in=ids.values())
+                         .values_list('pk', 'org_path'))
+            ids = batch.drop_missing(ids, paths, results)
+            # Tombstones for the users and for the records deleted along with them
+            for model in (Attendance, AttendanceArchive):
+                feed.record(feed.ATTENDANCE, model.objects.filter(employee__in=paths).values_list('pk', flat=True),
+                            deleted=True)
+            feed.record(feed.ACCOUNTS, Accounts.objects.filter(employee__in=paths).values_list('pk', flat=True),
+                        deleted=True)
+            feed.record(feed.USERS, list(paths), deleted=True)
+            CustomUser.objects.filter(pk__in=paths).delete()
+            # The reports of the users lose their manager and become roots
+            hierarchy.recompute_subtrees(paths.values())
+            for pk in paths:
+                invalidate_user(pk)
+            invalidate_ledgers(*paths)
+            invalidate('users', 'attendance', 'accounts')
+        return batch.batch_response(results, ids, batch.DELETED)
+
+    updates = batch.validate_updates(items, UserBatchSerializer, results)
+    try:
+        with transaction.atomic():
+            rows = {row[0]: row for row in CustomUser.objects.select_for_update()
+                    .filter(pk__in=[pk for pk, _ in updates.values()])
+                    .values_list('pk', 'username', 'manager_id', 'org_path', *analytics.FIELDS)}
+            updates = batch.drop_missing(updates, rows, results)
+
+            # Managers and usernames are checked for the whole batch, with one query each
+            manager_ids = {changes['manager_id'] for _, changes in updates.values() if changes.get('manager_id')}
+            known_managers = set(CustomUser.objects.filter(pk__in=manager_ids).values_list('pk', flat=True))
+            usernames = [changes['username'] for _, changes in updates.values() if 'username' in changes]
+            taken = dict(CustomUser.objects.filter(username__in=usernames).values_list('username', 'pk'))
+            claimed = {}
+            for index, (pk, changes) in list(updates.items()):
+                errors = {}
+                manager_id = changes.get('manager_id')
+                if manager_id is not None and manager_id not in known_managers:
+                    errors['manager'] = [f'Invalid pk "{manager_id}" - object does not exist.']
+                elif manager_id == pk:
+                    errors['manager'] = ['A user cannot report to themselves.']
+                username = changes.get('username')
+                if username is not None and (taken.get(username, pk) != pk or claimed.setdefault(username, pk) != pk):
+                    errors['username'] = ['A user with that username already exists.']
+                if errors:
+                    results[index] = batch.invalid(index, errors)
+                    del updates[index]
+
+            batch.apply_updates(CustomUser, updates.values())
+            moved_ids = [pk for pk, changes in updates.values()
+                         if 'manager_id' in changes and changes['manager_id'] != rows[pk][2]]
+            moved = [rows[pk][3] for pk in moved_ids]
+            hierarchy.recompute_subtrees(moved, moved_ids)
+
+            # The workforce summary is kept up to date by hand, as update() sends no signals
+            fields = range(4, 4 + len(analytics.FIELDS))
+            before = [tuple(rows[pk][field] for field in fields) for pk, _ in updates.values()]
+            after = [tuple(changes.get(name, rows[pk][field]) for name, field in zip(analytics.FIELDS, fields))
+                     for pk, changes in updates.values()]
+            analytics.apply_changes(before, after)
+
+            feed.record(feed.USERS, [pk for pk, _ in updates.values()])
+            for pk, _ in updates.values():
+                invalidate_user(pk)
+            invalidate('users')
+    except hierarchy.HierarchyCycleError as e:
+        return Response({'manager': [str(e)]}, status=status.HTTP_400_BAD_REQUEST)
+    except IntegrityError:
+        return Response({'error': 'The changes would duplicate a username; nothing was applied'},
+                        status=status.HTTP_409_CONFLICT)
+    return batch.batch_response(results, updates, batch.UPDATED)
+
+@api_view(['GET'])
+def org_reports(request, pk):
+    """
+    API endpoint listing everyone reporting to a user, directly or indirectly.
+
+    Args:
+        request (Request): The incoming request.
+        pk (int): The primary key of the manager.
+
+    Returns:
+        Response: A response containing the size of the subtree and every report with
+                  their depth below the manager and the size of their own subtree; 409 if
+                  the manager has no org path because their chain forms a cycle.
+    """
+    try:
+        user = CustomUser.objects.get(pk=pk)
+    except CustomUser.DoesNotExist:
+        return Response(status=status.HTTP_404_NOT_FOUND)
+
+    if user.org_path == hierarchy.PENDING:
+        return Response({'error': 'The management chain of this user forms a cycle; '
+                                  'change one of the managers in it to break the cycle'},
+                        status=status.HTTP_409_CONFLICT)
+
+    reports = list(CustomUser.objects.filter(org_path__startswith=user.org_path).exclude(pk=pk)
+                   .order_by('org_path').values(*ORG_NODE_FIELDS))
+    sizes = hierarchy.subtree_sizes(reports, user.org_path)
+    root_depth = len(hierarchy.path_ids(user.org_path))
+    for report in reports:
+        report['depth'] = len(hierarchy.path_ids(report['org_path'])) - root_depth
+        report['subtree_size'] = sizes[report['id']]
+    return Response({'id': user.pk, 'subtree_size': len(reports), 'reports': reports})
+
+@api_view(['GET'])
+def org_chain(request, pk):
+    """
+    API endpoint listing the management chain of a user, from their direct manager up to the top.
+
+    Args:
+        request (Request): The incoming request.
+        pk (int): The primary key of the user.
+
+    Returns:
+        Response: A response containing the managers of the user, nearest first; 409 if
+                  the user has no org path because their chain forms a cycle.
+    """
+    try:
+        user = CustomUser.objects.get(pk=pk)
+    except CustomUser.DoesNotExist:
+        return Response(status=status.HTTP_404_NOT_FOUND)
+
+    if user.org_path == hierarchy.PENDING:
+        return Response({'error': 'The management chain of this user forms a cycle; '
+                                  'change one of the managers in it to break the cycle'},
+                        status=status.HTTP_409_CONFLICT)
+
+    manager_ids = hierarchy.path_ids(user.org_path)[:-1]
+    managers = {row['id']: row for row in CustomUser.objects.filter(pk__in=manager_ids).values(*ORG_NODE_FIELDS)}
+    return Response({'id': user.pk, 'chain': [managers[manager_id] for manager_id in reversed(manager_ids)
+                                              if manager_id in managers]})
+
+@api_view(['GET'])
+def workforce_analytics(request):
+    """
+    API endpoint for the HR dashboard: headcount by department and position, tenure
+    distribution, and hires, terminations and termination rates per year.
+
+    The figures are read from the workforce summary, which is kept up to date as users
+    are created, changed and deleted, so the cost does not grow with the headcount.
+    Takes an optional 'department'.
+
+    Args:
+        request (Request): The incoming request.
+
+    Returns:
+        Response: A response containing the figures, or the validation errors of the query parameters.
+    """
+    params = WorkforceQuerySerializer(data=request.query_params)
+    if not params.is_valid():
+        return Response(params.errors, status=status.HTTP_400_BAD_REQUEST)
+    return Response(analytics.workforce_analytics(**params.validated_data))
+
 @api_view(['GET'])
 def hello_message(request):
     """